@@ -0,0 +1,101 @@
+"""
+Collaboration wire encoding benchmark
+
+Encodes a stream of typical server events with both negotiated codecs
+(app.core.collab_codec):
+- cursor: cursors_update frames with 1-3 moved cursors
+- op: operation frames for single keystrokes
+- presence: user_joined with the 10-user list
+- content: room_state / resync with a 50 KB draft
+
+Reports encode + decode CPU per event and bytes per event, raw and after
+permessage-deflate, both without context takeover (each frame compressed
+on its own) and with it (the websockets default: one deflate stream per
+connection, so repeated keys cost almost nothing).
+
+Run from the repo root:
+    PYTHONPATH=src python benchmarks/bench_collab_codec.py
+"""
+import random
+import time
+import zlib
+from app.core.collab_codec import json_codec, msgpack_codec
+
+EVENTS = 2000
+USERS = 10
+DOC_BYTES = 50_000
+WORDS = "the quarterly plan covers hiring pricing onboarding support and the launch timeline".split()
+COLORS = ["#FF6B6B", "#4ECDC4", "#45B7D1", "#96CEB4", "#FFEAA7", "#DDA0DD", "#98D8C8", "#F7DC6F"]
+
+def user(rng: random.Random, user_id: int) -> dict:
+    position = rng.randint(0, DOC_BYTES)
+    return {"user_id": user_id, "username": f"writer {user_id}", "color": COLORS[user_id % len(COLORS)],
+            "cursor_position": position, "selection_start": None, "selection_end": None}
+
+def cursor(rng: random.Random, user_id: int) -> dict:
+    position = rng.randint(0, DOC_BYTES)
+    selecting = rng.random() < 0.2
+    return {"user_id": user_id, "username": f"writer {user_id}", "color": COLORS[user_id % len(COLORS)],
+            "position": position, "selection_start": position - 12 if selecting else None,
+            "selection_end": position if selecting else None}
+
+def make_events(rng: random.Random) -> dict:
+    content = " ".join(rng.choice(WORDS) for _ in range(DOC_BYTES // 6))[:DOC_BYTES]
+    users = [user(rng, i) for i in range(USERS)]
+    events = {"cursor": [], "op": [], "presence": [], "content": []}
+    for i in range(EVENTS):
+        events["cursor"].append({"type": "cursors_update",
+                                 "cursors": [cursor(rng, uid) for uid in rng.sample(range(USERS), rng.randint(1, 3))]})
+        position = rng.randint(0, DOC_BYTES - 1)
+        events["op"].append({"type": "operation", "version": 1000 + i, "op": [position, rng.choice("abcdefgh "), DOC_BYTES - position],
+                             "user_id": rng.randrange(USERS), "username": "writer 3", "cursor_position": position + 1})
+        events["presence"].append({"type": "user_joined", "user_id": 3, "username": "writer 3",
+                                   "color": COLORS[3], "users": users})
+    for i in range(EVENTS // 50):
+        events["content"].append({"type": "room_state", "draft_id": 42, "content": content, "version": 1000 + i,
+                                  "users": users, "your_color": COLORS[1]})
+    return events
+
+def deflated(payloads: list, context_takeover: bool) -> int:
+    """Bytes on the wire after permessage-deflate (raw deflate, sync flush, 4-byte tail stripped)"""
+    total = 0
+    stream = zlib.compressobj(wbits=-15)
+    for payload in payloads:
+        if not context_takeover:
+            stream = zlib.compressobj(wbits=-15)
+        data = payload.encode() if isinstance(payload, str) else payload
+        total += len(stream.compress(data) + stream.flush(zlib.Z_SYNC_FLUSH)) - 4
+    return total
+
+def measure(codec, events: list) -> dict:
+    start = time.perf_counter()
+    payloads = [codec.encode(event) for event in events]
+    encode = time.perf_counter() - start
+    start = time.perf_counter()
+    for payload in payloads:
+        codec.decode(payload)
+    decode = time.perf_counter() - start
+    return {
+        "encode_us": encode / len(events) * 1e6,
+        "decode_us": decode / len(events) * 1e6,
+        "raw": sum(len(p) for p in payloads) / len(events),
+        "deflate": deflated(payloads, False) / len(events),
+        "deflate_ctx": deflated(payloads, True) / len(events),
+    }
+
+def main():
+    events = make_events(random.Random(5))
+    assert all(msgpack_codec.decode(msgpack_codec.encode(e)) == {k: v for k, v in e.items() if v is not None}
+               for e in events["op"][:50])
+    print(f"{'event':<10}{'codec':<9}{'enc us':>8}{'dec us':>8}{'raw B':>10}{'deflate B':>11}{'deflate+ctx B':>15}")
+    for kind, stream in events.items():
+        results = {codec.name: measure(codec, stream) for codec in (json_codec, msgpack_codec)}
+        for name, r in results.items():
+            print(f"{kind:<10}{name:<9}{r['encode_us']:>8.1f}{r['decode_us']:>8.1f}{r['raw']:>10,.0f}"
+                  f"{r['deflate']:>11,.0f}{r['deflate_ctx']:>15,.0f}")
+        j, m = results["json"], results["msgpack"]
+        print(f"{'':<10}{'saving':<9}{'':>16}{1 - m['raw'] / j['raw']:>10.0%}{1 - m['deflate'] / j['deflate']:>11.0%}"
+              f"{1 - m['deflate_ctx'] / j['deflate_ctx']:>15.0%}")
+
+if __name__ == "__main__":
+    main()
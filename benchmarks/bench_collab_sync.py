@@ -0,0 +1,125 @@
+"""
+Collaborative editing sync benchmark
+
+A 50 KB draft edited by 10 users typing concurrently. Each round every user
+types one keystroke (mostly inserts, some backspaces) based on the version
+they saw at the end of the previous round, so the server has to transform
+each op against up to 9 concurrent ones.
+
+Compares, per keystroke:
+- last-write-wins: the full document in a content_update to every peer
+- operational transform: an ack to the author plus the op to every peer
+  (app.core.text_ot.OTDocument.receive)
+
+Reports bytes sent by the server and server CPU (merge + JSON encoding, which
+send_json does once per peer), and checks that every replica converges.
+
+Run from the repo root:
+    PYTHONPATH=src python benchmarks/bench_collab_sync.py [rounds]
+"""
+import json
+import random
+import sys
+import time
+from app.core.text_ot import OTDocument, apply, transform
+
+USERS = 10
+DOC_BYTES = 50_000
+WORDS = "the quarterly plan covers hiring pricing onboarding support and the launch timeline".split()
+
+def make_document(rng: random.Random) -> str:
+    words = []
+    size = 0
+    while size < DOC_BYTES:
+        word = rng.choice(WORDS)
+        words.append(word)
+        size += len(word) + 1
+    return " ".join(words)[:DOC_BYTES]
+
+class Client:
+    """Minimal OT client: one op in flight, local edits buffered behind it"""
+
+    def __init__(self, content: str, version: int):
+        self.content = content
+        self.version = version
+        self.cursor = 0
+
+    def keystroke(self, rng: random.Random) -> list:
+        length = len(self.content)
+        self.cursor = min(max(0, self.cursor + rng.randint(-3, 5)), length)
+        if rng.random() < 0.85 or self.cursor == 0:
+            op = [c for c in (self.cursor, rng.choice("abcdefgh "), length - self.cursor) if c]
+        else:
+            op = [c for c in (self.cursor - 1, -1, length - self.cursor) if c]
+            self.cursor -= 1
+        self.content = apply(self.content, op)
+        return op
+
+    def receive(self, op: list, pending: list = None) -> list:
+        """Apply a server op, transforming it past our unacknowledged op"""
+        if pending is not None:
+            pending, op = transform(pending, op)
+        self.content = apply(self.content, op)
+        self.version += 1
+        return pending
+
+def main():
+    rounds = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    rng = random.Random(17)
+    initial = make_document(rng)
+
+    server = OTDocument(initial, history_limit=10_000)
+    clients = [Client(initial, 0) for _ in range(USERS)]
+    for i, client in enumerate(clients):
+        client.cursor = (i + 1) * len(initial) // (USERS + 1)
+
+    lww_bytes = ot_bytes = 0
+    lww_seconds = ot_seconds = 0.0
+    keystrokes = 0
+
+    for _ in range(rounds):
+        # Everyone types concurrently against the version they last saw
+        sent = [client.keystroke(rng) for client in clients]
+        bases = [client.version for client in clients]
+        pending = list(sent)
+
+        for author, op in enumerate(sent):
+            keystrokes += 1
+
+            # Last-write-wins: author's whole document to every peer
+            start = time.perf_counter()
+            for _peer in range(USERS - 1):
+                lww_bytes += len(json.dumps({
+                    "type": "content_update", "user_id": author, "username": f"user {author}",
+                    "content": clients[author].content, "cursor_position": clients[author].cursor
+                }))
+            lww_seconds += time.perf_counter() - start
+
+            # OT: merge on the server, ack the author, op to every peer
+            start = time.perf_counter()
+            applied = server.receive(bases[author], op)
+            ot_bytes += len(json.dumps({"type": "ack", "version": server.revision}))
+            for _peer in range(USERS - 1):
+                ot_bytes += len(json.dumps({
+                    "type": "operation", "version": server.revision, "op": applied,
+                    "user_id": author, "username": f"user {author}", "cursor_position": clients[author].cursor
+                }))
+            ot_seconds += time.perf_counter() - start
+
+            # Deliver to peers (the author's own op comes back as an ack)
+            for peer, client in enumerate(clients):
+                if peer == author:
+                    pending[peer] = None
+                    client.version += 1
+                else:
+                    pending[peer] = client.receive(applied, pending[peer])
+
+    converged = all(client.content == server.content for client in clients)
+    print(f"draft {len(initial) / 1000:.0f} KB, {USERS} users, {keystrokes} keystrokes, converged: {converged}")
+    print(f"{'':<18}{'bytes/keystroke':>16}{'total MB':>10}{'server us/keystroke':>22}")
+    print(f"{'last-write-wins':<18}{lww_bytes / keystrokes:>16,.0f}{lww_bytes / 1e6:>10.1f}{lww_seconds / keystrokes * 1e6:>22.1f}")
+    print(f"{'operational xform':<18}{ot_bytes / keystrokes:>16,.0f}{ot_bytes / 1e6:>10.1f}{ot_seconds / keystrokes * 1e6:>22.1f}")
+    print(f"bandwidth reduction: {lww_bytes / ot_bytes:.0f}x")
+
+if __name__ == "__main__":
+    main()
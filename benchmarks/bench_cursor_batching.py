@@ -0,0 +1,92 @@
+"""
+Cursor batching benchmark (simulated 20-user room)
+
+Every user moves their cursor ~25 times a second (typing, selecting, mouse
+moves), and a third of those reports repeat the previous position. Replays
+10 simulated seconds of that traffic (virtual time, no sockets) and counts
+what the server sends:
+- per-move: the old update_cursor, one cursor_update to every other peer
+  per cursor message
+- batched: app.core.cursor_batch.CursorBatch, the latest cursor per user,
+  changed ones only, one cursors_update frame per tick to every peer
+
+Run from the repo root:
+    PYTHONPATH=src python benchmarks/bench_cursor_batching.py
+"""
+import json
+import random
+import time
+from app.core.cursor_batch import CursorBatch
+
+USERS = 20
+MOVES_PER_SECOND = 25
+REPEAT_RATE = 0.33
+SECONDS = 10
+FPS_OPTIONS = (10, 20, 30)
+
+def cursor(user_id: int, position: int) -> dict:
+    return {"user_id": user_id, "username": f"user {user_id}", "color": "#4ECDC4",
+            "position": position, "selection_start": None, "selection_end": None}
+
+def make_events(rng: random.Random) -> list:
+    """(time, user_id, position) sorted by time"""
+    events = []
+    for user_id in range(USERS):
+        t = rng.random() / MOVES_PER_SECOND
+        position = rng.randint(0, 50_000)
+        while t < SECONDS:
+            if rng.random() >= REPEAT_RATE:
+                position = max(0, position + rng.randint(-5, 8))
+            events.append((t, user_id, position))
+            t += rng.expovariate(MOVES_PER_SECOND)
+    events.sort()
+    return events
+
+def per_move(events: list) -> tuple[int, int, float]:
+    frames = sent_bytes = 0
+    start = time.perf_counter()
+    for _, user_id, position in events:
+        text = json.dumps({"type": "cursor_update", **cursor(user_id, position)})
+        frames += USERS - 1
+        sent_bytes += len(text) * (USERS - 1)
+    return frames, sent_bytes, time.perf_counter() - start
+
+def batched(events: list, fps: int) -> tuple[int, int, float, dict]:
+    batch = CursorBatch()
+    frames = sent_bytes = 0
+    tick = 1 / fps
+    next_tick = tick
+    start = time.perf_counter()
+
+    def flush():
+        nonlocal frames, sent_bytes
+        cursors = batch.drain()
+        if cursors:
+            text = json.dumps({"type": "cursors_update", "cursors": cursors})
+            frames += USERS
+            sent_bytes += len(text) * USERS
+
+    for t, user_id, position in events:
+        while t >= next_tick:
+            flush()
+            next_tick += tick
+        batch.update(user_id, cursor(user_id, position))
+    flush()
+    return frames, sent_bytes, time.perf_counter() - start, batch.stats
+
+def main():
+    events = make_events(random.Random(11))
+    print(f"{USERS} users, {len(events) / SECONDS:.0f} cursor messages/s in, {SECONDS}s simulated")
+    print(f"{'':<16}{'frames/s out':>14}{'KB/s out':>10}{'server ms/s':>13}{'reduction':>11}")
+
+    base_frames, base_bytes, base_cpu = per_move(events)
+    print(f"{'per-move':<16}{base_frames / SECONDS:>14,.0f}{base_bytes / SECONDS / 1000:>10,.0f}"
+          f"{base_cpu / SECONDS * 1000:>13.2f}{'1.0x':>11}")
+    for fps in FPS_OPTIONS:
+        frames, sent_bytes, cpu, stats = batched(events, fps)
+        print(f"{f'batched {fps} fps':<16}{frames / SECONDS:>14,.0f}{sent_bytes / SECONDS / 1000:>10,.0f}"
+              f"{cpu / SECONDS * 1000:>13.2f}{base_frames / frames:>10.1f}x"
+              f"   ({stats['unchanged']} unchanged, {stats['updates'] - stats['sent'] - stats['unchanged']} superseded)")
+
+if __name__ == "__main__":
+    main()
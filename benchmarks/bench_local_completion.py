@@ -0,0 +1,102 @@
+"""
+Local completion tier offline evaluation
+
+Builds a user's n-gram model from a training split of their drafts and
+queries it at every word boundary of the held-out drafts. Reports:
+- coverage: how often the tier is confident enough to answer
+- next-word accuracy: answered suggestions whose first word is correct
+- full-match accuracy: answered suggestions that are an exact prefix of the real text
+- latency of suggest() and model size
+
+Drafts can be a directory of .txt/.md files; without one, a synthetic corpus
+of templated business writing is generated.
+
+Run from the repo root:
+    PYTHONPATH=src python benchmarks/bench_local_completion.py [drafts_dir]
+"""
+import random
+import statistics
+import sys
+import time
+from pathlib import Path
+from app.services.local_completion import NGramCompletionTier
+
+HELD_OUT_FRACTION = 0.2
+
+OPENERS = ["Hi team,", "Hello everyone,", "Hi all,"]
+PHRASES = [
+    "I hope this email finds you well.",
+    "Thanks for your patience while we worked through this.",
+    "Please let me know if you have any questions.",
+    "As discussed in our last meeting, the timeline is still on track.",
+    "We are planning to ship the next release at the end of the month.",
+    "The main risk is the migration of the billing service.",
+    "I will follow up with a detailed summary tomorrow.",
+    "Looking forward to hearing your thoughts.",
+]
+FILLERS = ["Quick update on {x}.", "Numbers for {x} are attached.", "Notes on {x} below."]
+TOPICS = ["onboarding", "the roadmap", "hiring", "pricing", "the launch", "support volume"]
+
+def synthetic_drafts(count: int, seed: int = 11) -> list[str]:
+    rng = random.Random(seed)
+    drafts = []
+    for _ in range(count):
+        parts = [rng.choice(OPENERS)]
+        for _ in range(rng.randint(4, 9)):
+            if rng.random() < 0.7:
+                parts.append(rng.choice(PHRASES))
+            else:
+                parts.append(rng.choice(FILLERS).format(x=rng.choice(TOPICS)))
+        parts.append("Best regards, Sam")
+        drafts.append(" ".join(parts))
+    return drafts
+
+def load_drafts(path: str) -> list[str]:
+    files = sorted(p for p in Path(path).iterdir() if p.suffix in {".txt", ".md"})
+    return [f.read_text(encoding="utf-8") for f in files]
+
+def evaluate(drafts: list[str]):
+    split = int(len(drafts) * (1 - HELD_OUT_FRACTION))
+    train, held_out = drafts[:split], drafts[split:]
+
+    tier = NGramCompletionTier()
+    start = time.perf_counter()
+    tier.suggest(1, "warm up ", loader=lambda: train)
+    build_ms = (time.perf_counter() - start) * 1000
+
+    queries = answered = next_word_ok = full_ok = 0
+    latencies = []
+
+    for draft in held_out:
+        words = draft.split()
+        for i in range(3, len(words)):
+            context = " ".join(words[:i]) + " "
+            truth = " ".join(words[i:])
+
+            start = time.perf_counter()
+            suggestion = tier.suggest(1, context)
+            latencies.append(time.perf_counter() - start)
+            queries += 1
+
+            if suggestion is None:
+                continue
+            answered += 1
+            if suggestion.split()[0] == words[i]:
+                next_word_ok += 1
+            if truth.startswith(suggestion):
+                full_ok += 1
+
+    latencies.sort()
+    print(f"train drafts:         {len(train)}  held-out drafts: {len(held_out)}")
+    print(f"model build:          {build_ms:.1f} ms, {tier.memory_bytes() / 1024:.1f} KiB")
+    print(f"queries:              {queries}")
+    print(f"coverage:             {answered / queries:.1%}")
+    if answered:
+        print(f"next-word accuracy:   {next_word_ok / answered:.1%}")
+        print(f"full-match accuracy:  {full_ok / answered:.1%}")
+    print(f"latency mean:         {statistics.mean(latencies) * 1e6:.1f} us")
+    print(f"latency p99:          {latencies[int(len(latencies) * 0.99)] * 1e6:.1f} us")
+
+if __name__ == "__main__":
+    drafts = load_drafts(sys.argv[1]) if len(sys.argv) > 1 else synthetic_drafts(300)
+    evaluate(drafts)
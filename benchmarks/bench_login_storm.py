@@ -0,0 +1,85 @@
+"""
+Login storm load test
+
+Measures the latency of an ordinary sync endpoint (GET /api/users/active-persona)
+while a burst of concurrent logins runs against the same server. With bcrypt on
+the request threadpool the probe latency climbs with the storm; with the
+password hashing pool it should stay flat. The /api/auth/hashing/stats queue
+metrics are printed at the end.
+
+Start the API first with the auth limit raised, e.g.:
+    RATE_LIMIT_AUTH=100000/minute uvicorn app.main:app --app-dir src
+
+Then run from the repo root:
+    python benchmarks/bench_login_storm.py [base_url] [concurrent_logins]
+"""
+import asyncio
+import statistics
+import sys
+import time
+import uuid
+import httpx
+
+PROBES = 200
+PROBE_INTERVAL = 0.02
+
+async def register(client: httpx.AsyncClient) -> tuple[str, str, str]:
+    name = f"storm-{uuid.uuid4().hex[:10]}"
+    email, password = f"{name}@example.com", "correct horse battery staple"
+    response = await client.post("/api/auth/register", json={"username": name, "email": email, "password": password})
+    response.raise_for_status()
+    return email, password, response.json()["access_token"]
+
+async def probe(client: httpx.AsyncClient, token: str, stop: asyncio.Event) -> list[float]:
+    latencies = []
+    headers = {"Authorization": f"Bearer {token}"}
+    while not stop.is_set() and len(latencies) < PROBES:
+        start = time.perf_counter()
+        response = await client.get("/api/users/active-persona", headers=headers)
+        response.raise_for_status()
+        latencies.append(time.perf_counter() - start)
+        await asyncio.sleep(PROBE_INTERVAL)
+    return latencies
+
+async def storm(client: httpx.AsyncClient, email: str, password: str, count: int) -> dict:
+    async def login():
+        response = await client.post("/api/auth/login", json={"email": email, "password": password})
+        return response.status_code
+
+    start = time.perf_counter()
+    statuses = await asyncio.gather(*(login() for _ in range(count)))
+    return {
+        "seconds": time.perf_counter() - start,
+        "ok": statuses.count(200),
+        "busy": statuses.count(503),
+        "rate_limited": statuses.count(429)
+    }
+
+def summarize(label: str, latencies: list[float]):
+    latencies = sorted(latencies)
+    print(f"{label:<14} n={len(latencies):<4} p50 {statistics.median(latencies) * 1000:7.1f} ms"
+          f"   p99 {latencies[int(len(latencies) * 0.99)] * 1000:7.1f} ms")
+
+async def main():
+    base_url = sys.argv[1] if len(sys.argv) > 1 else "http://localhost:8000"
+    logins = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    limits = httpx.Limits(max_connections=logins + 10)
+
+    async with httpx.AsyncClient(base_url=base_url, timeout=120, limits=limits) as client:
+        email, password, token = await register(client)
+
+        summarize("idle", await probe(client, token, asyncio.Event()))
+
+        stop = asyncio.Event()
+        probe_task = asyncio.create_task(probe(client, token, stop))
+        result = await storm(client, email, password, logins)
+        stop.set()
+        summarize(f"{logins} logins", await probe_task)
+
+        print(f"storm: {result['seconds']:.1f}s, {result['ok']} ok, {result['busy']} busy (503), "
+              f"{result['rate_limited']} rate limited (429)")
+        stats = await client.get("/api/auth/hashing/stats", headers={"Authorization": f"Bearer {token}"})
+        print("hashing pool:", stats.json())
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,93 @@
+"""
+Neo4j schema benchmark (1M personas)
+
+Seeds a Neo4j instance with synthetic users, personas and topics, then times
+the hot lookups with and without the schema constraints from
+app.db.neo4j_schema:
+- MATCH (p:Persona {id: $id}) + relationship projection (get_persona)
+- MERGE (u:User {id: $id})
+- MERGE (t:Topic {name: $name})
+
+Uses NEO4J_URI / NEO4J_USER / NEO4J_PASSWORD. Seeding 1M personas takes a
+few minutes; point this at a disposable database.
+
+Run from the repo root:
+    PYTHONPATH=src python benchmarks/bench_neo4j_schema.py [persona_count]
+"""
+import random
+import statistics
+import sys
+import time
+from app.db.neo4j_connection import driver
+from app.db.neo4j_schema import SCHEMA_STATEMENTS, ensure_neo4j_schema
+from app.db.repositories.persona_repository import GET_PERSONA_QUERY
+
+BATCH_SIZE = 10000
+USERS = 50000
+TOPICS = 500
+SAMPLES = 500
+
+SEED_QUERY = """
+UNWIND $rows AS row
+MERGE (u:User {id: row.user_id})
+CREATE (p:Persona {id: row.id, name: row.name, version: 1})
+CREATE (u)-[:owns_persona]->(p)
+WITH p, row
+MERGE (t:Topic {name: row.topic})
+CREATE (p)-[:targets_topic]->(t)
+"""
+
+def drop_schema(session):
+    for record in session.run("SHOW CONSTRAINTS YIELD name"):
+        session.run(f"DROP CONSTRAINT {record['name']} IF EXISTS").consume()
+
+def seed(session, count: int):
+    session.run("MATCH (n) CALL { WITH n DETACH DELETE n } IN TRANSACTIONS OF 10000 ROWS").consume()
+    for start in range(0, count, BATCH_SIZE):
+        rows = [
+            {
+                "id": f"persona-{i}",
+                "name": f"Persona {i}",
+                "user_id": i % USERS,
+                "topic": f"topic-{i % TOPICS}"
+            }
+            for i in range(start, min(start + BATCH_SIZE, count))
+        ]
+        session.run(SEED_QUERY, rows=rows).consume()
+
+def time_queries(session, label: str, count: int):
+    rng = random.Random(3)
+    cases = {
+        "get_persona": lambda: session.run(GET_PERSONA_QUERY, persona_id=f"persona-{rng.randrange(count)}").consume(),
+        "merge_user": lambda: session.run("MERGE (u:User {id: $id})", id=rng.randrange(USERS)).consume(),
+        "merge_topic": lambda: session.run("MERGE (t:Topic {name: $n})", n=f"topic-{rng.randrange(TOPICS)}").consume(),
+    }
+    for name, fn in cases.items():
+        latencies = []
+        for _ in range(SAMPLES):
+            start = time.perf_counter()
+            fn()
+            latencies.append(time.perf_counter() - start)
+        latencies.sort()
+        print(f"{label:<18} {name:<12} p50 {statistics.median(latencies) * 1000:8.2f} ms"
+              f"   p99 {latencies[int(len(latencies) * 0.99)] * 1000:8.2f} ms")
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    with driver.session() as session:
+        drop_schema(session)
+        # Seed with the constraints in place (MERGE without them is quadratic)
+        ensure_neo4j_schema()
+        start = time.perf_counter()
+        seed(session, count)
+        print(f"seeded {count} personas in {time.perf_counter() - start:.1f}s")
+
+        drop_schema(session)
+        time_queries(session, "no constraints", count)
+
+        ensure_neo4j_schema()
+        time_queries(session, f"{len(SCHEMA_STATEMENTS)} constraints", count)
+    driver.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""
+Persona vocabulary deduplication benchmark
+
+Seeds personas the old way (a fresh Audience / Purpose / BannedWord node per
+persona), measures graph size and query latency, applies
+migrations/dedupe_persona_vocabulary.cypher, and measures again.
+
+Uses NEO4J_URI / NEO4J_USER / NEO4J_PASSWORD; point it at a disposable
+database.
+
+Run from the repo root:
+    PYTHONPATH=src python benchmarks/bench_persona_vocabulary.py [persona_count]
+"""
+import random
+import statistics
+import sys
+import time
+from pathlib import Path
+from app.db.neo4j_connection import driver
+from app.db.repositories.persona_repository import GET_PERSONA_QUERY
+
+MIGRATION = Path(__file__).resolve().parent.parent / "migrations" / "dedupe_persona_vocabulary.cypher"
+BATCH_SIZE = 5000
+SAMPLES = 300
+
+AUDIENCES = ["general", "developers", "executives", "students"]
+PURPOSES = ["blog", "email", "docs", "social"]
+BANNED = ["very", "obviously", "just", "really", "basically", "literally"]
+
+# Mirrors the pre-dedupe create_persona: vocabulary nodes are CREATEd per persona
+LEGACY_SEED_QUERY = """
+UNWIND $rows AS row
+CREATE (p:Persona {id: row.id, name: row.name, version: 1})
+CREATE (a:Audience {type: row.audience})
+CREATE (p)-[:targets_audience]->(a)
+CREATE (pur:Purpose {type: row.purpose})
+CREATE (p)-[:for_purpose]->(pur)
+FOREACH (word IN row.banned |
+    CREATE (bw:BannedWord {text: word})
+    CREATE (p)-[:bans_word]->(bw)
+)
+"""
+
+SHARED_AUDIENCE_QUERY = """
+MATCH (p:Persona)-[:targets_audience]->(:Audience {type: $audience})
+RETURN count(p)
+"""
+
+def seed(session, count: int):
+    rng = random.Random(5)
+    session.run("MATCH (n) CALL { WITH n DETACH DELETE n } IN TRANSACTIONS OF 10000 ROWS").consume()
+    for start in range(0, count, BATCH_SIZE):
+        rows = [
+            {
+                "id": f"persona-{i}",
+                "name": f"Persona {i}",
+                "audience": rng.choice(AUDIENCES),
+                "purpose": rng.choice(PURPOSES),
+                "banned": rng.sample(BANNED, 3)
+            }
+            for i in range(start, min(start + BATCH_SIZE, count))
+        ]
+        session.run(LEGACY_SEED_QUERY, rows=rows).consume()
+
+def graph_size(session) -> tuple[int, int]:
+    nodes = session.run("MATCH (n) RETURN count(n) AS c").single()["c"]
+    rels = session.run("MATCH ()-[r]->() RETURN count(r) AS c").single()["c"]
+    return nodes, rels
+
+def latency(fn) -> tuple[float, float]:
+    samples = []
+    for _ in range(SAMPLES):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    samples.sort()
+    return statistics.median(samples) * 1000, samples[int(len(samples) * 0.99)] * 1000
+
+def report(session, label: str, count: int):
+    rng = random.Random(9)
+    nodes, rels = graph_size(session)
+    get_p50, get_p99 = latency(
+        lambda: session.run(GET_PERSONA_QUERY, persona_id=f"persona-{rng.randrange(count)}").consume()
+    )
+    aud_p50, aud_p99 = latency(
+        lambda: session.run(SHARED_AUDIENCE_QUERY, audience=rng.choice(AUDIENCES)).consume()
+    )
+    print(f"[{label}] nodes {nodes:,}  relationships {rels:,}")
+    print(f"[{label}] get_persona       p50 {get_p50:7.2f} ms  p99 {get_p99:7.2f} ms")
+    print(f"[{label}] personas/audience p50 {aud_p50:7.2f} ms  p99 {aud_p99:7.2f} ms")
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    with driver.session() as session:
+        session.run("CREATE CONSTRAINT persona_id_unique IF NOT EXISTS FOR (p:Persona) REQUIRE p.id IS UNIQUE").consume()
+        seed(session, count)
+        report(session, "before", count)
+
+        start = time.perf_counter()
+        for statement in MIGRATION.read_text().split(";"):
+            body = "\n".join(line for line in statement.splitlines() if not line.strip().startswith("//"))
+            if body.strip():
+                session.run(body).consume()
+        print(f"migration took {time.perf_counter() - start:.1f}s")
+
+        report(session, "after", count)
+    driver.close()
+
+if __name__ == "__main__":
+    main()
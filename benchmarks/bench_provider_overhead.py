@@ -0,0 +1,39 @@
+"""
+Per-request provider overhead benchmark
+
+Compares building a fresh genai.Client per request (old behaviour) against
+reusing the shared client from the provider registry. No network calls are
+made; this measures object/pool construction cost only.
+
+Run from the repo root:
+    PYTHONPATH=src python benchmarks/bench_provider_overhead.py
+"""
+import os
+import time
+import google.genai as genai
+
+os.environ.setdefault("GOOGLE_API_KEY", "bench-key")
+
+from app.core.providers import ProviderRegistry
+from app.services.autocomplete_service import AutocompleteService
+
+ITERATIONS = 2000
+
+def bench(label: str, fn, iterations: int = ITERATIONS):
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    elapsed = time.perf_counter() - start
+    print(f"{label:<40} {elapsed / iterations * 1e6:10.1f} us/request")
+
+def main():
+    registry = ProviderRegistry()
+    shared = registry.genai
+
+    bench("per-request genai.Client", lambda: AutocompleteService(client=genai.Client(api_key="bench-key")))
+    bench("shared client from registry", lambda: AutocompleteService(client=shared))
+
+    registry.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""
+Rate limiter throughput benchmark
+
+Measures acquire() throughput and latency of the token bucket backends:
+- local (in-process), single thread and 8 threads
+- Redis (atomic Lua script), if REDIS_URL is set
+
+Keys are spread over a population of users like real traffic, with a mix of
+plain (cost 1) and cost-weighted acquires.
+
+Run from the repo root:
+    PYTHONPATH=src python benchmarks/bench_rate_limiter.py [operations]
+"""
+import os
+import random
+import statistics
+import sys
+import threading
+import time
+from app.core.token_bucket import LocalTokenBucket, RedisTokenBucket, parse_rate
+
+USERS = 500
+THREADS = 8
+COUNT_LIMIT = parse_rate("60/minute")
+TOKEN_LIMIT = parse_rate("30000/minute")
+
+def workload(count: int, seed: int) -> list[tuple[str, tuple, int]]:
+    rng = random.Random(seed)
+    ops = []
+    for _ in range(count):
+        user = rng.randrange(USERS)
+        if rng.random() < 0.5:
+            ops.append((f"autocomplete:user:{user}", COUNT_LIMIT, 1))
+        else:
+            ops.append((f"autocomplete_tokens:user:{user}", TOKEN_LIMIT, rng.randint(20, 400)))
+    return ops
+
+def run(backend, ops) -> tuple[list[float], int]:
+    latencies = []
+    allowed = 0
+    for key, (capacity, refill), cost in ops:
+        start = time.perf_counter()
+        decision = backend.acquire(key, capacity, refill, cost)
+        latencies.append(time.perf_counter() - start)
+        allowed += decision.allowed
+    return latencies, allowed
+
+def report(label: str, ops_count: int, seconds: float, latencies: list[float], allowed: int):
+    latencies.sort()
+    print(f"{label:<20} {ops_count / seconds:>11,.0f} ops/s   "
+          f"p50 {statistics.median(latencies) * 1e6:7.1f} us   p99 {latencies[int(len(latencies) * 0.99)] * 1e6:7.1f} us   "
+          f"allowed {allowed / ops_count:.1%}")
+
+def single(label: str, backend, count: int):
+    ops = workload(count, 1)
+    start = time.perf_counter()
+    latencies, allowed = run(backend, ops)
+    report(label, count, time.perf_counter() - start, latencies, allowed)
+
+def threaded(label: str, backend, count: int):
+    per_thread = count // THREADS
+    results = [None] * THREADS
+
+    def worker(i):
+        results[i] = run(backend, workload(per_thread, i))
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(THREADS)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    seconds = time.perf_counter() - start
+
+    latencies = [l for lat, _ in results for l in lat]
+    report(label, per_thread * THREADS, seconds, latencies, sum(a for _, a in results))
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    single("local, 1 thread", LocalTokenBucket(), count)
+    threaded(f"local, {THREADS} threads", LocalTokenBucket(), count)
+
+    if os.getenv("REDIS_URL"):
+        redis_count = min(count, 20_000)
+        backend = RedisTokenBucket(prefix="bench-ratelimit")
+        backend.reset()
+        single("redis, 1 thread", backend, redis_count)
+        threaded(f"redis, {THREADS} threads", backend, redis_count)
+        backend.reset()
+    else:
+        print("REDIS_URL not set; skipping the Redis backend")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""
+SSE streaming benchmark (1,000-token model reply)
+
+Streams a reply of small token chunks (1-8 characters, like a model's
+token-by-token output) through:
+- per-token: the old endpoints, one f-string json.dumps frame per chunk
+- sse: app.core.sse.sse_response (SSE_BATCH_MS coalescing, ids, one write per
+  wake-up), with orjson when installed and with the json fallback
+
+at three upstream rates: a burst (chunks already buffered), 1,000 and 200
+chunks/s. Every write goes through a local socket pair, as the server's
+would. Reports process CPU per 1k tokens spent on streaming (encoding,
+framing, batching timers, writes and the reading end; the CPU of draining
+the simulated upstream alone is measured separately and subtracted), SSE
+frames, socket writes and bytes.
+
+Run from the repo root:
+    PYTHONPATH=src python benchmarks/bench_sse_streaming.py
+"""
+import asyncio
+import json
+import random
+import socket
+import time
+from app.core import sse
+
+TOKENS = 1000
+# Best of this many runs (burst, paced)
+REPEATS = (5, 3)
+RATES = {"burst": 0, "1000/s": 1000, "200/s": 200}
+WORDS = "the quarterly plan covers hiring pricing onboarding support and the launch timeline".split()
+
+def make_tokens(rng: random.Random) -> list:
+    tokens = []
+    while len(tokens) < TOKENS:
+        word = rng.choice(WORDS) + " "
+        while word and len(tokens) < TOKENS:
+            size = rng.randint(1, 8)
+            tokens.append(word[:size])
+            word = word[size:]
+    return tokens
+
+async def source(tokens: list, rate: int):
+    yield {"type": "status", "content": "Generating..."}
+    for token in tokens:
+        if rate:
+            await asyncio.sleep(1 / rate)
+        yield {"type": "content", "content": token}
+    yield {"type": "done", "chat_id": 1, "citations": [], "mode": "ask"}
+
+async def upstream_only(tokens: list, rate: int) -> tuple[int, int, int]:
+    async for _ in source(tokens, rate):
+        pass
+    return 0, 0, 0
+
+async def send_all(body) -> tuple[int, int, int]:
+    """Write each body chunk to a socket pair as its own write; (frames, writes, bytes)"""
+    server, client = socket.socketpair()
+    reader, client_writer = await asyncio.open_connection(sock=client)
+    _, writer = await asyncio.open_connection(sock=server)
+
+    async def drain_reader():
+        while await reader.read(65536):
+            pass
+
+    receiving = asyncio.create_task(drain_reader())
+    frames = writes = sent_bytes = 0
+    async for chunk in body:
+        data = chunk.encode() if isinstance(chunk, str) else chunk
+        writer.write(data)
+        await writer.drain()
+        writes += 1
+        sent_bytes += len(data)
+        frames += data.count(b"data: ")
+    writer.close()
+    await receiving
+    client_writer.close()
+    return frames, writes, sent_bytes
+
+async def per_token(tokens: list, rate: int) -> tuple[int, int, int]:
+    async def generate():
+        async for event in source(tokens, rate):
+            yield f"data: {json.dumps(event)}\n\n"
+
+    return await send_all(generate())
+
+async def batched(tokens: list, rate: int) -> tuple[int, int, int]:
+    return await send_all(sse.sse_response(source(tokens, rate)).body_iterator)
+
+def measure(run, tokens: list, rate: int, upstream_ms: float = 0.0) -> dict:
+    best = None
+    for _ in range(REPEATS[1] if rate else REPEATS[0]):
+        start = time.process_time()
+        frames, writes, sent_bytes = asyncio.run(run(tokens, rate))
+        cpu = time.process_time() - start
+        best = cpu if best is None else min(best, cpu)
+    cpu_ms = best * 1000 / (TOKENS / 1000) - upstream_ms
+    return {"cpu_ms": cpu_ms, "frames": frames, "writes": writes, "bytes": sent_bytes}
+
+def main():
+    tokens = make_tokens(random.Random(3))
+    encoders = [("sse orjson", sse.orjson), ("sse json", None)] if sse.orjson is not None else [("sse json", None)]
+    print(f"{TOKENS} tokens, {sse.SSE_BATCH_MS:.0f} ms batch window")
+    print(f"{'rate':<9}{'path':<13}{'stream CPU ms/1k tok':>22}{'frames':>9}{'writes':>9}{'KB':>8}")
+    for label, rate in RATES.items():
+        upstream = measure(upstream_only, tokens, rate)["cpu_ms"]
+        base = measure(per_token, tokens, rate, upstream)
+        print(f"{label:<9}{'per-token':<13}{base['cpu_ms']:>22.2f}{base['frames']:>9,}{base['writes']:>9,}"
+              f"{base['bytes'] / 1000:>8.1f}")
+        for name, encoder in encoders:
+            sse.orjson = encoder
+            r = measure(batched, tokens, rate, upstream)
+            print(f"{'':<9}{name:<13}{r['cpu_ms']:>22.2f}{r['frames']:>9,}{r['writes']:>9,}{r['bytes'] / 1000:>8.1f}"
+                  f"   ({base['frames'] / r['frames']:.0f}x fewer frames, {base['cpu_ms'] / r['cpu_ms']:.1f}x less CPU)")
+        sse.orjson = encoders[0][1]
+
+if __name__ == "__main__":
+    main()
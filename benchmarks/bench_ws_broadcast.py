@@ -0,0 +1,131 @@
+"""
+Collaboration broadcast benchmark (100 peers, some slow or dead)
+
+Simulated sockets in one room:
+- 90 healthy peers
+- 8 slow peers (50 ms per frame, slower than the broadcast rate)
+- 2 half-dead peers (a send hangs for 2 s, then fails)
+
+Broadcasts a stream of op frames at 100 messages/s and measures how long
+healthy peers wait for each frame:
+- sequential: the old broadcast_to_room (json per peer, await each send)
+- outbox: serialize once, per-connection bounded queue + writer task
+  (app.core.ws_outbox), overflow -> resync, failed/timed-out -> evicted
+
+Run from the repo root:
+    PYTHONPATH=src python benchmarks/bench_ws_broadcast.py
+"""
+import asyncio
+import json
+import random
+import statistics
+import time
+from app.core.ws_outbox import Outbox
+
+HEALTHY, SLOW, DEAD = 90, 8, 2
+RATE = 100  # broadcasts per second
+SEQUENTIAL_MESSAGES = 10  # every sequential broadcast waits on the dead peers
+OUTBOX_MESSAGES = 500
+
+class FakeSocket:
+    def __init__(self, kind: str, latencies: list):
+        self.kind = kind
+        self.latencies = latencies
+        self.frames = 0
+
+    async def send_text(self, text: str):
+        if self.kind == "slow":
+            await asyncio.sleep(0.05)
+        elif self.kind == "dead":
+            await asyncio.sleep(2)
+            raise ConnectionError("peer stopped reading")
+        else:
+            await asyncio.sleep(0)
+            sent_at = json.loads(text).get("sent_at")
+            if sent_at is not None:
+                self.latencies.append(time.perf_counter() - sent_at)
+        self.frames += 1
+
+    async def send_json(self, message: dict):
+        await self.send_text(json.dumps(message))
+
+def make_peers(latencies: list) -> list[FakeSocket]:
+    peers = ([FakeSocket("healthy", latencies) for _ in range(HEALTHY)]
+             + [FakeSocket("slow", latencies) for _ in range(SLOW)]
+             + [FakeSocket("dead", latencies) for _ in range(DEAD)])
+    random.Random(4).shuffle(peers)
+    return peers
+
+def message(i: int, due: float) -> dict:
+    # Latency is measured from when the frame was due, so backlog counts
+    return {"type": "operation", "version": i, "op": [1200, "x", 48800], "user_id": 1,
+            "username": "user 1", "cursor_position": 1201, "sent_at": due}
+
+async def pace(start: float, i: int) -> float:
+    """Wait for the i-th broadcast slot at RATE/s; returns its due time"""
+    due = start + i / RATE
+    delay = due - time.perf_counter()
+    if delay > 0:
+        await asyncio.sleep(delay)
+    return due
+
+def summarize(label: str, latencies: list, seconds: float, messages: int, extra: str = ""):
+    latencies = sorted(latencies)
+    print(f"{label:<11} {messages:>4} msgs in {seconds:6.2f}s  healthy-peer latency "
+          f"p50 {statistics.median(latencies) * 1000:8.1f} ms  p99 {latencies[int(len(latencies) * 0.99)] * 1000:8.1f} ms  {extra}")
+
+async def sequential():
+    latencies = []
+    peers = make_peers(latencies)
+    start = time.perf_counter()
+    for i in range(SEQUENTIAL_MESSAGES):
+        msg = message(i, await pace(start, i))
+        for peer in peers:
+            try:
+                await peer.send_json(msg)
+            except Exception:
+                pass  # old behaviour: swallowed, peer kept forever
+    summarize("sequential", latencies, time.perf_counter() - start, SEQUENTIAL_MESSAGES,
+              f"serializations {SEQUENTIAL_MESSAGES * len(peers)}")
+
+async def outboxes():
+    latencies = []
+    peers = make_peers(latencies)
+    evicted = []
+    resyncs = 0
+
+    async def evict(outbox):
+        evicted.append(outbox)
+
+    boxes = []
+    for peer in peers:
+        box = Outbox(peer, max_size=64, send_timeout=1.0)
+        box.on_close = lambda error, box=box: evict(box)
+        box.start()
+        boxes.append(box)
+
+    start = time.perf_counter()
+    for i in range(OUTBOX_MESSAGES):
+        text = json.dumps(message(i, await pace(start, i)))
+        for box in boxes:
+            if not box.send(text) and not box.closed:
+                resyncs += 1
+                box.reset(json.dumps({"type": "resync", "version": i}))
+
+    # Let healthy queues drain
+    while any(box.pending() for box, peer in zip(boxes, peers) if peer.kind == "healthy"):
+        await asyncio.sleep(0.01)
+    seconds = time.perf_counter() - start
+    for box in boxes:
+        box.close()
+
+    summarize("outbox", latencies, seconds, OUTBOX_MESSAGES,
+              f"serializations {OUTBOX_MESSAGES}, resyncs {resyncs}, evicted {len(evicted)}")
+
+async def main():
+    print(f"{HEALTHY} healthy, {SLOW} slow, {DEAD} dead peers at {RATE} broadcasts/s")
+    await sequential()
+    await outboxes()
+
+if __name__ == "__main__":
+    asyncio.run(main())
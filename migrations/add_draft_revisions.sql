@@ -0,0 +1,23 @@
+-- Migration: Draft revision history
+-- Date: 2026-10-19
+-- Description: Add drafts.revision and the draft_revisions table (zlib-compressed
+-- deltas with periodic full snapshots). Existing drafts get their revision 0
+-- snapshot written on their first content change.
+
+ALTER TABLE drafts ADD COLUMN IF NOT EXISTS revision INTEGER NOT NULL DEFAULT 0;
+
+CREATE TABLE IF NOT EXISTS draft_revisions (
+    id SERIAL PRIMARY KEY,
+    draft_id INTEGER NOT NULL REFERENCES drafts(id) ON DELETE CASCADE,
+    revision INTEGER NOT NULL,
+    kind VARCHAR(10) NOT NULL,
+    data BYTEA NOT NULL,
+    content_length INTEGER NOT NULL,
+    user_id INTEGER NULL REFERENCES users(id),
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    CONSTRAINT uq_draft_revision UNIQUE (draft_id, revision)
+);
+
+-- Add comments
+COMMENT ON COLUMN drafts.revision IS 'Bumped on every content change; delta updates must be based on it';
+COMMENT ON COLUMN draft_revisions.kind IS 'snapshot (full content) or delta (op from the previous revision)';
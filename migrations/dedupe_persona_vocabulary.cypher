@@ -0,0 +1,50 @@
+// Migration: Deduplicate shared persona vocabulary nodes in Neo4j
+// Date: 2026-10-19
+// Description: Personas used to CREATE their own Audience, Purpose and BannedWord
+// nodes. Collapse duplicates onto one canonical node per value (re-pointing
+// relationships) so the uniqueness constraints in app/db/neo4j_schema.py can
+// be created. Run once with cypher-shell before deploying, e.g.
+//   cypher-shell -u neo4j -p password -f migrations/dedupe_persona_vocabulary.cypher
+
+MATCH (a:Audience)
+WITH a.type AS type, collect(a) AS nodes
+WHERE size(nodes) > 1
+WITH head(nodes) AS keep, tail(nodes) AS dupes
+UNWIND dupes AS dupe
+CALL {
+    WITH keep, dupe
+    MATCH (p:Persona)-[r:targets_audience]->(dupe)
+    MERGE (p)-[:targets_audience]->(keep)
+    DELETE r
+}
+DETACH DELETE dupe;
+
+MATCH (pur:Purpose)
+WITH pur.type AS type, collect(pur) AS nodes
+WHERE size(nodes) > 1
+WITH head(nodes) AS keep, tail(nodes) AS dupes
+UNWIND dupes AS dupe
+CALL {
+    WITH keep, dupe
+    MATCH (p:Persona)-[r:for_purpose]->(dupe)
+    MERGE (p)-[:for_purpose]->(keep)
+    DELETE r
+}
+DETACH DELETE dupe;
+
+MATCH (bw:BannedWord)
+WITH bw.text AS text, collect(bw) AS nodes
+WHERE size(nodes) > 1
+WITH head(nodes) AS keep, tail(nodes) AS dupes
+UNWIND dupes AS dupe
+CALL {
+    WITH keep, dupe
+    MATCH (p:Persona)-[r:bans_word]->(dupe)
+    MERGE (p)-[:bans_word]->(keep)
+    DELETE r
+}
+DETACH DELETE dupe;
+
+CREATE CONSTRAINT audience_type_unique IF NOT EXISTS FOR (a:Audience) REQUIRE a.type IS UNIQUE;
+CREATE CONSTRAINT purpose_type_unique IF NOT EXISTS FOR (p:Purpose) REQUIRE p.type IS UNIQUE;
+CREATE CONSTRAINT banned_word_text_unique IF NOT EXISTS FOR (bw:BannedWord) REQUIRE bw.text IS UNIQUE;
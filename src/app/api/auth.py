@@ -1,25 +1,29 @@
 from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
 from app.db.database import get_db
 from app.db.repositories.user_repository import UserRepository
 from sqlalchemy.orm import Session
 from app.schemas.auth import RegisterRequest, LoginRequest, AuthResponse
 from app.services.auth_service import AuthService
+from app.services.password_hasher import password_hasher
 from app.core.neo4j_dependency import get_neo4j_db
-from app.core.exceptions import AuthException, ValidationException
+from app.core.exceptions import AppException, AuthException, ValidationException
 from app.core.error_codes import AUTH_001, AUTH_002
 from app.core.logger import logger
 from app.core.rate_limiter import limiter, RATE_LIMITS
+from app.core.security import get_current_user
 
 auth_router = APIRouter()
 
 @auth_router.post("/register", response_model=AuthResponse)
 @limiter.limit(RATE_LIMITS["auth"])
-def register(request: Request, register_data: RegisterRequest, db: Session = Depends(get_db), neo4j_db = Depends(get_neo4j_db)):
+async def register(request: Request, register_data: RegisterRequest, db: Session = Depends(get_db), neo4j_db = Depends(get_neo4j_db)):
+    # Async so the bcrypt wait doesn't hold a threadpool slot; DB calls go to the threadpool
     try:
         user_repo = UserRepository(db, neo4j_db)
 
         # Check for duplicate email
-        existing_user = user_repo.get_user_by_email(register_data.email)
+        existing_user = await run_in_threadpool(user_repo.get_user_by_email, register_data.email)
         if existing_user:
             raise AuthException(
                 message="Email already registered",
@@ -28,7 +32,7 @@ def register(request: Request, register_data: RegisterRequest, db: Session = Dep
             )
         
         # Check for duplicate username
-        existing_username = user_repo.get_user_by_username(register_data.username)
+        existing_username = await run_in_threadpool(user_repo.get_user_by_username, register_data.username)
         if existing_username:
             raise AuthException(
                 message="Username already taken",
@@ -36,16 +40,18 @@ def register(request: Request, register_data: RegisterRequest, db: Session = Dep
                 status_code=400
             )
         
-        new_user = user_repo.create_user(
+        password_hash = await password_hasher.hash(register_data.password)
+        new_user = await run_in_threadpool(
+            user_repo.create_user,
             username=register_data.username,
             email=register_data.email,
-            password=register_data.password
+            password_hash=password_hash
         )
-        token = AuthService.create_access_token(new_user.id)
+        token = AuthService.create_access_token(new_user.id, new_user.username)
         logger.info(f"User registered: {new_user.email}")
         return AuthResponse(user_id=new_user.id, access_token=token)
     
-    except AuthException:
+    except AppException:
         raise
     except Exception as e:
         logger.error(f"Registration error: {str(e)}")
@@ -57,21 +63,31 @@ def register(request: Request, register_data: RegisterRequest, db: Session = Dep
 
 @auth_router.post("/login", response_model=AuthResponse)
 @limiter.limit(RATE_LIMITS["auth"])
-def login(request: Request, login_data: LoginRequest, db: Session = Depends(get_db)):
+async def login(request: Request, login_data: LoginRequest, db: Session = Depends(get_db)):
     try:
         user_repo = UserRepository(db, None)
-        user = user_repo.get_user_by_email(login_data.email)
+        user = await run_in_threadpool(user_repo.get_user_by_email, login_data.email)
 
-        if not user or not AuthService.verify_password(login_data.password, user.password):
+        if not user or not await password_hasher.verify(login_data.password, user.password):
             raise AuthException(
                 message="Invalid credentials",
                 code=AUTH_001,
                 status_code=401
             )
-        
-        token = AuthService.create_access_token(user.id)
+
+        # Upgrade hashes made with an older BCRYPT_ROUNDS while we have the plain password
+        if password_hasher.needs_rehash(user.password):
+            try:
+                new_hash = await password_hasher.hash(login_data.password)
+                await run_in_threadpool(user_repo.update_password_hash, user, new_hash)
+                password_hasher.stats["rehashed"] += 1
+            except Exception as e:
+                logger.warning(f"Password rehash failed for user {user.id}: {e}")
+
+        user_repo.cache_active_persona(user)
+        token = AuthService.create_access_token(user.id, user.username)
         return AuthResponse(user_id=user.id, access_token=token)
-    except AuthException:
+    except AppException:
         raise
     except Exception as e:
         logger.error(f"Login error: {str(e)}")
@@ -79,4 +95,9 @@ def login(request: Request, login_data: LoginRequest, db: Session = Depends(get_
             message="Login failed",
             code="LOGIN_ERROR",
             status_code=500
-        )
\ No newline at end of file
+        )
+
+@auth_router.get("/hashing/stats")
+async def hashing_stats(user_id: int = Depends(get_current_user)):
+    """Password hashing pool queue metrics"""
+    return password_hasher.get_stats()
@@ -4,35 +4,60 @@ Autocomplete API Endpoint
 Provides real-time text completion suggestions for the writing editor.
 Supports streaming for faster perceived response time.
 """
-import json
+import google.genai as genai
 from fastapi import APIRouter, Depends, Request
-from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
-from neo4j import Session as Neo4jSession
+from neo4j import AsyncSession as Neo4jAsyncSession
 from app.schemas.autocomplete import AutocompleteRequest, AutocompleteResponse
 from app.services.autocomplete_service import AutocompleteService
+from app.services.suggestion_cache import suggestion_cache
+from app.services.local_completion import local_completion
 from app.db.database import get_db
-from app.db.repositories.persona_repository import PersonaRepository
+from app.db.repositories.persona_repository import AsyncPersonaRepository
+from app.db.repositories.draft_repository import DraftRepository
 from app.core.security import get_current_user
-from app.core.neo4j_dependency import get_neo4j_db
+from app.core.neo4j_dependency import get_async_neo4j_db
+from app.core.providers import get_genai_client
+from app.core.autocomplete_sessions import autocomplete_sessions
 from app.core.rate_limiter import limiter, RATE_LIMITS
+from app.core.token_quota import token_quota, estimate_tokens
 from app.core.exceptions import ValidationException
+from app.core.sse import sse_response, resume_sse
 
 autocomplete_router = APIRouter()
 
+async def charge_model_tokens(request: Request, autocomplete_data: AutocompleteRequest, user_id: int):
+    """
+    Spend the token-weighted limit (prompt + completion). Only requests that
+    reach the model pay it; cache and local answers cost no model tokens.
+    """
+    await limiter.check_async(
+        request, RATE_LIMITS["autocomplete_tokens"], "autocomplete_tokens",
+        estimate_tokens(autocomplete_data.context) + autocomplete_data.max_tokens, user_id
+    )
+
 @autocomplete_router.post("/")
-@limiter.limit("60/minute")  # Higher limit for autocomplete (fast, lightweight)
+@limiter.limit(RATE_LIMITS["autocomplete"], scope="autocomplete")
 async def get_autocomplete(
     autocomplete_data: AutocompleteRequest,
     request: Request,
-    neo4j_db: Neo4jSession = Depends(get_neo4j_db),
+    db: Session = Depends(get_db),
+    neo4j_db: Neo4jAsyncSession = Depends(get_async_neo4j_db),
+    genai_client: genai.Client = Depends(get_genai_client),
     user_id: int = Depends(get_current_user)
 ):
     """
     Get autocomplete suggestion for the given context.
     
     Streams the suggestion token by token for faster perceived response.
+    A newer request from the same user cancels this one (a "cancelled"
+    event is sent instead of "done").
     """
+    # Reconnect with Last-Event-ID: replay the rest of the earlier suggestion
+    resumed = resume_sse(request, owner=user_id)
+    if resumed is not None:
+        return resumed
+    
     # Validate context length
     if len(autocomplete_data.context) < 10:
         raise ValidationException(
@@ -46,41 +71,97 @@ async def get_autocomplete(
             code="AUTOCOMPLETE_002"
         )
     
+    # User is typing along a suggestion we already sent: serve the rest from cache
+    cached = suggestion_cache.lookup(user_id, autocomplete_data.context, autocomplete_data.persona_id)
+    if cached is not None:
+        autocomplete_sessions.cancel(user_id)
+        return sse_response([
+            {'type': 'content', 'content': cached},
+            {'type': 'done', 'suggestion': cached, 'cached': True}
+        ], owner=user_id)
+    
+    # Confident continuation from the user's own writing: no model call needed
+    local = await local_completion.suggest_async(
+        user_id,
+        autocomplete_data.context,
+        loader=lambda: DraftRepository(db).get_user_draft_contents(user_id)
+    )
+    if local is not None:
+        autocomplete_sessions.cancel(user_id)
+        suggestion_cache.store(user_id, autocomplete_data.context, local, autocomplete_data.persona_id)
+        return sse_response([
+            {'type': 'content', 'content': local},
+            {'type': 'done', 'suggestion': local, 'source': 'local'}
+        ], owner=user_id)
+    
+    # Supersede any in-flight suggestion for this user and wait out the
+    # coalescing window; a newer request means this one is already stale
+    ticket = await autocomplete_sessions.begin(user_id)
+    if ticket is None:
+        return sse_response([{'type': 'cancelled'}], owner=user_id)
+    
+    # Only requests that reach the model are charged (coalesced ones are free).
+    # Over the token budget: reject (no queueing while typing); near it: lite model
+    try:
+        await charge_model_tokens(request, autocomplete_data, user_id)
+        admission = await token_quota.admit(
+            user_id, estimate_tokens(autocomplete_data.context) + autocomplete_data.max_tokens, queue=False
+        )
+    except Exception:
+        autocomplete_sessions.finish(ticket)
+        raise
+    
     # Get persona if provided
     persona = None
     if autocomplete_data.persona_id:
-        persona_repo = PersonaRepository(neo4j_db)
-        persona = persona_repo.get_persona(autocomplete_data.persona_id)
+        persona_repo = AsyncPersonaRepository(neo4j_db)
+        persona = await persona_repo.get_persona(autocomplete_data.persona_id)
+        local_completion.observe_persona(user_id, persona)
     
-    autocomplete_service = AutocompleteService()
+    autocomplete_service = AutocompleteService(client=genai_client, user_id=user_id, model=admission.model)
     
-    def generate():
+    async def generate():
         try:
-            yield f"data: {json.dumps({'type': 'status', 'content': 'Generating...'})}\n\n"
+            yield {'type': 'status', 'content': 'Generating...'}
             
             full_suggestion = ""
-            for chunk in autocomplete_service.get_suggestion_stream(
-                context=autocomplete_data.context,
-                persona=persona,
-                max_tokens=autocomplete_data.max_tokens
+            # The upstream stream is closed if a newer request supersedes this
+            # one or the client disconnects (the generator is closed/cancelled)
+            async for chunk in autocomplete_sessions.stream(
+                ticket,
+                autocomplete_service.get_suggestion_stream_async(
+                    context=autocomplete_data.context,
+                    persona=persona,
+                    max_tokens=autocomplete_data.max_tokens
+                )
             ):
                 full_suggestion += chunk
-                yield f"data: {json.dumps({'type': 'content', 'content': chunk})}\n\n"
+                yield {'type': 'content', 'content': chunk}
             
-            yield f"data: {json.dumps({'type': 'done', 'suggestion': full_suggestion})}\n\n"
+            if ticket.cancelled.is_set():
+                yield {'type': 'cancelled'}
+                return
+            
+            suggestion_cache.store(user_id, autocomplete_data.context, full_suggestion, autocomplete_data.persona_id)
+            yield {'type': 'done', 'suggestion': full_suggestion}
             
         except Exception as e:
-            yield f"data: {json.dumps({'type': 'error', 'content': str(e)})}\n\n"
+            yield {'type': 'error', 'content': str(e)}
+        finally:
+            autocomplete_sessions.finish(ticket)
     
-    return StreamingResponse(generate(), media_type="text/event-stream")
+    # Not detached: a disconnect cancels the generation (and closes the upstream stream)
+    return sse_response(generate(), owner=user_id)
 
 
 @autocomplete_router.post("/sync", response_model=AutocompleteResponse)
-@limiter.limit("60/minute")
+@limiter.limit(RATE_LIMITS["autocomplete"], scope="autocomplete")
 async def get_autocomplete_sync(
     autocomplete_data: AutocompleteRequest,
     request: Request,
-    neo4j_db: Neo4jSession = Depends(get_neo4j_db),
+    db: Session = Depends(get_db),
+    neo4j_db: Neo4jAsyncSession = Depends(get_async_neo4j_db),
+    genai_client: genai.Client = Depends(get_genai_client),
     user_id: int = Depends(get_current_user)
 ):
     """
@@ -101,20 +182,67 @@ async def get_autocomplete_sync(
             code="AUTOCOMPLETE_002"
         )
     
-    # Get persona if provided
-    persona = None
-    if autocomplete_data.persona_id:
-        persona_repo = PersonaRepository(neo4j_db)
-        persona = persona_repo.get_persona(autocomplete_data.persona_id)
+    cached = suggestion_cache.lookup(user_id, autocomplete_data.context, autocomplete_data.persona_id)
+    if cached is not None:
+        autocomplete_sessions.cancel(user_id)
+        return AutocompleteResponse(suggestion=cached, status="success")
     
-    autocomplete_service = AutocompleteService()
+    local = await local_completion.suggest_async(
+        user_id,
+        autocomplete_data.context,
+        loader=lambda: DraftRepository(db).get_user_draft_contents(user_id)
+    )
+    if local is not None:
+        autocomplete_sessions.cancel(user_id)
+        suggestion_cache.store(user_id, autocomplete_data.context, local, autocomplete_data.persona_id)
+        return AutocompleteResponse(suggestion=local, status="success")
+    
+    ticket = await autocomplete_sessions.begin(user_id)
+    if ticket is None:
+        return AutocompleteResponse(suggestion="", status="cancelled")
     
     try:
-        suggestion = autocomplete_service.get_suggestion(
-            context=autocomplete_data.context,
-            persona=persona,
-            max_tokens=autocomplete_data.max_tokens
+        await charge_model_tokens(request, autocomplete_data, user_id)
+        admission = await token_quota.admit(
+            user_id, estimate_tokens(autocomplete_data.context) + autocomplete_data.max_tokens, queue=False
         )
+    except Exception:
+        autocomplete_sessions.finish(ticket)
+        raise
+    
+    try:
+        # Get persona if provided
+        persona = None
+        if autocomplete_data.persona_id:
+            persona_repo = AsyncPersonaRepository(neo4j_db)
+            persona = await persona_repo.get_persona(autocomplete_data.persona_id)
+            local_completion.observe_persona(user_id, persona)
+        
+        autocomplete_service = AutocompleteService(client=genai_client, user_id=user_id, model=admission.model)
+        
+        suggestion = await autocomplete_sessions.run(
+            ticket,
+            autocomplete_service.get_suggestion_async(
+                context=autocomplete_data.context,
+                persona=persona,
+                max_tokens=autocomplete_data.max_tokens
+            )
+        )
+        if suggestion is None:
+            return AutocompleteResponse(suggestion="", status="cancelled")
+        suggestion_cache.store(user_id, autocomplete_data.context, suggestion, autocomplete_data.persona_id)
         return AutocompleteResponse(suggestion=suggestion, status="success")
     except Exception as e:
         return AutocompleteResponse(suggestion="", status="error")
+    finally:
+        autocomplete_sessions.finish(ticket)
+
+
+@autocomplete_router.get("/stats")
+async def get_autocomplete_stats(user_id: int = Depends(get_current_user)):
+    """Suggestion cache hit rate and in-flight generation counts for this process"""
+    return {
+        "cache": suggestion_cache.stats(),
+        "local": local_completion.get_stats(),
+        "sessions": {**autocomplete_sessions.stats, "active": autocomplete_sessions.active_count()}
+    }
@@ -1,22 +1,24 @@
-import json
 from fastapi import APIRouter, Depends, HTTPException, Request
 from app.schemas.chat import ChatRequest, ChatResponse, ChatHistoryResponse, ChatListResponse
 from app.services.gemini_service import GeminiService
 from app.services.prompt_builder import PromptBuilder
 from google.genai.errors import ClientError
-from app.db.database import get_db
+from app.db.database import get_db, SessionLocal
 from app.db.repositories.chat_repository import ChatRepository
 from app.db.repositories.persona_repository import PersonaRepository
-from app.db.repositories.user_repository import UserRepository
 from sqlalchemy.orm import Session
-from app.core.security import get_current_user
-from app.core.neo4j_dependency import get_neo4j_db
-from neo4j import Session as Neo4jSession
+from app.core.security import get_current_user, get_user_context, UserContext
+from app.db.neo4j_connection import get_neo4j_session
+from app.core.providers import ProviderRegistry, get_providers
 from app.services.tools_service import ToolsService
 from app.services.rag_service import RAGService
 from app.services.edit_service import EditService
-from fastapi.responses import StreamingResponse
+from app.core.sse import sse_response, resume_sse
 from app.core.rate_limiter import limiter, RATE_LIMITS
+from app.core.token_quota import token_quota, estimate_tokens
+
+# Token allowance for history, RAG context and the reply when estimating a chat's cost
+CHAT_OVERHEAD_TOKENS = 2000
 
 chat_router = APIRouter()
 
@@ -25,22 +27,35 @@ chat_router = APIRouter()
 async def chat_endpoint(
     chat_data: ChatRequest,
     request: Request,  # Required for rate limiting
-    db: Session = Depends(get_db),
-    neo4j_db: Neo4jSession = Depends(get_neo4j_db),
-    user_id: int = Depends(get_current_user)
+    providers: ProviderRegistry = Depends(get_providers),
+    user: UserContext = Depends(get_user_context)
 ):
+    user_id = user.user_id
+
+    # Reconnect with Last-Event-ID: continue the earlier reply instead of generating a new one
+    resumed = resume_sse(request, owner=user_id)
+    if resumed is not None:
+        return resumed
+
+    # Queue briefly / degrade / reject before any model call if the user is over budget
+    admission = await token_quota.admit(
+        user_id,
+        estimate_tokens(chat_data.message) + estimate_tokens(chat_data.draft_content or "") + CHAT_OVERHEAD_TOKENS
+    )
+
     def generate():
+        # Own sessions: the generator outlives the request (detached below), and
+        # request-scoped ones are closed when the response ends
+        db = SessionLocal()
+        neo4j_db = get_neo4j_session()
         try:
             # Get persona (use explicitly provided or fall back to active persona)
             neo4j_repo = PersonaRepository(neo4j_db)
-            user_repo = UserRepository(db, None)
             repo = ChatRepository(db)
             persona = None
 
             # Priority: 1. Explicit persona_id, 2. User's active persona
-            persona_id_to_use = chat_data.persona_id
-            if not persona_id_to_use:
-                persona_id_to_use = user_repo.get_active_persona_id(user_id)
+            persona_id_to_use = chat_data.persona_id or user.active_persona_id
             
             if persona_id_to_use:
                 persona = neo4j_repo.get_persona(persona_id_to_use)
@@ -52,9 +67,9 @@ async def chat_endpoint(
 
             # If draft_content is present (even if empty), user is in editor - AI decides to edit or answer
             if chat_data.draft_content is not None:
-                yield f"data: {json.dumps({'type': 'status', 'content': 'Analyzing...'})}\n\n"
+                yield {'type': 'status', 'content': 'Analyzing...'}
                 
-                edit_service = EditService()
+                edit_service = EditService(client=providers.genai, user_id=user_id, model=admission.model)
                 selection_dict = None
                 if chat_data.selection:
                     selection_dict = {
@@ -75,27 +90,27 @@ async def chat_endpoint(
                 
                 # Stream the explanation/answer
                 if explanation:
-                    yield f"data: {json.dumps({'type': 'content', 'content': explanation})}\n\n"
+                    yield {'type': 'content', 'content': explanation}
                 
                 full_response = explanation
                 
                 # Only send edits if AI decided to make changes
                 if response_type == "edit":
                     edits = result.get("edits", [])
-                    yield f"data: {json.dumps({'type': 'edits', 'edits': edits})}\n\n"
+                    yield {'type': 'edits', 'edits': edits}
             
             # Regular chat mode (no document context)
             else:
-                yield f"data: {json.dumps({'type': 'status', 'content': 'Thinking...'})}\n\n"
+                yield {'type': 'status', 'content': 'Thinking...'}
                 
                 # Get RAG document context (also handles @ mentions via document_ids)
                 document_context = ""
                 citations = []
                 
                 if chat_data.document_ids:
-                    yield f"data: {json.dumps({'type': 'status', 'content': 'Searching documents...'})}\n\n"
+                    yield {'type': 'status', 'content': 'Searching documents...'}
 
-                    rag_service = RAGService()
+                    rag_service = RAGService(genai_client=providers.genai, qdrant_client=providers.qdrant)
                     rag_result = rag_service.get_relevant_context(
                         query=chat_data.message,
                         document_ids=chat_data.document_ids
@@ -108,11 +123,11 @@ async def chat_endpoint(
                     document_context=document_context
                 )
 
-                yield f"data: {json.dumps({'type': 'status', 'content': 'Generating...'})}\n\n"
+                yield {'type': 'status', 'content': 'Generating...'}
 
                 # Stream with tools
                 tools_service = ToolsService(neo4j_db)
-                gemini_service = GeminiService(tools_service=tools_service)
+                gemini_service = GeminiService(tools_service=tools_service, client=providers.genai, user_id=user_id, model=admission.model)
                 
                 history = []
                 if chat_data.chat_id:
@@ -121,7 +136,7 @@ async def chat_endpoint(
                 for event in gemini_service.chat(chat_data.message, system_prompt, history=history):
                     if event["type"] == "content":
                         full_response += event["content"]
-                    yield f"data: {json.dumps(event)}\n\n"
+                    yield event
             
             # Save to DB (for both edit and ask modes)
             chat_id = repo.save_message(
@@ -131,12 +146,16 @@ async def chat_endpoint(
                 ai_response=full_response
             )
             
-            yield f"data: {json.dumps({'type': 'done', 'chat_id': chat_id, 'citations': citations, 'mode': 'edit' if chat_data.draft_content else 'ask'})}\n\n"
+            yield {'type': 'done', 'chat_id': chat_id, 'citations': citations, 'mode': 'edit' if chat_data.draft_content else 'ask'}
 
         except Exception as e:
-            yield f"data: {json.dumps({'type': 'error', 'content': str(e)})}\n\n"
+            yield {'type': 'error', 'content': str(e)}
+        finally:
+            neo4j_db.close()
+            db.close()
 
-    return StreamingResponse(generate(), media_type="text/event-stream")
+    # Detached: the reply is still saved (and resumable) if the client drops mid-stream
+    return sse_response(generate(), owner=user_id, detach=True)
     
 @chat_router.get("/chats", response_model=ChatListResponse)
 async def list_user_chats(
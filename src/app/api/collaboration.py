@@ -2,25 +2,24 @@
 Collaboration WebSocket Endpoint
 
 Handles real-time collaboration for draft editing.
-Features: presence, cursor sync, content sync (last-write-wins).
+Features: presence, cursor sync, content sync (operational transform).
 """
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect, Depends, Query
-from app.core.websocket_manager import manager
-from app.core.security import decode_token
+from app.core.websocket_manager import manager, InvalidFrame
+from app.core.collab_codec import negotiate
+from app.core.security import verify_token, get_current_user
 from app.db.database import get_db
 from app.db.repositories.draft_repository import DraftRepository
 from sqlalchemy.orm import Session
-import json
 
 collab_router = APIRouter()
 
 async def get_user_from_token(token: str) -> dict:
     """Validate token and get user info"""
-    try:
-        payload = decode_token(token)
-        return {"user_id": payload.get("sub"), "username": payload.get("username", f"User {payload.get('sub')}")}
-    except Exception:
+    claims = verify_token(token)
+    if claims is None:
         return None
+    return {"user_id": claims["user_id"], "username": claims["username"] or f"User {claims['user_id']}"}
 
 @collab_router.websocket("/ws/draft/{draft_id}")
 async def websocket_endpoint(
@@ -33,18 +32,40 @@ async def websocket_endpoint(
     
     Connect with: ws://host/api/collab/ws/draft/{draft_id}?token={jwt_token}
     
+    Offer the "collab.msgpack.v1" subprotocol for MessagePack binary frames
+    (short field codes, numeric event types, None fields left out; see
+    app.core.collab_codec); otherwise events are JSON text frames as below.
+    
     Events from client:
     - {"type": "cursor", "position": 123, "selection_start": 100, "selection_end": 150}
+    - {"type": "op", "version": 7, "op": [10, "new text", -3, 200], "cursor_position": 18}
+      (retain n / insert str / delete -n, based on the last version the client saw;
+      keep at most one op in flight and send the next after its ack)
     - {"type": "content", "content": "full document text", "cursor_position": 123}
+      (fallback for clients without op support; merged as a diff)
     - {"type": "ping"}
+    - {"type": "pong"}  (reply to the server's ping)
     
     Events from server:
-    - {"type": "room_state", "draft_id": 1, "content": "...", "users": [...], "your_color": "#FF6B6B"}
+    - {"type": "room_state", "draft_id": 1, "content": "...", "version": 7, "users": [...], "your_color": "#FF6B6B"}
     - {"type": "user_joined", "user_id": 1, "username": "John", "color": "#FF6B6B", "users": [...]}
     - {"type": "user_left", "user_id": 1, "username": "John", "users": [...]}
-    - {"type": "cursor_update", "user_id": 1, "username": "John", "color": "#FF6B6B", "position": 123, ...}
-    - {"type": "content_update", "user_id": 1, "username": "John", "content": "...", "cursor_position": 123}
+    - {"type": "cursors_update", "cursors": [{"user_id": 1, "username": "John", "color": "#FF6B6B", "position": 123, ...}]}
+      (cursors that moved since the last frame, at most COLLAB_CURSOR_FPS frames/s; may include your own)
+    - {"type": "ack", "version": 8}  (your op was applied as version 8)
+    - {"type": "operation", "version": 8, "op": [...], "user_id": 1, "username": "John", "cursor_position": 123}
+    - {"type": "resync", "content": "...", "version": 8, "reason": "..."}  (op rejected, fell behind or
+      the room moved to another node; reload from snapshot)
+    - {"type": "error", "reason": "..."}  (a malformed frame was ignored; positions are
+      non-negative integers or null, clamped to the document length)
     - {"type": "pong"}
+    - {"type": "ping"}  (every COLLAB_HEARTBEAT_SECONDS; reply with pong. Once a client has answered
+      a ping, silence for COLLAB_MAX_MISSED_HEARTBEATS beats closes it with 4000; idle connections
+      are closed with 4008)
+    
+    Closes with 4004 if the draft can't be loaded or isn't yours, 4029 if the room is full, and
+    4002 when the same user connects to the draft again (the new connection replaces this one).
+    Ops that would grow the draft past COLLAB_MAX_CONTENT_CHARS are answered with a resync.
     """
     # Validate token
     user = await get_user_from_token(token)
@@ -55,60 +76,78 @@ async def websocket_endpoint(
     user_id = user["user_id"]
     username = user["username"]
     
-    # Connect to room
-    await manager.connect(websocket, draft_id, user_id, username)
+    # Connect to room (loads the draft on first join)
+    codec, subprotocol = negotiate(websocket.scope.get("subprotocols", []))
+    session = await manager.connect(websocket, draft_id, user_id, username, codec, subprotocol)
+    if session is None:
+        return
     
     try:
         while True:
             # Receive message from client
-            data = await websocket.receive_json()
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                raise WebSocketDisconnect(message.get("code", 1000))
+            data = codec.decode(message.get("bytes") or message.get("text"))
             msg_type = data.get("type")
+            manager.seen(session, active=msg_type in ("cursor", "op", "content"), pong=msg_type == "pong")
+            
+            try:
+                if msg_type == "cursor":
+                    # Update cursor position (coalesced, sent in the next cursors_update)
+                    await manager.update_cursor(
+                        session,
+                        position=data.get("position", 0),
+                        selection_start=data.get("selection_start"),
+                        selection_end=data.get("selection_end")
+                    )
             
-            if msg_type == "cursor":
-                # Update cursor position
-                await manager.update_cursor(
-                    user_id=user_id,
-                    position=data.get("position", 0),
-                    selection_start=data.get("selection_start"),
-                    selection_end=data.get("selection_end")
-                )
+                elif msg_type == "op":
+                    # Incremental edit, transformed against concurrent ops
+                    await manager.apply_operation(
+                        session,
+                        version=data.get("version", 0),
+                        op=data.get("op", []),
+                        cursor_position=data.get("cursor_position")
+                    )
             
-            elif msg_type == "content":
-                # Update content (last-write-wins)
-                await manager.update_content(
-                    user_id=user_id,
-                    content=data.get("content", ""),
-                    cursor_position=data.get("cursor_position")
-                )
+                elif msg_type == "content":
+                    # Whole-document update, merged as a diff
+                    await manager.update_content(
+                        session,
+                        content=data.get("content", ""),
+                        cursor_position=data.get("cursor_position")
+                    )
             
-            elif msg_type == "ping":
-                # Keep-alive ping
-                await websocket.send_json({"type": "pong"})
+                elif msg_type == "ping":
+                    # Keep-alive ping
+                    session.outbox.send(codec.encode({"type": "pong"}))
+            
+            except InvalidFrame as e:
+                session.outbox.send(codec.encode({"type": "error", "reason": str(e)}))
+            
+            # "pong" (answer to the server's ping) only needs the seen() above
     
     except WebSocketDisconnect:
-        await manager.disconnect(user_id)
+        await manager.disconnect(session)
     except Exception as e:
-        await manager.disconnect(user_id)
+        await manager.disconnect(session)
         raise
 
 
 @collab_router.get("/draft/{draft_id}/presence")
 async def get_draft_presence(draft_id: int):
     """
-    Get current users viewing/editing a draft (HTTP endpoint).
+    Get current users viewing/editing a draft (HTTP endpoint), on any node.
     Useful for showing presence indicators without WebSocket connection.
     """
-    room = manager.rooms.get(draft_id)
-    if not room:
-        return {"draft_id": draft_id, "users": [], "count": 0}
-    
     users = [
         {
-            "user_id": session.user_id,
-            "username": session.username,
-            "color": session.color
+            "user_id": user["user_id"],
+            "username": user["username"],
+            "color": user["color"]
         }
-        for session in room.users.values()
+        for user in await manager.room_users(draft_id)
     ]
     
     return {
@@ -116,3 +155,9 @@ async def get_draft_presence(draft_id: int):
         "users": users,
         "count": len(users)
     }
+
+
+@collab_router.get("/stats")
+async def get_collab_stats(user_id: int = Depends(get_current_user)):
+    """Room and connection counts, memory use and reaper metrics of this worker"""
+    return manager.get_stats()
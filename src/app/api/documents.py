@@ -1,13 +1,18 @@
-from fastapi import APIRouter, UploadFile, File, Depends, HTTPException, status, Query, Request
+from fastapi import APIRouter, UploadFile, File, Depends, HTTPException, status, Query, Request, WebSocket
 from app.db.repositories.document_repository import DocumentRepository
 from sqlalchemy.orm import Session
-from app.db.database import get_db
-from app.core.security import get_current_user
+from app.db.database import get_db, SessionLocal
+from app.core.security import get_current_user, verify_token
+from app.core.status_events import status_bus, status_event
+from app.core.sse import sse_response
 from app.core.exceptions import ValidationException, NotFound
+from app.core.etag import Conditional, make_etag
 from app.schemas.documents import DocumentResponse, DocumentListResponse, DocumentUploadResponse
 from app.workers.document_tasks import process_document
 from app.core.rate_limiter import limiter, RATE_LIMITS
 from pathlib import Path
+import asyncio
+import json
 import os
 
 documents_router = APIRouter()
@@ -16,12 +21,15 @@ documents_router = APIRouter()
 MAX_FILE_SIZE = 10 * 1024 * 1024  # 10MB
 ALLOWED_EXTENSIONS = {".pdf", ".md", ".txt"}
 UPLOAD_DIR = Path("uploads")
+# Seconds between keep-alive comments on an idle status stream
+STATUS_KEEPALIVE_SECONDS = float(os.getenv("STATUS_KEEPALIVE_SECONDS", "15"))
 
 # Create uploads directory if it doesn't exist
 UPLOAD_DIR.mkdir(exist_ok=True)
 
 @documents_router.post("/upload", response_model=DocumentUploadResponse)
 @limiter.limit(RATE_LIMITS["upload"])
+@limiter.limit(RATE_LIMITS["upload_mb"], scope="upload_mb", cost=lambda file, **_: max(1, (file.size or 0) / 1_000_000))
 async def upload(
     request: Request,  # Required for rate limiting
     db: Session = Depends(get_db),
@@ -63,6 +71,8 @@ async def upload(
     )
     
 
+    # Redis publish is a blocking round trip
+    await asyncio.to_thread(status_bus.publish, user_id, status_event(document.id, "queued", filename=document.filename))
     process_document.delay(document.id)
     return DocumentUploadResponse.from_orm(document)
 
@@ -81,13 +91,103 @@ async def list_documents(
         "total": result["total"]
     }
 
+def _initial_status(user_id: int) -> list:
+    """
+    Latest event of the user's recent documents, plus any still processing
+    without one (blocking: Redis and database reads, run it in a thread)
+    """
+    events = {event["document_id"]: event for event in status_bus.latest(user_id)}
+    # Own short-lived session: the stream outlives the request's dependencies
+    db = SessionLocal()
+    try:
+        for document_id in DocumentRepository(db).list_processing_document_ids(user_id):
+            events.setdefault(document_id, status_event(document_id, "queued"))
+    finally:
+        db.close()
+    return sorted(events.values(), key=lambda event: event["at"])
+
+@documents_router.get("/status/stream")
+async def stream_document_status(
+    user_id: int = Depends(get_current_user)
+):
+    """
+    Server-sent events with the processing status of the user's documents
+    (instead of polling GET /documents/{id}).
+
+    Starts with the latest event of each recent or still-processing document, then:
+    data: {"type": "document_status", "document_id": 7, "status": "processing",
+           "stage": "embedding", "done": 12, "total": 40, "at": 1700000000.0}
+    stage is queued / extracting / chunking / embedding / done / failed (with "error");
+    status is processing / completed / failed, as on the document.
+    A ": keep-alive" comment is sent every STATUS_KEEPALIVE_SECONDS while idle.
+    """
+    async def generate():
+        subscription = await status_bus.subscribe(user_id)
+        try:
+            for event in await asyncio.to_thread(_initial_status, user_id):
+                yield event
+            while True:
+                event = await subscription.get(STATUS_KEEPALIVE_SECONDS)
+                if event is not None:
+                    yield event
+        finally:
+            await status_bus.unsubscribe(subscription)
+
+    return sse_response(generate(), owner=user_id, keepalive=STATUS_KEEPALIVE_SECONDS)
+
+@documents_router.websocket("/status/ws")
+async def document_status_socket(websocket: WebSocket, token: str = Query(...)):
+    """
+    WebSocket variant of /status/stream for clients that can't set headers on
+    EventSource: ws://host/api/documents/status/ws?token={jwt_token}
+
+    Sends the same document_status events as JSON text frames; answers
+    {"type": "ping"} with {"type": "pong"}.
+    """
+    claims = verify_token(token)
+    if claims is None:
+        await websocket.close(code=4001, reason="Invalid token")
+        return
+    await websocket.accept()
+    subscription = await status_bus.subscribe(claims["user_id"])
+    closed = {}
+
+    async def receive():
+        try:
+            while True:
+                message = await websocket.receive()
+                if message["type"] == "websocket.disconnect":
+                    break
+                if message.get("text") and json.loads(message["text"]).get("type") == "ping":
+                    await websocket.send_json({"type": "pong"})
+        except Exception:
+            pass
+        subscription.put(closed)
+
+    receiver = asyncio.create_task(receive())
+    try:
+        for event in await asyncio.to_thread(_initial_status, claims["user_id"]):
+            await websocket.send_json(event)
+        while True:
+            event = await subscription.get(STATUS_KEEPALIVE_SECONDS)
+            if event is closed:
+                break
+            if event is not None:
+                await websocket.send_json(event)
+    except Exception:
+        pass
+    finally:
+        receiver.cancel()
+        await status_bus.unsubscribe(subscription)
+
 @documents_router.get("/{document_id}", response_model=DocumentResponse)
 async def get_document(
     document_id: int,
     db: Session = Depends(get_db),
-    user_id: int = Depends(get_current_user)
+    user_id: int = Depends(get_current_user),
+    conditional: Conditional = Depends()
 ):
-    """Get a specific document (user must own it)"""
+    """Get a specific document (user must own it); 304 while its status is unchanged (If-None-Match)"""
     repo = DocumentRepository(db)
     document = repo.get_document_by_id(document_id)
     
@@ -97,6 +197,7 @@ async def get_document(
     if document.user_id != user_id:
         raise NotFound(message="Document not found", code="DOC_003")
     
+    conditional.check_not_modified(make_etag("document", document.id, document.status, document.file_size))
     return DocumentResponse.from_orm(document)
 
 @documents_router.delete("/{document_id}")
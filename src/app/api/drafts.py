@@ -2,12 +2,28 @@ from fastapi import APIRouter, Depends, Query
 from sqlalchemy.orm import Session
 from app.db.database import get_db
 from app.core.security import get_current_user
-from app.core.exceptions import NotFound, ValidationException
-from app.db.repositories.draft_repository import DraftRepository
-from app.schemas.drafts import DraftCreate, DraftUpdate, DraftResponse, DraftListResponse
+from app.core.exceptions import NotFound, ValidationException, ConflictException
+from app.core.etag import Conditional, make_etag
+from app.core.text_ot import OperationError
+from app.db.repositories.draft_repository import DraftRepository, RevisionConflict
+from app.schemas.drafts import (
+    DraftCreate, DraftUpdate, DraftResponse, DraftListResponse, DraftPatch, DraftPatchResponse,
+    DraftRevisionListResponse, DraftRevisionResponse
+)
+from app.services.local_completion import local_completion
 
 drafts_router = APIRouter()
 
+def draft_etag(draft) -> str:
+    return make_etag("draft", draft.id, draft.revision, draft.updated_at)
+
+def _revision_conflict(e: RevisionConflict) -> ConflictException:
+    return ConflictException(
+        message="Draft has changed since the base revision",
+        code="DRAFT_003",
+        details={"current_revision": e.current_revision}
+    )
+
 @drafts_router.post("/", response_model=DraftResponse)
 async def create_draft(
     draft_data: DraftCreate,
@@ -21,6 +37,7 @@ async def create_draft(
         title=draft_data.title,
         content=draft_data.content or ""
     )
+    local_completion.observe_text(user_id, draft.content)
     return DraftResponse.model_validate(draft)
 
 @drafts_router.get("/", response_model=DraftListResponse)
@@ -30,23 +47,21 @@ async def list_drafts(
     limit: int = Query(20, ge=1, le=100),
     offset: int = Query(0, ge=0)
 ):
-    """List all drafts for current user"""
+    """List all drafts for current user (metadata + excerpt; full content via GET /{draft_id})"""
     repo = DraftRepository(db)
-    result = repo.list_user_drafts(user_id, limit, offset)
-    return {
-        "drafts": [DraftResponse.model_validate(d) for d in result["drafts"]],
-        "total": result["total"]
-    }
+    return repo.list_user_drafts(user_id, limit, offset)
 
 @drafts_router.get("/{draft_id}", response_model=DraftResponse)
 async def get_draft(
     draft_id: int,
     db: Session = Depends(get_db),
-    user_id: int = Depends(get_current_user)
+    user_id: int = Depends(get_current_user),
+    conditional: Conditional = Depends()
 ):
-    """Get a specific draft (user must own it)"""
+    """Get a specific draft (user must own it); 304 if If-None-Match has the current ETag"""
     repo = DraftRepository(db)
-    draft = repo.get_draft_by_id(draft_id)
+    # Content is only loaded if the client's copy turns out to be stale
+    draft = repo.get_draft_by_id(draft_id, defer_content=True)
     
     if not draft:
         raise NotFound(message="Draft not found", code="DRAFT_001")
@@ -54,6 +69,7 @@ async def get_draft(
     if draft.user_id != user_id:
         raise NotFound(message="Draft not found", code="DRAFT_001")
     
+    conditional.check_not_modified(draft_etag(draft))
     return DraftResponse.model_validate(draft)
 
 @drafts_router.put("/{draft_id}", response_model=DraftResponse)
@@ -61,9 +77,10 @@ async def update_draft(
     draft_id: int,
     draft_data: DraftUpdate,
     db: Session = Depends(get_db),
-    user_id: int = Depends(get_current_user)
+    user_id: int = Depends(get_current_user),
+    conditional: Conditional = Depends()
 ):
-    """Update a draft (user must own it)"""
+    """Update a draft (user must own it); with If-Match, only if it's unchanged since"""
     repo = DraftRepository(db)
     draft = repo.get_draft_by_id(draft_id)
     
@@ -80,15 +97,106 @@ async def update_draft(
             code="DRAFT_002"
         )
     
-    updated_draft = repo.update_draft(
-        draft_id=draft_id,
-        title=draft_data.title,
-        content=draft_data.content,
-        status=draft_data.status
-    )
+    conditional.check_precondition(draft_etag(draft))
+    base_revision = draft_data.base_revision
+    if base_revision is None and conditional.if_match is not None:
+        base_revision = draft.revision  # Keep the If-Match check atomic with the write
+    
+    old_content = draft.content
+    try:
+        updated_draft = repo.update_draft(
+            draft_id=draft_id,
+            title=draft_data.title,
+            content=draft_data.content,
+            status=draft_data.status,
+            base_revision=base_revision,
+            user_id=user_id
+        )
+    except RevisionConflict as e:
+        raise _revision_conflict(e)
     
+    # Teach the local autocomplete tier only the newly written text
+    if draft_data.content is not None:
+        local_completion.observe_edit(user_id, old_content, updated_draft.content)
+    
+    conditional.set_etag(draft_etag(updated_draft))
     return DraftResponse.model_validate(updated_draft)
 
+@drafts_router.patch("/{draft_id}", response_model=DraftPatchResponse)
+async def patch_draft(
+    draft_id: int,
+    patch: DraftPatch,
+    db: Session = Depends(get_db),
+    user_id: int = Depends(get_current_user),
+    conditional: Conditional = Depends()
+):
+    """
+    Apply a delta to a draft's content (user must own it). The op walks the
+    whole document at base_revision (same format as collaboration ops); a
+    stale base is rejected with 409 and the current revision.
+    """
+    repo = DraftRepository(db)
+    draft = repo.get_draft_by_id(draft_id)
+    
+    if not draft or draft.user_id != user_id:
+        raise NotFound(message="Draft not found", code="DRAFT_001")
+    
+    conditional.check_precondition(draft_etag(draft))
+    old_content = draft.content
+    try:
+        updated_draft = repo.apply_delta(draft_id, patch.base_revision, patch.op, user_id)
+    except RevisionConflict as e:
+        raise _revision_conflict(e)
+    except OperationError as e:
+        raise ValidationException(message=f"Invalid operation: {e}", code="DRAFT_004")
+    
+    local_completion.observe_edit(user_id, old_content, updated_draft.content)
+    
+    conditional.set_etag(draft_etag(updated_draft))
+    return DraftPatchResponse(
+        id=updated_draft.id,
+        revision=updated_draft.revision,
+        content_length=len(updated_draft.content or ""),
+        updated_at=updated_draft.updated_at
+    )
+
+@drafts_router.get("/{draft_id}/revisions", response_model=DraftRevisionListResponse)
+async def list_draft_revisions(
+    draft_id: int,
+    db: Session = Depends(get_db),
+    user_id: int = Depends(get_current_user),
+    limit: int = Query(50, ge=1, le=200),
+    offset: int = Query(0, ge=0)
+):
+    """Revision history of a draft, newest first (user must own it)"""
+    repo = DraftRepository(db)
+    draft = repo.get_draft_by_id(draft_id)
+    
+    if not draft or draft.user_id != user_id:
+        raise NotFound(message="Draft not found", code="DRAFT_001")
+    
+    return repo.list_revisions(draft_id, limit, offset)
+
+@drafts_router.get("/{draft_id}/revisions/{revision}", response_model=DraftRevisionResponse)
+async def get_draft_revision(
+    draft_id: int,
+    revision: int,
+    db: Session = Depends(get_db),
+    user_id: int = Depends(get_current_user)
+):
+    """A draft's content as of a revision (user must own it)"""
+    repo = DraftRepository(db)
+    draft = repo.get_draft_by_id(draft_id)
+    
+    if not draft or draft.user_id != user_id:
+        raise NotFound(message="Draft not found", code="DRAFT_001")
+    
+    content = repo.get_revision_content(draft_id, revision)
+    if content is None:
+        raise NotFound(message="Revision not found", code="DRAFT_005")
+    
+    return DraftRevisionResponse(draft_id=draft_id, revision=revision, content=content)
+
 @drafts_router.delete("/{draft_id}")
 async def delete_draft(
     draft_id: int,
@@ -1,22 +1,38 @@
-from fastapi import APIRouter, HTTPException, Depends
+import json
+from fastapi import APIRouter, HTTPException, Depends, Request
+from fastapi.responses import StreamingResponse
+from pydantic import ValidationError
 from sqlalchemy.orm import Session
-from neo4j import Session as Neo4jSession
+from neo4j import AsyncSession as Neo4jAsyncSession
 from app.core.security import get_current_user
-from app.core.neo4j_dependency import get_neo4j_db
-from app.db.repositories.persona_repository import PersonaRepository
+from app.core.etag import Conditional, make_etag
+from app.core.exceptions import PreconditionFailed
+from app.core.neo4j_dependency import get_async_neo4j_db
+from app.db.neo4j_connection import get_async_neo4j_session
+from app.db.repositories.persona_repository import AsyncPersonaRepository, VersionConflict
 from app.schemas.persona import CreatePersonaRequest, PersonaListResponse, PersonaResponse, UpdatePersonaRequest
+from app.core.logger import logger
 from typing import List
 
 personas_router = APIRouter()
 
+def persona_etag(persona: dict) -> str:
+    return make_etag("persona", persona["id"], persona.get("version"), persona.get("updated_at"))
+
+# Bulk import settings
+IMPORT_CHUNK_SIZE = 500       # rows per transaction
+MAX_IMPORT_ROWS = 50000       # rows per request
+MAX_IMPORT_BYTES = 64 * 1024 * 1024   # body size per request
+MAX_IMPORT_LINE_BYTES = 64 * 1024     # one row
+
 @personas_router.post("/personas", response_model=PersonaResponse)
 async def create_persona(
     request: CreatePersonaRequest,
-    neo4j_session: Neo4jSession = Depends(get_neo4j_db),
+    neo4j_session: Neo4jAsyncSession = Depends(get_async_neo4j_db),
     user_id: int = Depends(get_current_user)
 ):
     """Create a new persona for the authenticated user"""
-    repo = PersonaRepository(neo4j_session)
+    repo = AsyncPersonaRepository(neo4j_session)
 
     persona_data = {
         "name": request.name,
@@ -33,7 +49,7 @@ async def create_persona(
         "purpose": request.purpose
     }
 
-    result = repo.create_persona(user_id, persona_data)
+    result = await repo.create_persona(user_id, persona_data)
     if not result:
         raise HTTPException(status_code=400, detail="Failed to create persona")
     
@@ -41,39 +57,156 @@ async def create_persona(
 
 @personas_router.get("/personas", response_model=PersonaListResponse)
 async def list_personas(
-    neo4j_session: Neo4jSession = Depends(get_neo4j_db),
-    user_id: int = Depends(get_current_user)
+    neo4j_session: Neo4jAsyncSession = Depends(get_async_neo4j_db),
+    user_id: int = Depends(get_current_user),
+    conditional: Conditional = Depends()
 ):
-    """Get all personas for the authenticated user"""
-    repo = PersonaRepository(neo4j_session)
-    personas = repo.get_user_personas(user_id)
+    """Get all personas for the authenticated user; 304 if none changed (If-None-Match)"""
+    repo = AsyncPersonaRepository(neo4j_session)
+    personas = await repo.get_user_personas(user_id)
 
+    conditional.check_not_modified(make_etag("personas", *(persona_etag(p) for p in personas)))
     return PersonaListResponse(personas=personas)
 
+@personas_router.post("/personas/import")
+async def import_personas(
+    request: Request,
+    user_id: int = Depends(get_current_user)
+):
+    """
+    Bulk-create personas from an NDJSON body (one CreatePersonaRequest per line).
+
+    The body is read and validated before the response starts; valid rows
+    are then written in chunked transactions (a chunk that fails is retried
+    row by row). The response is an NDJSON stream:
+    - {"type": "error", "line": 3, "error": "..."} for each rejected row
+    - {"type": "progress", "processed": 500, "imported": 498, "failed": 2} after each chunk
+    - {"type": "done", "processed": ..., "imported": ..., "failed": ...}
+
+    Bodies over MAX_IMPORT_BYTES or with a line over MAX_IMPORT_LINE_BYTES
+    are rejected with 413.
+    """
+    content_length = request.headers.get("content-length")
+    if content_length and content_length.isdigit() and int(content_length) > MAX_IMPORT_BYTES:
+        raise HTTPException(status_code=413, detail=f"Import body limited to {MAX_IMPORT_BYTES} bytes")
+
+    rows = []
+    errors = []
+    buffer = b""
+    received = 0
+    line_number = 0
+
+    def parse(raw: bytes) -> bool:
+        """Validate one line; False once the row limit is reached"""
+        nonlocal line_number
+        line_number += 1
+        if not raw.strip():
+            return True
+        if len(rows) + len(errors) >= MAX_IMPORT_ROWS:
+            errors.append({"type": "error", "line": line_number, "error": f"Import limited to {MAX_IMPORT_ROWS} rows"})
+            return False
+        try:
+            row = CreatePersonaRequest.model_validate(json.loads(raw)).model_dump()
+        except (json.JSONDecodeError, ValidationError) as e:
+            errors.append({"type": "error", "line": line_number, "error": str(e)})
+            return True
+        row["line"] = line_number
+        rows.append(row)
+        return True
+
+    async for data in request.stream():
+        received += len(data)
+        if received > MAX_IMPORT_BYTES:
+            raise HTTPException(status_code=413, detail=f"Import body limited to {MAX_IMPORT_BYTES} bytes")
+        buffer += data
+        *complete, buffer = buffer.split(b"\n")
+        if len(buffer) > MAX_IMPORT_LINE_BYTES or any(len(raw) > MAX_IMPORT_LINE_BYTES for raw in complete):
+            raise HTTPException(status_code=413, detail=f"Import lines limited to {MAX_IMPORT_LINE_BYTES} bytes")
+        if not all(parse(raw) for raw in complete):
+            break
+    else:
+        if buffer:
+            parse(buffer)
+
+    async def generate():
+        processed = failed = len(errors)
+        imported = 0
+        for error in errors:
+            yield json.dumps(error) + "\n"
+
+        async with get_async_neo4j_session() as session:
+            repo = AsyncPersonaRepository(session)
+
+            for start in range(0, len(rows), IMPORT_CHUNK_SIZE):
+                chunk = rows[start:start + IMPORT_CHUNK_SIZE]
+                processed += len(chunk)
+                try:
+                    imported += len(await repo.import_personas(user_id, chunk))
+                except Exception as e:
+                    logger.error(f"Persona import chunk failed, retrying row by row: {e}")
+                    for row in chunk:
+                        try:
+                            imported += len(await repo.import_personas(user_id, [row]))
+                        except Exception as e:
+                            failed += 1
+                            yield json.dumps({"type": "error", "line": row["line"], "error": str(e)}) + "\n"
+                yield json.dumps({"type": "progress", "processed": processed, "imported": imported, "failed": failed}) + "\n"
+
+        yield json.dumps({"type": "done", "processed": processed, "imported": imported, "failed": failed}) + "\n"
+
+    return StreamingResponse(generate(), media_type="application/x-ndjson")
+
+@personas_router.get("/personas/export")
+async def export_personas(user_id: int = Depends(get_current_user)):
+    """Stream all personas of the authenticated user as NDJSON (re-importable)"""
+    async def generate():
+        async with get_async_neo4j_session() as session:
+            repo = AsyncPersonaRepository(session)
+            async for persona in repo.export_personas(user_id):
+                yield json.dumps(persona) + "\n"
+
+    return StreamingResponse(
+        generate(),
+        media_type="application/x-ndjson",
+        headers={"Content-Disposition": 'attachment; filename="personas.ndjson"'}
+    )
+
 @personas_router.get("/personas/{persona_id}", response_model=PersonaResponse)
 async def get_persona_by_id(
     persona_id: str,
-    neo4j_session: Neo4jSession = Depends(get_neo4j_db),
-    user_id: int = Depends(get_current_user)
+    neo4j_session: Neo4jAsyncSession = Depends(get_async_neo4j_db),
+    user_id: int = Depends(get_current_user),
+    conditional: Conditional = Depends()
 ):
-    """Get a specific persona by ID"""
-    repo = PersonaRepository(neo4j_session)
-    persona = repo.get_persona(persona_id)
+    """Get a specific persona by ID; 304 if unchanged (If-None-Match)"""
+    repo = AsyncPersonaRepository(neo4j_session)
+    persona = await repo.get_persona(persona_id)
 
     if not persona:
         raise HTTPException(status_code=404, detail="Persona not found")
     
+    conditional.check_not_modified(persona_etag(persona))
     return persona
 
 @personas_router.put("/personas/{persona_id}", response_model=PersonaResponse)
 async def edit_persona(
     persona_id: str,
     request: UpdatePersonaRequest,
-    neo4j_session: Neo4jSession = Depends(get_neo4j_db),
-    user_id: int = Depends(get_current_user)
+    neo4j_session: Neo4jAsyncSession = Depends(get_async_neo4j_db),
+    user_id: int = Depends(get_current_user),
+    conditional: Conditional = Depends()
 ):
-    """Update a persona"""
-    repo = PersonaRepository(neo4j_session)
+    """Update a persona; with If-Match, only if it's unchanged since the client read it"""
+    repo = AsyncPersonaRepository(neo4j_session)
+
+    expected_version = None
+    if conditional.if_match is not None:
+        current = await repo.get_persona(persona_id)
+        if not current:
+            raise HTTPException(status_code=404, detail="Persona not found")
+        conditional.check_precondition(persona_etag(current))
+        # Keep the If-Match check atomic with the write
+        expected_version = current.get("version", 0)
 
     # Filter out None values (only update provided fields)
     updates = {k: v for k, v in request.dict().items() if v is not None}
@@ -81,27 +214,32 @@ async def edit_persona(
     if not updates:
         raise HTTPException(status_code=400, detail="No fields to update")
     
-    result = repo.update_persona(persona_id, updates)
+    try:
+        result = await repo.update_persona(persona_id, updates, expected_version)
+    except VersionConflict:
+        current = await repo.get_persona(persona_id)
+        raise PreconditionFailed(persona_etag(current) if current else "")
 
     if not result:
         raise HTTPException(status_code=404, detail="Persona not found")
     
+    conditional.set_etag(persona_etag(result))
     return result
 
 @personas_router.delete("/personas/{persona_id}")
 async def delete_persona(
     persona_id: str,
-    neo4j_session: Neo4jSession = Depends(get_neo4j_db),
+    neo4j_session: Neo4jAsyncSession = Depends(get_async_neo4j_db),
     user_id: int = Depends(get_current_user)
 ):
     """Delete a persona"""
-    repo = PersonaRepository(neo4j_session)
+    repo = AsyncPersonaRepository(neo4j_session)
 
     # Check if persona exists first
-    persona = repo.get_persona(persona_id)
+    persona = await repo.get_persona(persona_id)
     if not persona:
         raise HTTPException(status_code=404, detail="Persona not found")
     
-    repo.delete_persona(persona_id)
+    await repo.delete_persona(persona_id)
 
     return {"message": "Persona deleted successfully", "persona_id": persona_id}
\ No newline at end of file
@@ -3,6 +3,7 @@ from app.db.database import get_db
 from app.db.repositories.user_repository import UserRepository
 from sqlalchemy.orm import Session
 from app.core.security import get_current_user
+from app.core.token_quota import token_quota
 from pydantic import BaseModel
 from typing import Optional
 
@@ -44,3 +45,8 @@ def get_active_persona(
     user_repo = UserRepository(db, None)
     persona_id = user_repo.get_active_persona_id(user_id)
     return ActivePersonaResponse(persona_id=persona_id)
+
+@users_router.get("/token-usage")
+def get_token_usage(user_id: int = Depends(get_current_user)):
+    """LLM tokens used by the current user in each rolling window, with the budgets"""
+    return {"usage": token_quota.usage(user_id), "budgets": token_quota.budgets}
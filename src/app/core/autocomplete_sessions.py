@@ -0,0 +1,135 @@
+"""
+Autocomplete Session Manager
+
+Tracks the in-flight autocomplete generation for each user so that:
+- a new request cancels the previous (now stale) generation
+- requests arriving within a short window are coalesced into the last one
+- the upstream Gemini stream is closed as soon as a generation is cancelled
+  or the client disconnects
+"""
+import asyncio
+import os
+from contextlib import suppress
+from dataclasses import dataclass, field
+from typing import AsyncIterator, Awaitable, Dict, Optional, TypeVar
+
+T = TypeVar("T")
+
+# Requests from the same user within this window collapse into the newest one
+COALESCE_WINDOW_SECONDS = int(os.getenv("AUTOCOMPLETE_COALESCE_MS", "75")) / 1000
+
+@dataclass
+class AutocompleteTicket:
+    """One accepted autocomplete request for a user"""
+    user_id: int
+    generation: int
+    cancelled: asyncio.Event = field(default_factory=asyncio.Event)
+
+class AutocompleteSessionManager:
+    """Manages the latest autocomplete generation per user"""
+
+    def __init__(self, coalesce_window: float = COALESCE_WINDOW_SECONDS):
+        self.coalesce_window = coalesce_window
+        # user_id -> latest ticket
+        self._current: Dict[int, AutocompleteTicket] = {}
+        self.stats = {"started": 0, "coalesced": 0, "cancelled": 0, "completed": 0}
+
+    async def begin(self, user_id: int) -> Optional[AutocompleteTicket]:
+        """
+        Register a new request for the user, superseding any earlier one.
+
+        Waits for the coalescing window and returns None if a newer request
+        arrived in the meantime (the caller should not call the model).
+        """
+        previous = self._current.get(user_id)
+        ticket = AutocompleteTicket(
+            user_id=user_id,
+            generation=previous.generation + 1 if previous else 1
+        )
+        self._current[user_id] = ticket
+
+        if previous:
+            previous.cancelled.set()
+
+        if self.coalesce_window > 0:
+            await asyncio.sleep(self.coalesce_window)
+
+        if ticket.cancelled.is_set():
+            self.stats["coalesced"] += 1
+            return None
+
+        self.stats["started"] += 1
+        return ticket
+
+    def cancel(self, user_id: int):
+        """Cancel the user's in-flight generation (e.g. answered from cache)"""
+        ticket = self._current.pop(user_id, None)
+        if ticket:
+            ticket.cancelled.set()
+
+    def finish(self, ticket: AutocompleteTicket):
+        """Forget the ticket if it is still the user's latest one"""
+        if self._current.get(ticket.user_id) is ticket:
+            del self._current[ticket.user_id]
+
+    async def stream(self, ticket: AutocompleteTicket, source: AsyncIterator[str]) -> AsyncIterator[str]:
+        """
+        Relay chunks from an upstream async generator until it finishes or
+        the ticket is superseded. The upstream generator is always closed,
+        including when the consumer goes away (client disconnect).
+        """
+        cancel_wait = asyncio.ensure_future(ticket.cancelled.wait())
+        next_chunk = None
+        try:
+            while True:
+                next_chunk = asyncio.ensure_future(anext(source))
+                done, _ = await asyncio.wait({next_chunk, cancel_wait}, return_when=asyncio.FIRST_COMPLETED)
+
+                if next_chunk not in done:
+                    next_chunk.cancel()
+                    with suppress(asyncio.CancelledError, StopAsyncIteration):
+                        await next_chunk
+                    self.stats["cancelled"] += 1
+                    return
+
+                try:
+                    chunk = next_chunk.result()
+                except StopAsyncIteration:
+                    self.stats["completed"] += 1
+                    return
+
+                yield chunk
+        finally:
+            cancel_wait.cancel()
+            # Stop a pending anext() first: aclose() on a running generator raises
+            if next_chunk is not None and not next_chunk.done():
+                next_chunk.cancel()
+                with suppress(asyncio.CancelledError, StopAsyncIteration):
+                    await next_chunk
+            await source.aclose()
+
+    async def run(self, ticket: AutocompleteTicket, operation: Awaitable[T]) -> Optional[T]:
+        """Await a single upstream call, returning None if the ticket is superseded first"""
+        task = asyncio.ensure_future(operation)
+        cancel_wait = asyncio.ensure_future(ticket.cancelled.wait())
+        try:
+            done, _ = await asyncio.wait({task, cancel_wait}, return_when=asyncio.FIRST_COMPLETED)
+            if task not in done:
+                self.stats["cancelled"] += 1
+                return None
+            self.stats["completed"] += 1
+            return task.result()
+        finally:
+            cancel_wait.cancel()
+            if not task.done():
+                task.cancel()
+                with suppress(asyncio.CancelledError):
+                    await task
+
+    def active_count(self) -> int:
+        """Number of users with an in-flight generation"""
+        return len(self._current)
+
+
+# Global autocomplete session manager instance
+autocomplete_sessions = AutocompleteSessionManager()
@@ -0,0 +1,158 @@
+"""
+Cache Backends
+
+Small key/value caches used for read-through caching of hot lookups.
+- TTLCache: in-process LRU with per-entry expiry (default)
+- RedisCache: shared across workers/nodes, used when REDIS_URL is set
+
+Values must be JSON-serializable so both backends behave the same.
+get/set/delete block on Redis; async code uses get_async/set_async/delete_async.
+
+A write-through cache invalidated on change is only coherent when it's
+shared: an in-process copy in another worker keeps serving the old value
+until it expires. Such caches pass local_ttl_seconds to bound that staleness
+when REDIS_URL isn't set.
+"""
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Optional
+
+REDIS_URL = os.getenv("REDIS_URL")
+# TTL for write-through caches that fall back to in-process (see above)
+LOCAL_CACHE_TTL_SECONDS = float(os.getenv("LOCAL_CACHE_TTL_SECONDS", "5"))
+
+class TTLCache:
+    """Thread-safe in-process LRU cache with a TTL per entry"""
+
+    def __init__(self, namespace: str, ttl_seconds: float, max_size: int = 10000):
+        self.namespace = namespace
+        self.ttl_seconds = ttl_seconds
+        self.max_size = max_size
+        self._lock = threading.Lock()
+        self._data: "OrderedDict[str, tuple[float, Any]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            item = self._data.get(key)
+            if item is None or item[0] < time.monotonic():
+                if item is not None:
+                    del self._data[key]
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return item[1]
+
+    def set(self, key: str, value: Any, ttl_seconds: float = None):
+        expires_at = time.monotonic() + (ttl_seconds or self.ttl_seconds)
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def delete(self, key: str):
+        with self._lock:
+            self._data.pop(key, None)
+
+    async def get_async(self, key: str) -> Optional[Any]:
+        return self.get(key)
+
+    async def set_async(self, key: str, value: Any, ttl_seconds: float = None):
+        self.set(key, value, ttl_seconds)
+
+    async def delete_async(self, key: str):
+        self.delete(key)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "backend": "memory",
+            "size": len(self._data),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0
+        }
+
+class RedisCache:
+    """Cache shared by every worker, stored as JSON in Redis"""
+
+    def __init__(self, namespace: str, ttl_seconds: float, url: str = REDIS_URL):
+        import redis
+
+        self.url = url
+        self.namespace = namespace
+        self.ttl_seconds = ttl_seconds
+        self.client = redis.Redis.from_url(url)
+        self._async_client = None
+        self.hits = 0
+        self.misses = 0
+
+    def _key(self, key: str) -> str:
+        return f"{self.namespace}:{key}"
+
+    def _async(self):
+        if self._async_client is None:
+            import redis.asyncio as redis
+
+            self._async_client = redis.Redis.from_url(self.url)
+        return self._async_client
+
+    def _decode(self, raw) -> Optional[Any]:
+        if raw is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return json.loads(raw)
+
+    def get(self, key: str) -> Optional[Any]:
+        return self._decode(self.client.get(self._key(key)))
+
+    def set(self, key: str, value: Any, ttl_seconds: float = None):
+        self.client.set(self._key(key), json.dumps(value), ex=int(ttl_seconds or self.ttl_seconds))
+
+    def delete(self, key: str):
+        self.client.delete(self._key(key))
+
+    async def get_async(self, key: str) -> Optional[Any]:
+        return self._decode(await self._async().get(self._key(key)))
+
+    async def set_async(self, key: str, value: Any, ttl_seconds: float = None):
+        await self._async().set(self._key(key), json.dumps(value), ex=int(ttl_seconds or self.ttl_seconds))
+
+    async def delete_async(self, key: str):
+        await self._async().delete(self._key(key))
+
+    def clear(self):
+        for key in self.client.scan_iter(f"{self.namespace}:*"):
+            self.client.delete(key)
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "backend": "redis",
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0
+        }
+
+def create_cache(namespace: str, ttl_seconds: float, max_size: int = 10000, shared: bool = True,
+                 local_ttl_seconds: float = None):
+    """
+    Redis-backed cache if REDIS_URL is configured (and shared is allowed), else
+    in-process, with local_ttl_seconds instead of ttl_seconds if given
+    """
+    if shared and REDIS_URL:
+        return RedisCache(namespace, ttl_seconds)
+    if local_ttl_seconds is not None:
+        ttl_seconds = min(ttl_seconds, local_ttl_seconds)
+    return TTLCache(namespace, ttl_seconds, max_size)
@@ -0,0 +1,208 @@
+"""
+Collaboration Cluster Backends
+
+What the collaboration layer shares between uvicorn workers and nodes:
+- pub/sub channels for room events (one channel per draft)
+- leases: which node owns a room (holds the authoritative document)
+- presence: which users are connected to a room, on any node
+
+LocalClusterBackend keeps all of it in process. It is the default for a
+single worker, and several ConnectionManagers sharing one instance behave
+like separate nodes (the stub used to exercise multi-node behaviour).
+RedisClusterBackend shares it through Redis when REDIS_URL is set.
+"""
+import asyncio
+import json
+import os
+import socket
+import time
+import uuid
+from typing import Awaitable, Callable, Dict, List, Optional, Set
+from app.core.logger import logger
+
+REDIS_URL = os.getenv("REDIS_URL")
+
+Handler = Callable[[dict], Awaitable[None]]
+
+def default_node_id() -> str:
+    return os.getenv("COLLAB_NODE_ID") or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+
+class LocalClusterBackend:
+    """In-process channels, leases and presence"""
+
+    def __init__(self):
+        self._subscribers: Dict[str, Set[Handler]] = {}
+        self._leases: Dict[str, tuple[str, float]] = {}
+        # draft_id -> node_id -> (expires_at, users)
+        self._presence: Dict[int, Dict[str, tuple[float, list]]] = {}
+
+    async def publish(self, channel: str, message: dict):
+        for handler in list(self._subscribers.get(channel, ())):
+            try:
+                await handler(message)
+            except Exception as e:
+                logger.error(f"Collaboration handler failed on {channel}: {e}")
+
+    async def subscribe(self, channel: str, handler: Handler):
+        self._subscribers.setdefault(channel, set()).add(handler)
+
+    async def unsubscribe(self, channel: str, handler: Handler):
+        handlers = self._subscribers.get(channel)
+        if handlers is not None:
+            handlers.discard(handler)
+            if not handlers:
+                del self._subscribers[channel]
+
+    async def acquire_lease(self, key: str, owner: str, ttl: float) -> bool:
+        """Take the lease if it's free or already ours (and extend it)"""
+        holder = self._leases.get(key)
+        if holder is None or holder[0] == owner or holder[1] < time.monotonic():
+            self._leases[key] = (owner, time.monotonic() + ttl)
+            return True
+        return False
+
+    async def release_lease(self, key: str, owner: str):
+        holder = self._leases.get(key)
+        if holder is not None and holder[0] == owner:
+            del self._leases[key]
+
+    async def lease_holder(self, key: str) -> Optional[str]:
+        holder = self._leases.get(key)
+        if holder is None or holder[1] < time.monotonic():
+            return None
+        return holder[0]
+
+    async def set_presence(self, draft_id: int, node_id: str, users: list, ttl: float):
+        """Replace this node's user list for a room (empty list removes it)"""
+        nodes = self._presence.setdefault(draft_id, {})
+        if users:
+            nodes[node_id] = (time.monotonic() + ttl, users)
+        else:
+            nodes.pop(node_id, None)
+            if not nodes:
+                del self._presence[draft_id]
+
+    async def get_presence(self, draft_id: int) -> List[dict]:
+        now = time.monotonic()
+        return [
+            user
+            for expires_at, users in self._presence.get(draft_id, {}).values()
+            if expires_at >= now
+            for user in users
+        ]
+
+    async def close(self):
+        self._subscribers.clear()
+
+# Renew/acquire only if free or ours; returns 1 when we hold the lease
+ACQUIRE_LEASE_SCRIPT = """
+local holder = redis.call('GET', KEYS[1])
+if holder == false or holder == ARGV[1] then
+    redis.call('SET', KEYS[1], ARGV[1], 'PX', ARGV[2])
+    return 1
+end
+return 0
+"""
+
+RELEASE_LEASE_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+class RedisClusterBackend:
+    """Channels, leases and presence shared by every node through Redis"""
+
+    def __init__(self, url: str = REDIS_URL, prefix: str = "collab"):
+        import redis.asyncio as redis
+
+        self.prefix = prefix
+        self.client = redis.Redis.from_url(url)
+        self._pubsub = self.client.pubsub()
+        self._handlers: Dict[str, Set[Handler]] = {}
+        self._reader: Optional[asyncio.Task] = None
+        self._acquire = self.client.register_script(ACQUIRE_LEASE_SCRIPT)
+        self._release = self.client.register_script(RELEASE_LEASE_SCRIPT)
+
+    def _key(self, *parts) -> str:
+        return ":".join([self.prefix, *map(str, parts)])
+
+    async def publish(self, channel: str, message: dict):
+        await self.client.publish(self._key(channel), json.dumps(message))
+
+    async def subscribe(self, channel: str, handler: Handler):
+        handlers = self._handlers.setdefault(channel, set())
+        if not handlers:
+            await self._pubsub.subscribe(self._key(channel))
+        handlers.add(handler)
+        if self._reader is None:
+            self._reader = asyncio.create_task(self._read())
+
+    async def unsubscribe(self, channel: str, handler: Handler):
+        handlers = self._handlers.get(channel)
+        if handlers is None:
+            return
+        handlers.discard(handler)
+        if not handlers:
+            del self._handlers[channel]
+            await self._pubsub.unsubscribe(self._key(channel))
+
+    async def _read(self):
+        prefix = f"{self.prefix}:"
+        while True:
+            try:
+                message = await self._pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+                if message is None:
+                    continue
+                channel = message["channel"].decode()[len(prefix):]
+                payload = json.loads(message["data"])
+                for handler in list(self._handlers.get(channel, ())):
+                    await handler(payload)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Collaboration pub/sub reader error: {e}")
+                await asyncio.sleep(0.5)
+
+    async def acquire_lease(self, key: str, owner: str, ttl: float) -> bool:
+        return bool(await self._acquire(keys=[self._key("lease", key)], args=[owner, int(ttl * 1000)]))
+
+    async def release_lease(self, key: str, owner: str):
+        await self._release(keys=[self._key("lease", key)], args=[owner])
+
+    async def lease_holder(self, key: str) -> Optional[str]:
+        holder = await self.client.get(self._key("lease", key))
+        return holder.decode() if holder is not None else None
+
+    async def set_presence(self, draft_id: int, node_id: str, users: list, ttl: float):
+        nodes_key = self._key("presence", draft_id)
+        node_key = self._key("presence", draft_id, node_id)
+        pipe = self.client.pipeline(transaction=False)
+        if users:
+            pipe.set(node_key, json.dumps(users), px=int(ttl * 1000))
+            pipe.sadd(nodes_key, node_id)
+            pipe.pexpire(nodes_key, int(ttl * 1000))
+        else:
+            pipe.delete(node_key)
+            pipe.srem(nodes_key, node_id)
+        await pipe.execute()
+
+    async def get_presence(self, draft_id: int) -> List[dict]:
+        nodes = await self.client.smembers(self._key("presence", draft_id))
+        if not nodes:
+            return []
+        values = await self.client.mget([self._key("presence", draft_id, node.decode()) for node in nodes])
+        return [user for value in values if value is not None for user in json.loads(value)]
+
+    async def close(self):
+        if self._reader is not None:
+            self._reader.cancel()
+        await self._pubsub.aclose()
+        await self.client.aclose()
+
+def create_cluster_backend():
+    """Redis-backed cluster state if REDIS_URL is configured, else in-process"""
+    if REDIS_URL:
+        return RedisClusterBackend()
+    return LocalClusterBackend()
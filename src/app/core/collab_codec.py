@@ -0,0 +1,125 @@
+"""
+Collaboration Wire Codecs
+
+The collaboration protocol's encoding is negotiated through the WebSocket
+subprotocol:
+- "collab.msgpack.v1": MessagePack binary frames with short field codes and
+  numeric event types; None fields are left out
+- "collab.json.v1", or no subprotocol: the JSON text protocol (old clients)
+
+Either way frames go through permessage-deflate when the client offers it
+(uvicorn's websockets implementation accepts it by default).
+"""
+import json
+from typing import Optional, Union
+import msgpack
+
+# Field name -> wire code
+FIELD_CODES = {
+    "type": "t",
+    "draft_id": "d",
+    "user_id": "u",
+    "username": "n",
+    "color": "c",
+    "your_color": "y",
+    "users": "U",
+    "cursors": "C",
+    "position": "p",
+    "selection_start": "s",
+    "selection_end": "e",
+    "cursor_position": "k",
+    "version": "v",
+    "op": "o",
+    "content": "x",
+    "reason": "r",
+}
+FIELD_NAMES = {code: name for name, code in FIELD_CODES.items()}
+
+# Event type -> wire code
+TYPE_CODES = {
+    # Server -> client
+    "room_state": 1,
+    "user_joined": 2,
+    "user_left": 3,
+    "cursors_update": 4,
+    "ack": 5,
+    "operation": 6,
+    "resync": 7,
+    "pong": 8,
+    "error": 9,
+    # Client -> server
+    "cursor": 20,
+    "op": 21,
+    "content": 22,
+    "ping": 23,
+}
+TYPE_NAMES = {code: name for name, code in TYPE_CODES.items()}
+
+# Fields holding lists of user/cursor records
+NESTED_FIELDS = ("users", "cursors")
+
+def _compact_record(record: dict) -> dict:
+    return {FIELD_CODES.get(key, key): value for key, value in record.items() if value is not None}
+
+def _expand_record(record: dict) -> dict:
+    return {FIELD_NAMES.get(key, key): value for key, value in record.items()}
+
+def compact(message: dict) -> dict:
+    """Message with short field codes and a numeric type"""
+    result = {}
+    for key, value in message.items():
+        if value is None:
+            continue
+        if key == "type":
+            value = TYPE_CODES.get(value, value)
+        elif key in NESTED_FIELDS:
+            value = [_compact_record(record) for record in value]
+        result[FIELD_CODES.get(key, key)] = value
+    return result
+
+def expand(message: dict) -> dict:
+    """Inverse of compact() (left-out fields stay missing)"""
+    result = {}
+    for key, value in message.items():
+        name = FIELD_NAMES.get(key, key)
+        if name == "type":
+            value = TYPE_NAMES.get(value, value)
+        elif name in NESTED_FIELDS:
+            value = [_expand_record(record) for record in value]
+        result[name] = value
+    return result
+
+class JsonCodec:
+    name = "json"
+    subprotocol = "collab.json.v1"
+    binary = False
+
+    def encode(self, message: dict) -> str:
+        return json.dumps(message)
+
+    def decode(self, data: Union[str, bytes]) -> dict:
+        return json.loads(data)
+
+class MsgpackCodec:
+    name = "msgpack"
+    subprotocol = "collab.msgpack.v1"
+    binary = True
+
+    def encode(self, message: dict) -> bytes:
+        return msgpack.packb(compact(message))
+
+    def decode(self, data: Union[str, bytes]) -> dict:
+        message = msgpack.unpackb(data)
+        if not isinstance(message, dict):
+            raise ValueError("Expected a map")
+        return expand(message)
+
+json_codec = JsonCodec()
+msgpack_codec = MsgpackCodec()
+
+def negotiate(subprotocols: list) -> tuple[Union[JsonCodec, MsgpackCodec], Optional[str]]:
+    """Pick the codec for the client's offered subprotocols; returns (codec, subprotocol to accept)"""
+    for codec in (msgpack_codec, json_codec):
+        if codec.subprotocol in subprotocols:
+            return codec, codec.subprotocol
+    return json_codec, None
@@ -0,0 +1,45 @@
+"""
+Cursor Batching
+
+Cursors move on every keypress and mouse move; broadcasting each move to
+every peer makes cursor traffic the bulk of a busy room. CursorBatch keeps
+only the latest cursor per user between ticks, and drain() returns the ones
+that actually changed since they were last sent, for one cursors_update
+frame per tick (COLLAB_CURSOR_FPS).
+"""
+import os
+from typing import Dict, List
+
+COLLAB_CURSOR_FPS = float(os.getenv("COLLAB_CURSOR_FPS", "20"))
+
+def _position(cursor: dict) -> tuple:
+    return cursor.get("position"), cursor.get("selection_start"), cursor.get("selection_end")
+
+class CursorBatch:
+    def __init__(self):
+        self.pending: Dict[int, dict] = {}
+        self.sent: Dict[int, tuple] = {}
+        self.stats = {"updates": 0, "sent": 0, "unchanged": 0}
+
+    def update(self, user_id: int, cursor: dict):
+        """Record a user's cursor (replaces any not yet sent)"""
+        self.stats["updates"] += 1
+        self.pending[user_id] = cursor
+
+    def drain(self) -> List[dict]:
+        """Cursors changed since the last drain, in update order"""
+        changed = []
+        for user_id, cursor in self.pending.items():
+            position = _position(cursor)
+            if self.sent.get(user_id) == position:
+                self.stats["unchanged"] += 1
+                continue
+            self.sent[user_id] = position
+            changed.append(cursor)
+        self.pending.clear()
+        self.stats["sent"] += len(changed)
+        return changed
+
+    def forget(self, user_id: int):
+        self.pending.pop(user_id, None)
+        self.sent.pop(user_id, None)
@@ -1,13 +1,17 @@
 from fastapi import Request
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response
 from fastapi.exceptions import RequestValidationError
-from app.core.exceptions import AppException, RateLimitException
+from app.core.exceptions import AppException, RateLimitException, NotModified, PreconditionFailed
 from app.schemas.error import ErrorResponse
 from app.core.logger import logger
 import traceback
 
 async def app_exception_handler(request: Request, exc: AppException):
     """Handle all AppException subclasses"""
+    # Conditional GET hit: no body, not an error
+    if isinstance(exc, NotModified):
+        return Response(status_code=304, headers={"ETag": exc.etag, "Cache-Control": "private, no-cache"})
+    
     logger.error(f"AppException: {exc.code} - {exc.message}")
     
     error_response = ErrorResponse(
@@ -26,6 +30,10 @@ async def app_exception_handler(request: Request, exc: AppException):
     if isinstance(exc, RateLimitException):
         response.headers["Retry-After"] = str(exc.retry_after)
     
+    # Current version for a failed If-Match
+    if isinstance(exc, PreconditionFailed):
+        response.headers["ETag"] = exc.etag
+    
     return response
 
 async def validation_exception_handler(request: Request, exc: RequestValidationError):
@@ -0,0 +1,57 @@
+"""
+Conditional Requests
+
+Strong ETags for polled resources, derived from a version counter or
+updated_at rather than the body, so checking one costs no serialization.
+The Conditional dependency handles:
+- If-None-Match on reads: NotModified (304, no body) before the response
+  is built
+- If-Match on writes: PreconditionFailed (412) if the resource changed
+  since the client read it (optimistic concurrency)
+"""
+import hashlib
+from fastapi import Request, Response
+from app.core.exceptions import NotModified, PreconditionFailed
+
+def make_etag(*parts) -> str:
+    """Strong ETag for a resource version, e.g. make_etag("draft", id, revision, updated_at)"""
+    digest = hashlib.blake2b("|".join(map(str, parts)).encode("utf-8"), digest_size=12).hexdigest()
+    return f'"{digest}"'
+
+def _matches(header: str, etag: str, weak: bool) -> bool:
+    """Whether an If-Match/If-None-Match header lists etag (weak comparison ignores W/)"""
+    if header.strip() == "*":
+        return True
+    for candidate in header.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            if not weak:
+                continue
+            candidate = candidate[2:]
+        if candidate == etag:
+            return True
+    return False
+
+class Conditional:
+    """Dependency: `conditional: Conditional = Depends()`"""
+
+    def __init__(self, request: Request, response: Response):
+        self.if_none_match = request.headers.get("if-none-match")
+        self.if_match = request.headers.get("if-match")
+        self.response = response
+
+    def set_etag(self, etag: str):
+        self.response.headers["ETag"] = etag
+        # Private data: clients may keep it but must revalidate
+        self.response.headers["Cache-Control"] = "private, no-cache"
+
+    def check_not_modified(self, etag: str):
+        """Tag the response; raise NotModified if the client's copy is current"""
+        self.set_etag(etag)
+        if self.if_none_match is not None and _matches(self.if_none_match, etag, weak=True):
+            raise NotModified(etag)
+
+    def check_precondition(self, etag: str):
+        """Raise PreconditionFailed if If-Match was sent and doesn't match the current version"""
+        if self.if_match is not None and not _matches(self.if_match, etag, weak=False):
+            raise PreconditionFailed(etag)
@@ -22,6 +22,23 @@ class NotFound(AppException):
     def __init__(self, message: str, code: str = "NOT_FOUND", details: dict = None):
         super().__init__(message, code, status_code=404, details=details)
 
+class ConflictException(AppException):
+    """Request conflicts with the current state of the resource"""
+    def __init__(self, message: str, code: str = "CONFLICT", details: dict = None):
+        super().__init__(message, code, status_code=409, details=details)
+
+class PreconditionFailed(AppException):
+    """If-Match didn't match: the resource changed since the client read it"""
+    def __init__(self, etag: str, message: str = "Resource has been modified", code: str = "PRECONDITION_FAILED"):
+        super().__init__(message, code, status_code=412, details={"etag": etag})
+        self.etag = etag
+
+class NotModified(AppException):
+    """If-None-Match matched: the client's copy is current (answered with an empty 304)"""
+    def __init__(self, etag: str):
+        super().__init__("Not modified", "NOT_MODIFIED", status_code=304)
+        self.etag = etag
+
 class RateLimitException(AppException):
     """Rate limit exceeded errors"""
     def __init__(self, message: str = "Rate limit exceeded. Please try again later.", 
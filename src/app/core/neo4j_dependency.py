@@ -1,4 +1,4 @@
-from app.db.neo4j_connection import get_neo4j_session
+from app.db.neo4j_connection import get_neo4j_session, get_async_neo4j_session
 from fastapi import Depends
 
 def get_neo4j_db():
@@ -6,4 +6,11 @@ def get_neo4j_db():
     try:
         yield session
     finally: 
-        session.close()
\ No newline at end of file
+        session.close()
+
+async def get_async_neo4j_db():
+    session = get_async_neo4j_session()
+    try:
+        yield session
+    finally:
+        await session.close()
@@ -0,0 +1,114 @@
+"""
+Provider Registry
+
+Holds the application-scoped clients for external services (Gemini, Qdrant).
+Clients are created once per process with tuned HTTP connection pools and
+shared by every request, instead of building a new client (and a new
+connection pool / TLS handshake) inside each service constructor.
+"""
+import os
+import threading
+import httpx
+import google.genai as genai
+from google.genai import types
+from qdrant_client import QdrantClient
+from fastapi import Depends, Request
+from app.core.logger import logger
+
+# Connection pool settings (shared by every request in this process)
+GENAI_MAX_CONNECTIONS = int(os.getenv("GENAI_MAX_CONNECTIONS", "100"))
+GENAI_MAX_KEEPALIVE = int(os.getenv("GENAI_MAX_KEEPALIVE", "20"))
+GENAI_KEEPALIVE_EXPIRY = float(os.getenv("GENAI_KEEPALIVE_EXPIRY", "60"))
+GENAI_HTTP2 = os.getenv("GENAI_HTTP2", "true").lower() == "true"
+
+# Models; the lite model serves users close to their token budget (app.core.token_quota)
+GENAI_MODEL = os.getenv("GENAI_MODEL", "gemini-2.0-flash")
+GENAI_LITE_MODEL = os.getenv("GENAI_LITE_MODEL", "gemini-2.0-flash-lite")
+
+QDRANT_HOST = os.getenv("QDRANT_HOST", "localhost")
+QDRANT_PORT = int(os.getenv("QDRANT_PORT", "6333"))
+QDRANT_MAX_CONNECTIONS = int(os.getenv("QDRANT_MAX_CONNECTIONS", "50"))
+QDRANT_TIMEOUT = int(os.getenv("QDRANT_TIMEOUT", "10"))
+
+class ProviderRegistry:
+    """Lazily creates and caches shared clients for external services"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._genai_client: genai.Client | None = None
+        self._qdrant_client: QdrantClient | None = None
+
+    @property
+    def genai(self) -> genai.Client:
+        """Shared Gemini client backed by a pooled HTTP/2 connection"""
+        if self._genai_client is None:
+            with self._lock:
+                if self._genai_client is None:
+                    self._genai_client = self._create_genai_client()
+        return self._genai_client
+
+    @property
+    def qdrant(self) -> QdrantClient:
+        """Shared Qdrant client backed by a pooled HTTP connection"""
+        if self._qdrant_client is None:
+            with self._lock:
+                if self._qdrant_client is None:
+                    self._qdrant_client = self._create_qdrant_client()
+        return self._qdrant_client
+
+    def _create_genai_client(self) -> "genai.Client":
+        limits = httpx.Limits(
+            max_connections=GENAI_MAX_CONNECTIONS,
+            max_keepalive_connections=GENAI_MAX_KEEPALIVE,
+            keepalive_expiry=GENAI_KEEPALIVE_EXPIRY
+        )
+        http_options = types.HttpOptions(
+            client_args={"http2": GENAI_HTTP2, "limits": limits},
+            async_client_args={"http2": GENAI_HTTP2, "limits": limits}
+        )
+        return genai.Client(api_key=os.getenv("GOOGLE_API_KEY"), http_options=http_options)
+
+    def _create_qdrant_client(self) -> QdrantClient:
+        limits = httpx.Limits(
+            max_connections=QDRANT_MAX_CONNECTIONS,
+            max_keepalive_connections=QDRANT_MAX_CONNECTIONS
+        )
+        return QdrantClient(host=QDRANT_HOST, port=QDRANT_PORT, timeout=QDRANT_TIMEOUT, limits=limits)
+
+    def startup(self):
+        """Eagerly create clients so the first request doesn't pay for it"""
+        self.genai
+        self.qdrant
+        logger.info("Provider registry started")
+
+    def close(self):
+        """Close all shared clients and their connection pools"""
+        with self._lock:
+            if self._genai_client is not None:
+                try:
+                    self._genai_client.close()
+                except Exception as e:
+                    logger.warning(f"Error closing Gemini client: {e}")
+                self._genai_client = None
+
+            if self._qdrant_client is not None:
+                try:
+                    self._qdrant_client.close()
+                except Exception as e:
+                    logger.warning(f"Error closing Qdrant client: {e}")
+                self._qdrant_client = None
+
+        logger.info("Provider registry closed")
+
+
+# Process-wide registry (used by the API lifespan and by Celery workers)
+providers = ProviderRegistry()
+
+def get_providers(request: Request) -> ProviderRegistry:
+    return request.app.state.providers
+
+def get_genai_client(registry: ProviderRegistry = Depends(get_providers)) -> genai.Client:
+    return registry.genai
+
+def get_qdrant_client(registry: ProviderRegistry = Depends(get_providers)) -> QdrantClient:
+    return registry.qdrant
@@ -1,62 +1,120 @@
 """
-Rate Limiting Middleware using SlowAPI
+Rate Limiting
 
-This module provides rate limiting for API endpoints using SlowAPI (slowapi).
-Rate limits are configurable per endpoint and per user.
+Token-bucket rate limits applied with a decorator on endpoints that take a
+`request: Request` parameter, or checked inline once the cost is known:
+
+    @limiter.limit(RATE_LIMITS["chat"])
+
+    await limiter.check_async(request, RATE_LIMITS["autocomplete_tokens"], "autocomplete_tokens",
+                              cost=estimated_tokens, user_id=user_id)
+
+- Buckets live in Redis when REDIS_URL is set, so limits hold across workers
+  and restarts; otherwise they are per process (app.core.token_bucket)
+- Keys are derived from the user id (or the client IP when unauthenticated),
+  which is stable across workers
+- `cost` weights a request by the work it causes (tokens, bytes) instead of
+  counting it as 1
 """
-from slowapi import Limiter
-from slowapi.util import get_remote_address
-from slowapi.errors import RateLimitExceeded
+import functools
+import inspect
+import os
+from typing import Callable, Optional
 from fastapi import Request
-from fastapi.responses import JSONResponse
-from app.schemas.error import ErrorResponse
+from app.core.exceptions import RateLimitException
 from app.core.logger import logger
+from app.core.security import verify_token
+from app.core.token_bucket import create_token_bucket, parse_rate, retry_after_seconds
 
-def get_user_identifier(request: Request) -> str:
+def get_user_identifier(request: Request, user_id: Optional[int] = None) -> str:
     """
     Get unique identifier for rate limiting.
-    Uses user_id from auth header if available, otherwise falls back to IP.
+    Uses the user id if available, otherwise falls back to the client IP.
     """
-    # Try to get user from authorization header (if already authenticated)
-    auth_header = request.headers.get("Authorization", "")
-    if auth_header.startswith("Bearer "):
-        # Use a hash of the token as identifier (more privacy-preserving)
-        return f"user:{hash(auth_header)}"
-    
+    if user_id is None:
+        auth_header = request.headers.get("Authorization", "")
+        if auth_header.startswith("Bearer "):
+            claims = verify_token(auth_header[len("Bearer "):])
+            if claims:
+                user_id = claims["user_id"]
+
+    if user_id is not None:
+        return f"user:{user_id}"
+
     # Fall back to IP address for unauthenticated requests
-    return get_remote_address(request)
+    return f"ip:{request.client.host if request.client else 'unknown'}"
+
+class RateLimiter:
+    def __init__(self, backend=None):
+        self.backend = backend or create_token_bucket()
+
+    def check(self, request: Request, rate: str, scope: str, cost: float = 1, user_id: Optional[int] = None):
+        """Spend `cost` tokens from the caller's bucket for `scope`; raises RateLimitException when empty"""
+        capacity, refill_rate = parse_rate(rate)
+        identifier = get_user_identifier(request, user_id)
+        # A request larger than the whole bucket drains it rather than being rejected forever
+        decision = self.backend.acquire(f"{scope}:{identifier}", capacity, refill_rate, min(cost, capacity))
+        self._enforce(decision, identifier, rate, scope, cost)
+
+    async def check_async(self, request: Request, rate: str, scope: str, cost: float = 1,
+                          user_id: Optional[int] = None):
+        """check() for async endpoints (the Redis round trip doesn't block the event loop)"""
+        capacity, refill_rate = parse_rate(rate)
+        identifier = get_user_identifier(request, user_id)
+        decision = await self.backend.acquire_async(f"{scope}:{identifier}", capacity, refill_rate, min(cost, capacity))
+        self._enforce(decision, identifier, rate, scope, cost)
 
-# Create limiter instance
-limiter = Limiter(key_func=get_user_identifier)
+    def _enforce(self, decision, identifier: str, rate: str, scope: str, cost: float):
+        if not decision.allowed:
+            retry_after = retry_after_seconds(decision)
+            logger.warning(f"Rate limit exceeded for {identifier} on {scope} ({rate}, cost {cost})")
+            raise RateLimitException(
+                message="Rate limit exceeded. Please slow down and try again later.",
+                retry_after=retry_after
+            )
+
+    def limit(self, rate: str, scope: str = None, cost: Callable[..., float] = None):
+        """
+        Decorate an endpoint with a token-bucket limit.
+
+        `cost` receives the endpoint's keyword arguments and returns the number
+        of tokens the request spends (default 1).
+        """
+        def decorator(func):
+            bucket_scope = scope or f"{func.__module__}.{func.__name__}"
+
+            def arguments(kwargs) -> tuple:
+                request = kwargs.get("request")
+                if not isinstance(request, Request):
+                    raise RuntimeError(f"{func.__name__} needs a 'request: Request' parameter to be rate limited")
+                weight = cost(**kwargs) if cost else 1
+                return request, rate, bucket_scope, weight, kwargs.get("user_id")
+
+            if inspect.iscoroutinefunction(func):
+                @functools.wraps(func)
+                async def async_wrapper(*args, **kwargs):
+                    await self.check_async(*arguments(kwargs))
+                    return await func(*args, **kwargs)
+                return async_wrapper
+
+            @functools.wraps(func)
+            def sync_wrapper(*args, **kwargs):
+                self.check(*arguments(kwargs))
+                return func(*args, **kwargs)
+            return sync_wrapper
+
+        return decorator
+
+# Global rate limiter instance
+limiter = RateLimiter()
 
 # Rate limit configurations
 RATE_LIMITS = {
     "chat": "30/minute",        # 30 chat requests per minute
     "upload": "10/minute",      # 10 uploads per minute
     "default": "100/minute",    # 100 requests per minute for other endpoints
-    "auth": "10/minute",        # 10 auth attempts per minute (login/register)
+    "auth": os.getenv("RATE_LIMIT_AUTH", "10/minute"),  # 10 auth attempts per minute (login/register)
+    "autocomplete": "60/minute",  # Higher limit for autocomplete (fast, lightweight)
+    "autocomplete_tokens": os.getenv("RATE_LIMIT_AUTOCOMPLETE_TOKENS", "30000/minute"),  # prompt + completion tokens
+    "upload_mb": os.getenv("RATE_LIMIT_UPLOAD_MB", "200/hour"),  # uploaded megabytes
 }
-
-async def rate_limit_exceeded_handler(request: Request, exc: RateLimitExceeded) -> JSONResponse:
-    """Custom handler for rate limit exceeded errors"""
-    logger.warning(f"Rate limit exceeded for {get_user_identifier(request)}: {exc.detail}")
-    
-    # Parse retry-after from the exception
-    retry_after = 60  # Default
-    if hasattr(exc, 'retry_after'):
-        retry_after = exc.retry_after
-    
-    error_response = ErrorResponse(
-        status="error",
-        message="Rate limit exceeded. Please slow down and try again later.",
-        code="RATE_LIMIT_EXCEEDED",
-        details={"retry_after": retry_after}
-    )
-    
-    response = JSONResponse(
-        status_code=429,
-        content=error_response.model_dump()
-    )
-    response.headers["Retry-After"] = str(retry_after)
-    
-    return response
@@ -1,25 +1,86 @@
+"""
+Authentication Dependencies
+
+Verified JWTs are cached in-process, keyed by a SHA-256 of the token, until
+the earlier of the token's own expiry and JWT_CACHE_TTL_SECONDS, so repeat
+requests skip jwt.decode.
+
+- get_current_user: user id only (most endpoints)
+- get_user_context: user id, username claim and the active persona id,
+  resolved through the write-through active persona cache so hot endpoints
+  don't need their own users-table lookup
+"""
+import hashlib
+import os
+import time
+from dataclasses import dataclass
+from typing import Optional
 from fastapi import Depends, HTTPException
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from sqlalchemy.orm import Session
+from app.core.cache import TTLCache
+from app.db.database import get_db
+from app.db.repositories.user_repository import UserRepository
 from app.services.auth_service import AuthService
 
+JWT_CACHE_TTL_SECONDS = int(os.getenv("JWT_CACHE_TTL_SECONDS", "300"))
+JWT_CACHE_MAX_SIZE = int(os.getenv("JWT_CACHE_MAX_SIZE", "50000"))
+
 security = HTTPBearer()
 
+@dataclass(frozen=True)
+class UserContext:
+    user_id: int
+    username: Optional[str] = None
+    active_persona_id: Optional[str] = None
+
+# Per-process: a local decode is cheaper than a round trip to a shared store
+token_cache = TTLCache("jwt", ttl_seconds=JWT_CACHE_TTL_SECONDS, max_size=JWT_CACHE_MAX_SIZE)
+
+def verify_token(token: str) -> Optional[dict]:
+    """
+    Return the verified claims {"user_id", "username"} of a token, or None.
+    Cache entries never outlive the token's exp claim.
+    """
+    key = hashlib.sha256(token.encode("utf-8")).hexdigest()
+    claims = token_cache.get(key)
+    if claims is not None:
+        return claims
+
+    payload = AuthService.decode_access_token(token)
+    if payload is None or payload.get("sub") is None:
+        return None
+
+    claims = {"user_id": int(payload["sub"]), "username": payload.get("username")}
+    remaining = payload.get("exp", 0) - time.time()
+    if remaining > 1:
+        token_cache.set(key, claims, ttl_seconds=min(remaining, JWT_CACHE_TTL_SECONDS))
+    return claims
+
 def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)) -> int:
     """
     Extract and validate JWT token from Authorization header.
     Returns user_id if valid, raises HTTPException otherwise.
     """
+    claims = verify_token(credentials.credentials)
+    if claims is None:
+        raise HTTPException(status_code=401, detail="Invalid or expired token")
 
-    token = credentials.credentials
-    payload = AuthService.decode_access_token(token)
+    return claims["user_id"]
 
-    if payload is None:
+def get_user_context(
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+    db: Session = Depends(get_db)
+) -> UserContext:
+    """Request-scoped user context: token claims plus the (cached) active persona id"""
+    claims = verify_token(credentials.credentials)
+    if claims is None:
         raise HTTPException(status_code=401, detail="Invalid or expired token")
-    
-    user_id: int = payload.get("sub")
-    if user_id is None:
-        raise HTTPException(status_code=401, detail="Invalid token payload")
-    
-    return int(user_id)
-
-decode_token = AuthService.decode_access_token
\ No newline at end of file
+
+    return UserContext(
+        user_id=claims["user_id"],
+        username=claims["username"],
+        active_persona_id=UserRepository(db, None).get_active_persona_id(claims["user_id"])
+    )
+
+decode_token = AuthService.decode_access_token
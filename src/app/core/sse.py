@@ -0,0 +1,246 @@
+"""
+Server-Sent Events
+
+One streaming path for the SSE endpoints (chat, autocomplete, document status):
+- events are encoded with orjson when it is installed (compact json otherwise)
+- runs of small "content" events are coalesced into one frame per
+  SSE_BATCH_MS window or SSE_BATCH_CHARS of text, so a token-by-token model
+  stream doesn't cost a frame, a socket write and a client parse per token
+- everything produced since the last write goes out in one write
+- idle streams get a ": keep-alive" comment every SSE_KEEPALIVE_SECONDS
+- every frame carries "id: <stream>:<seq>"; the frames of a stream are kept
+  for SSE_RESUME_SECONDS after it ends, and a request with Last-Event-ID
+  replays the ones after it (resume_sse) instead of starting over
+
+The producer runs as its own task filling the stream's buffer. With
+detach=True it finishes even if the client goes away (and a reconnect picks
+up the rest); otherwise a disconnect cancels it, closing the upstream stream.
+Resumable streams live in process memory, so a reconnect has to reach the
+same worker.
+"""
+import asyncio
+import json
+import os
+import time
+import uuid
+from collections import deque
+from contextlib import suppress
+from itertools import islice
+from typing import Any, AsyncIterable, Dict, Iterable, Optional, Union
+from fastapi import Request
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import iterate_in_threadpool
+from app.core.logger import logger
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Coalescing window for consecutive "content" events
+SSE_BATCH_MS = float(os.getenv("SSE_BATCH_MS", "30"))
+SSE_BATCH_CHARS = int(os.getenv("SSE_BATCH_CHARS", "1024"))
+SSE_KEEPALIVE_SECONDS = float(os.getenv("SSE_KEEPALIVE_SECONDS", "15"))
+# Already-delivered frames kept per stream for Last-Event-ID
+SSE_BUFFER_FRAMES = int(os.getenv("SSE_BUFFER_FRAMES", "512"))
+# How long a finished stream can still be resumed
+SSE_RESUME_SECONDS = float(os.getenv("SSE_RESUME_SECONDS", "60"))
+
+SSE_HEADERS = {
+    "Cache-Control": "no-cache",
+    # Don't let nginx buffer the stream
+    "X-Accel-Buffering": "no",
+}
+
+KEEPALIVE = b": keep-alive\n\n"
+RESUME_ERROR = {"type": "error", "content": "Stream can no longer be resumed", "code": "SSE_001"}
+
+Events = Union[Iterable[dict], AsyncIterable[dict]]
+
+def encode_event(event: dict) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(event, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(event, separators=(",", ":"), ensure_ascii=False).encode()
+
+def _is_text_chunk(event: dict) -> bool:
+    return event.get("type") == "content" and len(event) == 2 and isinstance(event.get("content"), str)
+
+class EventStream:
+    """Frames of one SSE response, numbered and buffered for resumption"""
+
+    def __init__(self, owner: Any = None, batch_ms: float = SSE_BATCH_MS,
+                 batch_chars: int = SSE_BATCH_CHARS, buffer_frames: int = SSE_BUFFER_FRAMES):
+        self.id = uuid.uuid4().hex[:16]
+        self.owner = owner
+        self.batch_seconds = batch_ms / 1000
+        self.batch_chars = batch_chars
+        self.buffer_frames = buffer_frames
+        # (seq, frame), contiguous seqs
+        self.frames: deque = deque()
+        self.seq = 0
+        self.delivered = 0
+        self.events = 0
+        self.finished_at: Optional[float] = None
+        self.changed = asyncio.Event()
+        self._text: list = []
+        self._text_chars = 0
+        self._timer: Optional[asyncio.TimerHandle] = None
+
+    def push(self, event: dict):
+        """Add an event; text chunks wait up to the batch window for more"""
+        self.events += 1
+        if _is_text_chunk(event) and self.batch_seconds > 0:
+            self._text.append(event["content"])
+            self._text_chars += len(event["content"])
+            if self._text_chars >= self.batch_chars:
+                self.flush()
+            elif self._timer is None:
+                self._timer = asyncio.get_running_loop().call_later(self.batch_seconds, self.flush)
+            return
+        self.flush()
+        self._append(event)
+
+    def flush(self):
+        """Emit the pending text chunks as one content frame"""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if self._text:
+            text = "".join(self._text)
+            self._text.clear()
+            self._text_chars = 0
+            self._append({"type": "content", "content": text})
+
+    def _append(self, event: dict):
+        data = encode_event(event)
+        self.seq += 1
+        self.frames.append((self.seq, b"id: %s:%d\ndata: %s\n\n" % (self.id.encode(), self.seq, data)))
+        # Only frames a client already got are dropped
+        while len(self.frames) > self.buffer_frames and self.frames[0][0] <= self.delivered:
+            self.frames.popleft()
+        self.changed.set()
+
+    def finish(self):
+        self.flush()
+        self.finished_at = time.monotonic()
+        self.changed.set()
+
+    def can_resume(self, after: int) -> bool:
+        first = self.frames[0][0] if self.frames else self.seq + 1
+        return first - 1 <= after <= self.seq
+
+    async def tail(self, after: int = 0, keepalive: float = SSE_KEEPALIVE_SECONDS):
+        """Frames after seq `after`, joined per write, until the stream finishes"""
+        while True:
+            self.changed.clear()
+            if after < self.seq:
+                start = after + 1 - self.frames[0][0]
+                if start < 0:
+                    # Another, faster reader let the buffer drop frames this one hadn't sent
+                    yield b"data: %s\n\n" % encode_event(RESUME_ERROR)
+                    return
+                chunk = b"".join(frame for _, frame in islice(self.frames, start, None))
+                after = self.seq
+                self.delivered = max(self.delivered, after)
+                yield chunk
+                continue
+            if self.finished_at is not None:
+                return
+            try:
+                await asyncio.wait_for(self.changed.wait(), keepalive)
+            except asyncio.TimeoutError:
+                yield KEEPALIVE
+
+class EventStreamRegistry:
+    """Recent streams of this process, by id"""
+
+    def __init__(self, resume_seconds: float = SSE_RESUME_SECONDS):
+        self.resume_seconds = resume_seconds
+        self._streams: Dict[str, EventStream] = {}
+
+    def create(self, owner: Any = None) -> EventStream:
+        self._prune()
+        stream = EventStream(owner)
+        self._streams[stream.id] = stream
+        return stream
+
+    def get(self, stream_id: str) -> Optional[EventStream]:
+        self._prune()
+        return self._streams.get(stream_id)
+
+    def _prune(self):
+        cutoff = time.monotonic() - self.resume_seconds
+        expired = [
+            stream_id for stream_id, stream in self._streams.items()
+            if stream.finished_at is not None and stream.finished_at < cutoff
+        ]
+        for stream_id in expired:
+            del self._streams[stream_id]
+
+    def active_count(self) -> int:
+        return sum(1 for stream in self._streams.values() if stream.finished_at is None)
+
+async def _produce(stream: EventStream, events: Events):
+    if hasattr(events, "__aiter__"):
+        source = events
+    elif isinstance(events, (list, tuple)):
+        source = None
+    else:
+        source = iterate_in_threadpool(events)
+    try:
+        if source is None:
+            for event in events:
+                stream.push(event)
+        else:
+            async for event in source:
+                stream.push(event)
+    except Exception as e:
+        logger.error(f"SSE stream {stream.id} failed: {e}")
+        stream.push({"type": "error", "content": str(e)})
+    finally:
+        if source is not events and hasattr(events, "close"):
+            # Sync generator abandoned mid-way (its thread may still be in next())
+            with suppress(Exception):
+                events.close()
+        stream.finish()
+
+def sse_response(events: Events, owner: Any = None, detach: bool = False,
+                 keepalive: float = SSE_KEEPALIVE_SECONDS) -> StreamingResponse:
+    """
+    Stream event dicts (a sync or async iterable) as SSE.
+
+    owner: who may resume the stream (see resume_sse)
+    detach: keep producing after the client disconnects
+    """
+    stream = event_streams.create(owner)
+
+    async def body():
+        producer = asyncio.create_task(_produce(stream, events))
+        try:
+            async for chunk in stream.tail(0, keepalive):
+                yield chunk
+        finally:
+            if not detach:
+                producer.cancel()
+
+    return StreamingResponse(body(), media_type="text/event-stream", headers=SSE_HEADERS)
+
+def resume_sse(request: Request, owner: Any = None,
+               keepalive: float = SSE_KEEPALIVE_SECONDS) -> Optional[StreamingResponse]:
+    """
+    Response continuing the stream named by the request's Last-Event-ID, or
+    None when there's no (well-formed) Last-Event-ID and the request should be
+    served normally. A stream that expired, belongs to someone else or has
+    dropped the frames after that id gets a single "error" event instead.
+    """
+    stream_id, _, seq = (request.headers.get("last-event-id") or "").partition(":")
+    if not stream_id or not seq.isdigit():
+        return None
+    stream = event_streams.get(stream_id)
+    if stream is None or stream.owner != owner or not stream.can_resume(int(seq)):
+        return StreamingResponse(iter([b"data: %s\n\n" % encode_event(RESUME_ERROR)]),
+                                 media_type="text/event-stream", headers=SSE_HEADERS)
+    return StreamingResponse(stream.tail(int(seq), keepalive), media_type="text/event-stream", headers=SSE_HEADERS)
+
+# Global event stream registry instance
+event_streams = EventStreamRegistry()
@@ -0,0 +1,227 @@
+"""
+Document Status Events
+
+process_document (a Celery worker, synchronous code) publishes a status
+event per stage - queued, extracting, chunking, embedding n/m, done or
+failed - on a per-user channel, and the API streams them to that user's
+SSE / WebSocket connections instead of clients polling GET /documents/{id}.
+
+The bus also keeps the latest event per document for a while, so a client
+that connects mid-way starts from the current stage.
+
+LocalStatusBus keeps all of it in process: the default for a single worker
+when the task runs in the API process (task_always_eager, development).
+RedisStatusBus shares it through Redis pub/sub when REDIS_URL is set, which
+is what carries events from separate Celery worker processes to the API.
+Separate workers without REDIS_URL can't deliver anything past "queued";
+the API logs an error at startup in that case.
+"""
+import asyncio
+import json
+import os
+import threading
+import time
+from typing import Dict, List, Optional, Set
+from app.core.logger import logger
+
+REDIS_URL = os.getenv("REDIS_URL")
+
+# How long the latest event per document is kept for late subscribers
+STATUS_RETAIN_SECONDS = float(os.getenv("STATUS_RETAIN_SECONDS", "3600"))
+# Events buffered per connection before the oldest are dropped (slow client)
+STATUS_QUEUE_SIZE = int(os.getenv("STATUS_QUEUE_SIZE", "100"))
+
+STAGES = ("queued", "extracting", "chunking", "embedding", "done", "failed")
+
+def status_event(document_id: int, stage: str, done: int = None, total: int = None, **fields) -> dict:
+    """Event for a document reaching a stage (done/total for stage progress)"""
+    status = {"done": "completed", "failed": "failed"}.get(stage, "processing")
+    event = {"type": "document_status", "document_id": document_id, "status": status, "stage": stage}
+    if total is not None:
+        event["done"] = done or 0
+        event["total"] = total
+    event.update(fields)
+    event["at"] = time.time()
+    return event
+
+class Subscription:
+    """One connection's queue of a user's status events"""
+
+    def __init__(self, user_id: int):
+        self.user_id = user_id
+        self.loop = asyncio.get_running_loop()
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=STATUS_QUEUE_SIZE)
+        self.dropped = 0
+
+    def put(self, event: dict):
+        """Enqueue from the subscriber's loop; drops the oldest event when full"""
+        if self.queue.full():
+            self.queue.get_nowait()
+            self.dropped += 1
+        self.queue.put_nowait(event)
+
+    def put_threadsafe(self, event: dict):
+        self.loop.call_soon_threadsafe(self.put, event)
+
+    async def get(self, timeout: float) -> Optional[dict]:
+        """Next event, or None after timeout seconds"""
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+class LocalStatusBus:
+    """In-process status channels (publish may be called from any thread)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers: Dict[int, Set[Subscription]] = {}
+        # user_id -> document_id -> latest event
+        self._latest: Dict[int, Dict[int, dict]] = {}
+
+    def publish(self, user_id: int, event: dict):
+        with self._lock:
+            self._latest.setdefault(user_id, {})[event["document_id"]] = event
+            subscribers = list(self._subscribers.get(user_id, ()))
+        for subscription in subscribers:
+            try:
+                subscription.put_threadsafe(event)
+            except RuntimeError:
+                # Subscriber's loop is closed
+                self._discard(subscription)
+
+    def latest(self, user_id: int) -> List[dict]:
+        """Latest event of each of the user's recently active documents"""
+        cutoff = time.time() - STATUS_RETAIN_SECONDS
+        with self._lock:
+            documents = self._latest.get(user_id, {})
+            for document_id in [d for d, event in documents.items() if event["at"] < cutoff]:
+                del documents[document_id]
+            if not documents:
+                self._latest.pop(user_id, None)
+            return list(documents.values())
+
+    async def subscribe(self, user_id: int) -> Subscription:
+        subscription = Subscription(user_id)
+        with self._lock:
+            self._subscribers.setdefault(user_id, set()).add(subscription)
+        return subscription
+
+    async def unsubscribe(self, subscription: Subscription):
+        self._discard(subscription)
+
+    def _discard(self, subscription: Subscription):
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.user_id)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscribers[subscription.user_id]
+
+    async def close(self):
+        with self._lock:
+            self._subscribers.clear()
+
+class RedisStatusBus:
+    """
+    Status channels through Redis pub/sub ("doc_status:{user_id}").
+
+    Publishing is synchronous (Celery workers); each API process holds one
+    pub/sub connection subscribed to the users connected to it and fans
+    events out to their local subscriptions.
+    """
+
+    def __init__(self, url: str = REDIS_URL, prefix: str = "doc_status"):
+        import redis
+
+        self.url = url
+        self.prefix = prefix
+        self.client = redis.Redis.from_url(url)
+        self._async_client = None
+        self._pubsub = None
+        self._reader: Optional[asyncio.Task] = None
+        self._subscribers: Dict[int, Set[Subscription]] = {}
+
+    def _channel(self, user_id: int) -> str:
+        return f"{self.prefix}:{user_id}"
+
+    def _latest_key(self, user_id: int) -> str:
+        return f"{self.prefix}:latest:{user_id}"
+
+    def publish(self, user_id: int, event: dict):
+        payload = json.dumps(event)
+        try:
+            pipe = self.client.pipeline(transaction=False)
+            pipe.hset(self._latest_key(user_id), event["document_id"], payload)
+            pipe.expire(self._latest_key(user_id), int(STATUS_RETAIN_SECONDS))
+            pipe.publish(self._channel(user_id), payload)
+            pipe.execute()
+        except Exception as e:
+            logger.error(f"Status event publish failed for user {user_id}: {e}")
+
+    def latest(self, user_id: int) -> List[dict]:
+        cutoff = time.time() - STATUS_RETAIN_SECONDS
+        try:
+            values = self.client.hvals(self._latest_key(user_id))
+        except Exception as e:
+            logger.error(f"Status snapshot failed for user {user_id}: {e}")
+            return []
+        return [event for event in map(json.loads, values) if event["at"] >= cutoff]
+
+    async def subscribe(self, user_id: int) -> Subscription:
+        if self._pubsub is None:
+            import redis.asyncio as redis
+
+            self._async_client = redis.Redis.from_url(self.url)
+            self._pubsub = self._async_client.pubsub()
+        subscription = Subscription(user_id)
+        subscribers = self._subscribers.setdefault(user_id, set())
+        if not subscribers:
+            await self._pubsub.subscribe(self._channel(user_id))
+        subscribers.add(subscription)
+        if self._reader is None:
+            self._reader = asyncio.create_task(self._read())
+        return subscription
+
+    async def unsubscribe(self, subscription: Subscription):
+        subscribers = self._subscribers.get(subscription.user_id)
+        if subscribers is None:
+            return
+        subscribers.discard(subscription)
+        if not subscribers:
+            del self._subscribers[subscription.user_id]
+            await self._pubsub.unsubscribe(self._channel(subscription.user_id))
+
+    async def _read(self):
+        prefix = f"{self.prefix}:"
+        while True:
+            try:
+                message = await self._pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+                if message is None:
+                    continue
+                user_id = int(message["channel"].decode()[len(prefix):])
+                event = json.loads(message["data"])
+                for subscription in list(self._subscribers.get(user_id, ())):
+                    subscription.put(event)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Status pub/sub reader error: {e}")
+                await asyncio.sleep(0.5)
+
+    async def close(self):
+        if self._reader is not None:
+            self._reader.cancel()
+        if self._pubsub is not None:
+            await self._pubsub.aclose()
+            await self._async_client.aclose()
+        self.client.close()
+
+def create_status_bus():
+    """Redis-backed status events if REDIS_URL is configured, else in-process"""
+    if REDIS_URL:
+        return RedisStatusBus()
+    return LocalStatusBus()
+
+# Global status bus instance
+status_bus = create_status_bus()
@@ -0,0 +1,223 @@
+"""
+Text Operational Transform
+
+Incremental edits for collaborative drafts. An operation is a list of
+components walking the whole document:
+- positive int: retain (skip) that many characters
+- str: insert the text
+- negative int: delete that many characters
+
+e.g. ["Hello", 11, -3] inserts "Hello" at 0, keeps 11 chars, deletes 3.
+
+OTDocument is the server-side authority: every accepted op gets the next
+revision. A client op is based on the last revision it had seen; ops the
+server accepted since then are transformed into it (transform()) before it
+is applied, so concurrent edits merge instead of overwriting each other.
+"""
+from typing import Optional
+
+Operation = list
+
+class OperationError(ValueError):
+    """Malformed operation or one that doesn't fit the document"""
+
+def _is_retain(c) -> bool:
+    return isinstance(c, int) and c > 0
+
+def _is_delete(c) -> bool:
+    return isinstance(c, int) and c < 0
+
+def _push(op: Operation, c):
+    """Append a component, merging with the previous one (inserts go before deletes)"""
+    if c == 0 or c == "":
+        return
+    if not op:
+        op.append(c)
+        return
+    last = op[-1]
+    if isinstance(c, str):
+        if isinstance(last, str):
+            op[-1] = last + c
+        elif _is_delete(last):
+            if len(op) >= 2 and isinstance(op[-2], str):
+                op[-2] += c
+            else:
+                op.insert(len(op) - 1, c)
+        else:
+            op.append(c)
+    elif (c > 0 and _is_retain(last)) or (c < 0 and _is_delete(last)):
+        op[-1] = last + c
+    else:
+        op.append(c)
+
+def validate(op) -> Operation:
+    """Check an op received from a client and return it in canonical form"""
+    if not isinstance(op, list):
+        raise OperationError("Operation must be a list")
+    canonical = []
+    for c in op:
+        if isinstance(c, bool) or not isinstance(c, (int, str)):
+            raise OperationError(f"Invalid operation component: {c!r}")
+        _push(canonical, c)
+    return canonical
+
+def base_length(op: Operation) -> int:
+    return sum(c if c > 0 else -c for c in op if not isinstance(c, str))
+
+def target_length(op: Operation) -> int:
+    return sum(len(c) if isinstance(c, str) else c for c in op if not _is_delete(c))
+
+def apply(doc: str, op: Operation) -> str:
+    if base_length(op) != len(doc):
+        raise OperationError(f"Operation base length {base_length(op)} != document length {len(doc)}")
+    parts = []
+    index = 0
+    for c in op:
+        if isinstance(c, str):
+            parts.append(c)
+        elif c > 0:
+            parts.append(doc[index:index + c])
+            index += c
+        else:
+            index -= c
+    parts.append(doc[index:])
+    return "".join(parts)
+
+def transform(a: Operation, b: Operation) -> tuple[Operation, Operation]:
+    """
+    Given concurrent a and b on the same document, return (a', b') such that
+    apply(apply(doc, a), b') == apply(apply(doc, b), a'). On a tie, a's insert
+    goes first.
+    """
+    if base_length(a) != base_length(b):
+        raise OperationError("Concurrent operations must have the same base length")
+
+    a_prime, b_prime = [], []
+    ia, ib = iter(a), iter(b)
+    op1, op2 = next(ia, None), next(ib, None)
+
+    while op1 is not None or op2 is not None:
+        if isinstance(op1, str):
+            _push(a_prime, op1)
+            _push(b_prime, len(op1))
+            op1 = next(ia, None)
+            continue
+        if isinstance(op2, str):
+            _push(a_prime, len(op2))
+            _push(b_prime, op2)
+            op2 = next(ib, None)
+            continue
+        if op1 is None or op2 is None:
+            raise OperationError("Operations have different lengths")
+
+        if _is_retain(op1) and _is_retain(op2):
+            n = min(op1, op2)
+            _push(a_prime, n)
+            _push(b_prime, n)
+            op1, op2 = op1 - n, op2 - n
+        elif _is_delete(op1) and _is_delete(op2):
+            # Both deleted the same text
+            n = min(-op1, -op2)
+            op1, op2 = op1 + n, op2 + n
+        elif _is_delete(op1):
+            n = min(-op1, op2)
+            _push(a_prime, -n)
+            op1, op2 = op1 + n, op2 - n
+        else:
+            n = min(op1, -op2)
+            _push(b_prime, -n)
+            op1, op2 = op1 - n, op2 + n
+
+        if op1 == 0:
+            op1 = next(ia, None)
+        if op2 == 0:
+            op2 = next(ib, None)
+
+    return a_prime, b_prime
+
+def transform_index(op: Operation, index: int) -> int:
+    """Where a cursor at `index` ends up after op"""
+    position = 0
+    new_index = index
+    for c in op:
+        if position > index:
+            break
+        if isinstance(c, str):
+            new_index += len(c)
+        elif c > 0:
+            position += c
+        else:
+            new_index -= min(-c, index - position)
+            position -= c
+    return max(0, new_index)
+
+def from_diff(old: str, new: str) -> Operation:
+    """Single replace operation turning old into new (common prefix/suffix kept)"""
+    limit = min(len(old), len(new))
+    prefix = 0
+    while prefix < limit and old[prefix] == new[prefix]:
+        prefix += 1
+    suffix = 0
+    while suffix < limit - prefix and old[-1 - suffix] == new[-1 - suffix]:
+        suffix += 1
+
+    op = []
+    _push(op, prefix)
+    _push(op, new[prefix:len(new) - suffix])
+    _push(op, -(len(old) - prefix - suffix))
+    _push(op, suffix)
+    return op
+
+class OTDocument:
+    """Server copy of a collaboratively edited text with its recent op history"""
+
+    def __init__(self, content: str = "", revision: int = 0, history_limit: int = 1000,
+                 max_length: Optional[int] = None):
+        self.content = content
+        self.revision = revision
+        self.history_limit = history_limit
+        self.max_length = max_length  # Ops growing the document past this are rejected
+        # history[i] took the document from revision history_start + i to + i + 1
+        self.history: list[Operation] = []
+        self.history_start = revision
+
+    def receive(self, base_revision: int, op) -> Operation:
+        """
+        Merge a client op based on `base_revision`; returns the op as applied
+        (to broadcast with the new self.revision). Raises OperationError if
+        the op is malformed, its base revision is no longer in history or it
+        would grow the document past max_length (the client must resync from
+        a snapshot).
+        """
+        op = validate(op)
+        if not isinstance(base_revision, int) or isinstance(base_revision, bool):
+            raise OperationError("Base revision must be an integer")
+        if base_revision < self.history_start or base_revision > self.revision:
+            raise OperationError(f"Unknown base revision {base_revision} (have {self.history_start}..{self.revision})")
+
+        for concurrent in self.history[base_revision - self.history_start:]:
+            op, _ = transform(op, concurrent)
+
+        if self.max_length is not None:
+            length = target_length(op)
+            if length > self.max_length and length > len(self.content):
+                raise OperationError(f"Document would exceed {self.max_length} characters")
+
+        self.content = apply(self.content, op)
+        self.history.append(op)
+        self.revision += 1
+
+        overflow = len(self.history) - self.history_limit
+        if overflow > 0:
+            del self.history[:overflow]
+            self.history_start += overflow
+        return op
+
+    def replace(self, content: str) -> Optional[Operation]:
+        """Whole-content update at the current revision; returns the equivalent op (None if unchanged)"""
+        if content == self.content:
+            return None
+        return self.receive(self.revision, from_diff(self.content, content))
+
+    def snapshot(self) -> dict:
+        return {"content": self.content, "version": self.revision}
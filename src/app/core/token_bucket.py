@@ -0,0 +1,137 @@
+"""
+Token Bucket Backends
+
+Storage for the rate limiter. A bucket holds up to `capacity` tokens and
+refills at `refill_rate` tokens per second; a request spends `cost` tokens
+(1 for a plain request count, more for cost-weighted limits). acquire() is
+for sync callers, acquire_async() for the event loop.
+- LocalTokenBucket: in-process, used in tests and single-worker setups
+- RedisTokenBucket: one atomic Lua script per acquire, shared by every
+  worker/node, used when REDIS_URL is set
+"""
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import NamedTuple
+
+REDIS_URL = os.getenv("REDIS_URL")
+
+class Decision(NamedTuple):
+    allowed: bool
+    remaining: float
+    retry_after: float  # seconds until `cost` tokens are available (0 if allowed)
+
+class LocalTokenBucket:
+    """Thread-safe in-process buckets (LRU-bounded number of keys)"""
+
+    def __init__(self, max_keys: int = 100000):
+        self.max_keys = max_keys
+        self._lock = threading.Lock()
+        self._buckets: "OrderedDict[str, list[float]]" = OrderedDict()
+
+    def acquire(self, key: str, capacity: float, refill_rate: float, cost: float = 1) -> Decision:
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = [capacity, now]
+                self._buckets[key] = bucket
+                if len(self._buckets) > self.max_keys:
+                    self._buckets.popitem(last=False)
+            else:
+                self._buckets.move_to_end(key)
+
+            tokens = min(capacity, bucket[0] + (now - bucket[1]) * refill_rate)
+            bucket[1] = now
+            if tokens >= cost:
+                bucket[0] = tokens - cost
+                return Decision(True, bucket[0], 0.0)
+            bucket[0] = tokens
+            return Decision(False, tokens, (cost - tokens) / refill_rate)
+
+    async def acquire_async(self, key: str, capacity: float, refill_rate: float, cost: float = 1) -> Decision:
+        return self.acquire(key, capacity, refill_rate, cost)
+
+    def reset(self):
+        with self._lock:
+            self._buckets.clear()
+
+# KEYS[1] = bucket; ARGV = capacity, refill_rate, cost. Uses the server clock
+# so workers with skewed clocks agree.
+ACQUIRE_SCRIPT = """
+local capacity = tonumber(ARGV[1])
+local refill_rate = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or capacity
+local ts = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - ts) * refill_rate)
+
+local allowed = 0
+local retry_after = 0
+if tokens >= cost then
+    tokens = tokens - cost
+    allowed = 1
+else
+    retry_after = (cost - tokens) / refill_rate
+end
+
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'ts', now)
+redis.call('PEXPIRE', KEYS[1], math.ceil(capacity / refill_rate * 1000) + 1000)
+return {allowed, tostring(tokens), tostring(retry_after)}
+"""
+
+class RedisTokenBucket:
+    """Buckets shared by every worker, updated atomically in Redis"""
+
+    def __init__(self, url: str = REDIS_URL, prefix: str = "ratelimit"):
+        import redis
+
+        self.url = url
+        self.prefix = prefix
+        self.client = redis.Redis.from_url(url)
+        self._acquire = self.client.register_script(ACQUIRE_SCRIPT)
+        self._async_acquire = None
+
+    def acquire(self, key: str, capacity: float, refill_rate: float, cost: float = 1) -> Decision:
+        allowed, tokens, retry_after = self._acquire(
+            keys=[f"{self.prefix}:{key}"], args=[capacity, refill_rate, cost]
+        )
+        return Decision(bool(allowed), float(tokens), float(retry_after))
+
+    async def acquire_async(self, key: str, capacity: float, refill_rate: float, cost: float = 1) -> Decision:
+        if self._async_acquire is None:
+            import redis.asyncio as redis
+
+            self._async_acquire = redis.Redis.from_url(self.url).register_script(ACQUIRE_SCRIPT)
+        allowed, tokens, retry_after = await self._async_acquire(
+            keys=[f"{self.prefix}:{key}"], args=[capacity, refill_rate, cost]
+        )
+        return Decision(bool(allowed), float(tokens), float(retry_after))
+
+    def reset(self):
+        for key in self.client.scan_iter(f"{self.prefix}:*"):
+            self.client.delete(key)
+
+def create_token_bucket(shared: bool = True):
+    """Redis-backed buckets if REDIS_URL is configured (and shared is allowed), else in-process"""
+    if shared and REDIS_URL:
+        return RedisTokenBucket()
+    return LocalTokenBucket()
+
+PERIODS = {"second": 1, "minute": 60, "hour": 3600, "day": 86400}
+
+def parse_rate(rate: str) -> tuple[float, float]:
+    """'30/minute' -> (capacity 30, refill 0.5 tokens/s)"""
+    amount, _, period = rate.partition("/")
+    seconds = PERIODS[period.strip().rstrip("s")]
+    capacity = float(amount)
+    return capacity, capacity / seconds
+
+def retry_after_seconds(decision: Decision) -> int:
+    return max(1, math.ceil(decision.retry_after))
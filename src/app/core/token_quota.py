@@ -0,0 +1,295 @@
+"""
+Token Quotas
+
+Per-user accounting of LLM tokens and admission control for model calls.
+Request-count rate limits treat a 5-chunk RAG chat over a large draft the
+same as a 50-token autocomplete; this budgets what actually loads the
+upstream model.
+
+- Every Gemini call records input/output tokens from usage_metadata
+  (estimated from text length if the stream was cut before it arrived)
+- Usage is summed per user in rolling windows (minute, day) built from
+  fixed slots; slots live in Redis when REDIS_URL is set
+- admit() runs before a model call:
+    under TOKEN_DEGRADE_AT of every budget  -> allow on GENAI_MODEL
+    under the budget                        -> degrade to GENAI_LITE_MODEL
+    over the minute budget only             -> queue (wait for the window to
+                                               roll) up to TOKEN_QUEUE_MAX_SECONDS
+    otherwise                               -> reject (429 TOKEN_QUOTA_EXCEEDED)
+"""
+import asyncio
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import NamedTuple, Optional
+from app.core.exceptions import RateLimitException
+from app.core.logger import logger
+from app.core.providers import GENAI_MODEL, GENAI_LITE_MODEL
+
+REDIS_URL = os.getenv("REDIS_URL")
+
+# window -> (length seconds, slot seconds)
+WINDOWS = {
+    "minute": (60, 5),
+    "day": (86400, 3600),
+}
+
+TOKEN_BUDGETS = {
+    "minute": int(os.getenv("TOKEN_BUDGET_PER_MINUTE", "60000")),
+    "day": int(os.getenv("TOKEN_BUDGET_PER_DAY", "2000000")),
+}
+TOKEN_DEGRADE_AT = float(os.getenv("TOKEN_DEGRADE_AT", "0.8"))
+TOKEN_QUEUE_MAX_SECONDS = float(os.getenv("TOKEN_QUEUE_MAX_SECONDS", "10"))
+
+def estimate_tokens(text: str) -> int:
+    """Rough model token count (~4 characters per token)"""
+    return max(1, len(text) // 4) if text else 0
+
+class Admission(NamedTuple):
+    action: str  # "allow", "degrade" or "reject"
+    model: str
+    retry_after: float
+    usage: dict
+
+class LocalTokenLedger:
+    """In-process rolling-window token counts (LRU-bounded number of users)"""
+
+    def __init__(self, max_users: int = 100000):
+        self.max_users = max_users
+        self._lock = threading.Lock()
+        # user_id -> window -> {slot index: tokens}
+        self._users: "OrderedDict[int, dict[str, dict[int, int]]]" = OrderedDict()
+
+    def add(self, user_id: int, tokens: int, now: float):
+        with self._lock:
+            windows = self._users.get(user_id)
+            if windows is None:
+                windows = {name: {} for name in WINDOWS}
+                self._users[user_id] = windows
+                if len(self._users) > self.max_users:
+                    self._users.popitem(last=False)
+            else:
+                self._users.move_to_end(user_id)
+
+            for name, (length, slot) in WINDOWS.items():
+                slots = windows[name]
+                current = int(now // slot)
+                slots[current] = slots.get(current, 0) + tokens
+                oldest = current - length // slot + 1
+                for index in [i for i in slots if i < oldest]:
+                    del slots[index]
+
+    def usage(self, user_id: int, now: float) -> dict:
+        with self._lock:
+            windows = self._users.get(user_id)
+            totals = {}
+            for name, (length, slot) in WINDOWS.items():
+                oldest = int(now // slot) - length // slot + 1
+                totals[name] = sum(t for i, t in windows[name].items() if i >= oldest) if windows else 0
+            return totals
+
+    async def add_async(self, user_id: int, tokens: int, now: float):
+        self.add(user_id, tokens, now)
+
+    async def usage_async(self, user_id: int, now: float) -> dict:
+        return self.usage(user_id, now)
+
+class RedisTokenLedger:
+    """Rolling-window token counts shared by every worker (one key per slot)"""
+
+    def __init__(self, url: str = REDIS_URL, prefix: str = "tokens"):
+        import redis
+
+        self.url = url
+        self.prefix = prefix
+        self.client = redis.Redis.from_url(url)
+        self._async_client = None
+
+    def _async(self):
+        if self._async_client is None:
+            import redis.asyncio as redis
+
+            self._async_client = redis.Redis.from_url(self.url)
+        return self._async_client
+
+    def _add_commands(self, pipe, user_id: int, tokens: int, now: float):
+        for name, (length, slot) in WINDOWS.items():
+            key = f"{self.prefix}:{user_id}:{name}:{int(now // slot)}"
+            pipe.incrby(key, tokens)
+            pipe.expire(key, length + slot)
+
+    def _usage_commands(self, pipe, user_id: int, now: float):
+        for name, (length, slot) in WINDOWS.items():
+            current = int(now // slot)
+            pipe.mget([f"{self.prefix}:{user_id}:{name}:{i}" for i in range(current - length // slot + 1, current + 1)])
+
+    @staticmethod
+    def _totals(results: list) -> dict:
+        return {
+            name: sum(int(v) for v in values if v is not None)
+            for name, values in zip(WINDOWS, results)
+        }
+
+    def add(self, user_id: int, tokens: int, now: float):
+        pipe = self.client.pipeline(transaction=False)
+        self._add_commands(pipe, user_id, tokens, now)
+        pipe.execute()
+
+    def usage(self, user_id: int, now: float) -> dict:
+        pipe = self.client.pipeline(transaction=False)
+        self._usage_commands(pipe, user_id, now)
+        return self._totals(pipe.execute())
+
+    async def add_async(self, user_id: int, tokens: int, now: float):
+        pipe = self._async().pipeline(transaction=False)
+        self._add_commands(pipe, user_id, tokens, now)
+        await pipe.execute()
+
+    async def usage_async(self, user_id: int, now: float) -> dict:
+        pipe = self._async().pipeline(transaction=False)
+        self._usage_commands(pipe, user_id, now)
+        return self._totals(await pipe.execute())
+
+def create_token_ledger(shared: bool = True):
+    """Redis-backed ledger if REDIS_URL is configured (and shared is allowed), else in-process"""
+    if shared and REDIS_URL:
+        return RedisTokenLedger()
+    return LocalTokenLedger()
+
+class TokenQuota:
+    def __init__(self, ledger=None, budgets: dict = None, degrade_at: float = TOKEN_DEGRADE_AT,
+                 queue_max_seconds: float = TOKEN_QUEUE_MAX_SECONDS):
+        self.ledger = ledger or create_token_ledger()
+        self.budgets = budgets or TOKEN_BUDGETS
+        self.degrade_at = degrade_at
+        self.queue_max_seconds = queue_max_seconds
+        self.stats = {"allow": 0, "degrade": 0, "queue": 0, "reject": 0, "features": {}}
+
+    def _count(self, feature: str, model: str, input_tokens: int, output_tokens: int):
+        features = self.stats["features"]
+        totals = features.setdefault(feature, {"calls": 0, "input_tokens": 0, "output_tokens": 0, "models": {}})
+        totals["calls"] += 1
+        totals["input_tokens"] += input_tokens
+        totals["output_tokens"] += output_tokens
+        totals["models"][model] = totals["models"].get(model, 0) + 1
+
+    def record(self, user_id: Optional[int], feature: str, model: str, input_tokens: int, output_tokens: int):
+        """Account one model call (blocking; use record_async on the event loop)"""
+        self._count(feature, model, input_tokens, output_tokens)
+        if user_id is None:
+            return
+        try:
+            self.ledger.add(user_id, input_tokens + output_tokens, time.time())
+        except Exception as e:
+            logger.error(f"Token accounting failed for user {user_id}: {e}")
+
+    async def record_async(self, user_id: Optional[int], feature: str, model: str, input_tokens: int, output_tokens: int):
+        """Account one model call without blocking the event loop"""
+        self._count(feature, model, input_tokens, output_tokens)
+        if user_id is None:
+            return
+        try:
+            await self.ledger.add_async(user_id, input_tokens + output_tokens, time.time())
+        except Exception as e:
+            logger.error(f"Token accounting failed for user {user_id}: {e}")
+
+    @staticmethod
+    def _usage_tokens(usage_metadata, prompt_text: str, output_text: str) -> tuple[int, int]:
+        input_tokens = getattr(usage_metadata, "prompt_token_count", None)
+        output_tokens = getattr(usage_metadata, "candidates_token_count", None)
+        if input_tokens is None:
+            input_tokens = estimate_tokens(prompt_text)
+        if output_tokens is None:
+            output_tokens = estimate_tokens(output_text)
+        return input_tokens, output_tokens
+
+    def record_usage(self, user_id: Optional[int], feature: str, model: str, usage_metadata,
+                     prompt_text: str = "", output_text: str = ""):
+        """Account a call from Gemini usage_metadata, estimating if it's missing"""
+        self.record(user_id, feature, model, *self._usage_tokens(usage_metadata, prompt_text, output_text))
+
+    async def record_usage_async(self, user_id: Optional[int], feature: str, model: str, usage_metadata,
+                                 prompt_text: str = "", output_text: str = ""):
+        await self.record_async(user_id, feature, model, *self._usage_tokens(usage_metadata, prompt_text, output_text))
+
+    def usage(self, user_id: int) -> dict:
+        return self.ledger.usage(user_id, time.time())
+
+    def check(self, user_id: Optional[int], estimated_tokens: int) -> Admission:
+        """Decide allow/degrade/reject for a call of about `estimated_tokens`, without waiting"""
+        if user_id is None:
+            return Admission("allow", GENAI_MODEL, 0.0, {})
+
+        now = time.time()
+        try:
+            usage = self.ledger.usage(user_id, now)
+        except Exception as e:
+            # Fail open: accounting must not take the product down
+            logger.error(f"Token usage lookup failed for user {user_id}: {e}")
+            return Admission("allow", GENAI_MODEL, 0.0, {})
+        return self._decide(usage, estimated_tokens, now)
+
+    async def check_async(self, user_id: Optional[int], estimated_tokens: int) -> Admission:
+        """check() with the usage lookup done without blocking the event loop"""
+        if user_id is None:
+            return Admission("allow", GENAI_MODEL, 0.0, {})
+
+        now = time.time()
+        try:
+            usage = await self.ledger.usage_async(user_id, now)
+        except Exception as e:
+            logger.error(f"Token usage lookup failed for user {user_id}: {e}")
+            return Admission("allow", GENAI_MODEL, 0.0, {})
+        return self._decide(usage, estimated_tokens, now)
+
+    def _decide(self, usage: dict, estimated_tokens: int, now: float) -> Admission:
+        retry_after = 0.0
+        worst = 0.0
+        for name, budget in self.budgets.items():
+            ratio = (usage[name] + estimated_tokens) / budget
+            worst = max(worst, ratio)
+            if ratio > 1:
+                # The oldest slot rolls out of the window at the next slot boundary
+                slot = WINDOWS[name][1]
+                retry_after = max(retry_after, slot - now % slot)
+
+        if worst > 1:
+            return Admission("reject", GENAI_LITE_MODEL, retry_after, usage)
+        if worst > self.degrade_at:
+            return Admission("degrade", GENAI_LITE_MODEL, 0.0, usage)
+        return Admission("allow", GENAI_MODEL, 0.0, usage)
+
+    async def admit(self, user_id: Optional[int], estimated_tokens: int, queue: bool = True) -> Admission:
+        """
+        Admission control before a model call. Returns the admission (use its
+        model) or raises RateLimitException. With queue=True a call that only
+        exceeds the short window waits for it to roll instead of failing.
+        """
+        waited = 0.0
+        while True:
+            admission = await self.check_async(user_id, estimated_tokens)
+            if admission.action != "reject":
+                self.stats[admission.action] += 1
+                return admission
+
+            short_only = admission.usage["day"] + estimated_tokens <= self.budgets["day"]
+            if queue and short_only and waited + admission.retry_after <= self.queue_max_seconds:
+                self.stats["queue"] += 1
+                await asyncio.sleep(admission.retry_after)
+                waited += admission.retry_after
+                continue
+
+            self.stats["reject"] += 1
+            logger.warning(f"Token budget exceeded for user {user_id}: {admission.usage}")
+            raise RateLimitException(
+                message="Token budget exceeded. Please try again later.",
+                code="TOKEN_QUOTA_EXCEEDED",
+                retry_after=max(1, int(admission.retry_after) + 1)
+            )
+
+    def get_stats(self) -> dict:
+        return {**self.stats, "budgets": self.budgets, "degrade_at": self.degrade_at}
+
+# Global token quota instance
+token_quota = TokenQuota()
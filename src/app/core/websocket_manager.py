@@ -3,36 +3,179 @@ WebSocket Connection Manager
 
 Manages WebSocket connections for real-time collaboration.
 Handles rooms (one per draft), user presence, and broadcasting.
+Content is synced with versioned text operations (app.core.text_ot): only
+the edit travels over the wire and concurrent edits are merged server-side.
+
+Rooms are backed by the drafts table: the first join loads the draft, and
+edits are written behind, coalesced to at most one UPDATE per room every
+COLLAB_FLUSH_INTERVAL_SECONDS, with a final flush when the room empties and
+on shutdown (flush_all).
+
+Every connection has its own bounded Outbox (app.core.ws_outbox): a
+broadcast serializes once and enqueues, so a slow peer never stalls the
+room. A peer whose queue overflows is reset to a resync snapshot; one that
+keeps overflowing, or whose socket fails or times out, is evicted.
+
+Frames are encoded per connection with the codec negotiated at connect
+(app.core.collab_codec: MessagePack or JSON), once per codec per frame.
+
+Cursor moves are coalesced (app.core.cursor_batch): the latest cursor per
+user is kept and the changed ones go out as one cursors_update frame per
+room at most COLLAB_CURSOR_FPS times a second.
+
+The heartbeat task doubles as a reaper: every COLLAB_HEARTBEAT_SECONDS it
+pings each connection, evicts ones silent for COLLAB_MAX_MISSED_HEARTBEATS
+beats (only clients that have answered a ping; older clients never pong) or
+idle (no edits/cursor moves) for COLLAB_IDLE_TIMEOUT_SECONDS, and closes
+rooms left without users. Rooms are capped at COLLAB_MAX_ROOM_USERS
+users and documents at COLLAB_MAX_CONTENT_CHARS characters.
+
+Rooms span workers/nodes (app.core.collab_cluster):
+- every room event is published on the room's channel and each node
+  delivers it to its own connections, so users on different nodes see the
+  same stream
+- one node owns a room (a lease renewed by a heartbeat); only the owner
+  holds the OTDocument, merges ops and writes the draft. Other nodes forward
+  their users' ops and snapshot requests to it over the channel
+- when the owner leaves the room (or its lease lapses) another node with
+  users takes over, reloads the draft and resyncs everyone
+- presence is published per node and aggregated across the cluster
 """
 from fastapi import WebSocket
-from typing import Dict, Set, Optional
+from typing import Dict, Set, Optional, Callable
 from dataclasses import dataclass, field
 from datetime import datetime
-import json
+import asyncio
+import os
+import time
+from app.core.collab_cluster import create_cluster_backend, default_node_id
+from app.core.collab_codec import json_codec
+from app.core.cursor_batch import COLLAB_CURSOR_FPS, CursorBatch
+from app.core.text_ot import OTDocument, OperationError, transform_index
+from app.core.ws_outbox import Outbox
+from app.core.logger import logger
+from app.db.database import SessionLocal
+from app.db.repositories.draft_repository import DraftRepository
+
+COLLAB_FLUSH_INTERVAL_SECONDS = float(os.getenv("COLLAB_FLUSH_INTERVAL_SECONDS", "5"))
+COLLAB_MAX_RESYNCS = int(os.getenv("COLLAB_MAX_RESYNCS", "3"))  # overflows before a slow peer is evicted
+COLLAB_LEASE_SECONDS = float(os.getenv("COLLAB_LEASE_SECONDS", "15"))  # room ownership + presence TTL
+COLLAB_HEARTBEAT_SECONDS = float(os.getenv("COLLAB_HEARTBEAT_SECONDS", "5"))
+COLLAB_MAX_MISSED_HEARTBEATS = int(os.getenv("COLLAB_MAX_MISSED_HEARTBEATS", "3"))
+COLLAB_IDLE_TIMEOUT_SECONDS = float(os.getenv("COLLAB_IDLE_TIMEOUT_SECONDS", "1800"))
+COLLAB_MAX_ROOM_USERS = int(os.getenv("COLLAB_MAX_ROOM_USERS", "50"))
+COLLAB_MAX_CONTENT_CHARS = int(os.getenv("COLLAB_MAX_CONTENT_CHARS", "1000000"))
+
+class InvalidFrame(ValueError):
+    """A client frame with a malformed field (answered with an error frame, not applied)"""
+
+def _position(value, name: str, limit: int) -> Optional[int]:
+    """A client-supplied text index: a non-negative int (clamped to limit) or None"""
+    if value is None:
+        return None
+    if not isinstance(value, int) or isinstance(value, bool) or value < 0:
+        raise InvalidFrame(f"{name} must be a non-negative integer or null")
+    return min(value, limit)
 
 @dataclass
 class UserSession:
     """Represents a connected user in a room"""
     user_id: int
     username: str
+    draft_id: int  # The room this connection joined
     websocket: WebSocket
     color: str  # Assigned color for cursor
     cursor_position: Optional[int] = None
     selection_start: Optional[int] = None
     selection_end: Optional[int] = None
     connected_at: datetime = field(default_factory=datetime.utcnow)
+    outbox: Optional[Outbox] = None
+    codec: object = json_codec  # Negotiated wire encoding
+    resyncs: int = 0
+    last_seen: float = field(default_factory=time.monotonic)  # Any message, including pongs
+    last_active: float = field(default_factory=time.monotonic)  # Edits and cursor moves
+    answers_pings: bool = False  # Sent a pong, so silence means a dead connection
+    # Set while waiting for a snapshot from the room owner: "join" (send
+    # room_state) or the resync reason; room frames are skipped meanwhile
+    awaiting_snapshot: Optional[str] = None
 
 @dataclass
 class Room:
-    """Represents a collaboration room (one per draft)"""
+    """Represents a collaboration room (one per draft) on this node"""
     draft_id: int
-    users: Dict[int, UserSession] = field(default_factory=dict)
-    content: str = ""  # Current document content
+    users: Dict[int, UserSession] = field(default_factory=dict)  # Users connected to this node
+    document: Optional[OTDocument] = None  # Current content + op history (owner only)
+    owned: bool = False
+    claiming: bool = False
+    handler: Optional[Callable] = None  # Subscription to the room's channel
     last_updated: datetime = field(default_factory=datetime.utcnow)
+    ready: asyncio.Event = field(default_factory=asyncio.Event)  # Set once joined to the cluster room
+    load_failed: bool = False
+    joining: int = 0  # Connects between _open_room and joining; keeps an empty room open
+    # Write-behind state
+    saved_revision: int = 0
+    last_flushed: float = 0.0
+    flush_task: Optional[asyncio.Task] = None
+    flush_lock: asyncio.Lock = field(default_factory=asyncio.Lock)
+    # Cursor batching state
+    cursors: CursorBatch = field(default_factory=CursorBatch)
+    cursor_task: Optional[asyncio.Task] = None
+    cursors_sent_at: float = 0.0
+
+    @property
+    def content(self) -> str:
+        return self.document.content if self.document is not None else ""
+
+class DraftContentStore:
+    """Loads/saves room content through DraftRepository on a worker thread"""
+
+    async def load(self, draft_id: int, user_id: int = None) -> Optional[str]:
+        """Draft content (None if missing or, given user_id, not that user's draft)"""
+        return await asyncio.to_thread(self._load, draft_id, user_id)
+
+    async def can_edit(self, draft_id: int, user_id: int) -> bool:
+        return await asyncio.to_thread(self._can_edit, draft_id, user_id)
+
+    async def save(self, draft_id: int, content: str) -> bool:
+        return await asyncio.to_thread(self._save, draft_id, content)
+
+    def _load(self, draft_id: int, user_id: int = None) -> Optional[str]:
+        db = SessionLocal()
+        try:
+            return DraftRepository(db).get_draft_content(draft_id, user_id)
+        finally:
+            db.close()
+
+    def _can_edit(self, draft_id: int, user_id: int) -> bool:
+        db = SessionLocal()
+        try:
+            draft = DraftRepository(db).get_draft_by_id(draft_id, defer_content=True)
+            return draft is not None and draft.user_id == user_id
+        finally:
+            db.close()
+
+    def _save(self, draft_id: int, content: str) -> bool:
+        db = SessionLocal()
+        try:
+            return DraftRepository(db).save_draft_content(draft_id, content)
+        finally:
+            db.close()
+
+def _rss_bytes() -> Optional[int]:
+    """Resident set size of this process (Linux), None where unavailable"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+def _room_key(draft_id: int) -> str:
+    """Channel and lease name of a draft's room"""
+    return f"room:{draft_id}"
 
 class ConnectionManager:
     """Manages WebSocket connections and rooms"""
-    
+
     # Predefined colors for user cursors
     CURSOR_COLORS = [
         "#FF6B6B",  # Red
@@ -44,157 +187,655 @@ class ConnectionManager:
         "#98D8C8",  # Mint
         "#F7DC6F",  # Gold
     ]
-    
-    def __init__(self):
+
+    def __init__(self, store: DraftContentStore = None, flush_interval: float = COLLAB_FLUSH_INTERVAL_SECONDS,
+                 cluster=None, node_id: str = None, cursor_fps: float = COLLAB_CURSOR_FPS):
         # draft_id -> Room
         self.rooms: Dict[int, Room] = {}
-        # user_id -> draft_id (track which room each user is in)
-        self.user_rooms: Dict[int, int] = {}
-    
-    def _get_color(self, room: Room) -> str:
-        """Assign a color to a new user based on existing users"""
-        used_colors = {user.color for user in room.users.values()}
+        self.store = store or DraftContentStore()
+        self.flush_interval = flush_interval
+        self.cursor_interval = 1 / cursor_fps
+        self.cluster = cluster or create_cluster_backend()
+        self.node_id = node_id or default_node_id()
+        self.heartbeat_task: Optional[asyncio.Task] = None
+        self.flush_stats = {"writes": 0, "failures": 0}
+        self.send_stats = {"broadcasts": 0, "resyncs": 0, "evictions": 0, "cursor_updates": 0, "cursor_frames": 0}
+        self.reaper_stats = {"pings": 0, "dead": 0, "idle": 0, "rejected_full": 0, "rooms_reaped": 0}
+        self.cluster_stats = {"takeovers": 0, "lost_leases": 0, "forwarded": 0}
+
+    def _get_color(self, users: list) -> str:
+        """Assign a color to a new user based on existing users (cluster-wide)"""
+        used_colors = {user["color"] for user in users}
         for color in self.CURSOR_COLORS:
             if color not in used_colors:
                 return color
         # If all colors used, cycle back
-        return self.CURSOR_COLORS[len(room.users) % len(self.CURSOR_COLORS)]
-    
-    async def connect(self, websocket: WebSocket, draft_id: int, user_id: int, username: str):
-        """Connect a user to a draft room"""
-        await websocket.accept()
-        
-        # Create room if doesn't exist
-        if draft_id not in self.rooms:
-            self.rooms[draft_id] = Room(draft_id=draft_id)
-        
-        room = self.rooms[draft_id]
-        color = self._get_color(room)
-        
+        return self.CURSOR_COLORS[len(users) % len(self.CURSOR_COLORS)]
+
+    async def connect(self, websocket: WebSocket, draft_id: int, user_id: int, username: str,
+                      codec=json_codec, subprotocol: str = None) -> Optional[UserSession]:
+        """
+        Connect a user to a draft room; returns None (socket closed) if the
+        draft can't be loaded or isn't the user's
+        """
+        await websocket.accept(subprotocol=subprotocol)
+
+        try:
+            allowed = await self.store.can_edit(draft_id, user_id)
+        except Exception as e:
+            logger.error(f"Failed to check access to draft {draft_id}: {e}")
+            allowed = False
+        if not allowed:
+            await websocket.close(code=4004, reason="Draft not found or unavailable")
+            return None
+
+        room = await self._open_room(draft_id, user_id)
+        if room is None:
+            await websocket.close(code=4004, reason="Draft not found or unavailable")
+            return None
+
+        try:
+            session = await self._join(room, websocket, user_id, username, codec)
+        finally:
+            room.joining -= 1
+        if session is None:
+            if not room.users:
+                await self._close_room(room)
+            return None
+
+        # Notify others in room
+        await self.broadcast_to_room(draft_id, {
+            "type": "user_joined",
+            "user_id": user_id,
+            "username": username,
+            "color": session.color,
+            "users": await self.room_users(draft_id)
+        }, exclude_user=user_id)
+
+        # Send current state to joining user (from the owner if it's another node)
+        session.awaiting_snapshot = "join"
+        if room.owned:
+            await self._send_snapshot(room, session, room.document.snapshot())
+        else:
+            await self._request_snapshot(room, session)
+        return session
+
+    async def _join(self, room: Room, websocket: WebSocket, user_id: int, username: str, codec) -> Optional[UserSession]:
+        """Add a session to the room unless it's full (then the socket is closed and None returned)"""
+        users = await self.room_users(room.draft_id)
+        if len(users) >= COLLAB_MAX_ROOM_USERS and all(user["user_id"] != user_id for user in users):
+            self.reaper_stats["rejected_full"] += 1
+            await websocket.close(code=4029, reason="Room is full")
+            return None
+
+        color = self._get_color(users)
+
         # Create user session
         session = UserSession(
             user_id=user_id,
             username=username,
+            draft_id=room.draft_id,
             websocket=websocket,
-            color=color
+            color=color,
+            codec=codec
         )
-        
-        # Add to room and track
+        session.outbox = Outbox(websocket, on_close=lambda error: self._evict(session, f"send failed: {error!r}"))
+        session.outbox.start()
+
+        # Add to room and track; a reconnect replaces the user's previous
+        # connection, whose receive loop then ends through disconnect() (a
+        # no-op for a replaced session)
+        previous = room.users.get(user_id)
         room.users[user_id] = session
-        self.user_rooms[user_id] = draft_id
-        
-        # Notify others in room
-        await self.broadcast_to_room(draft_id, {
-            "type": "user_joined",
-            "user_id": user_id,
-            "username": username,
-            "color": color,
-            "users": self._get_room_users(draft_id)
-        }, exclude_user=user_id)
-        
-        # Send current state to joining user
-        await websocket.send_json({
-            "type": "room_state",
-            "draft_id": draft_id,
-            "content": room.content,
-            "users": self._get_room_users(draft_id),
-            "your_color": color
-        })
-    
-    async def disconnect(self, user_id: int):
-        """Disconnect a user from their room"""
-        if user_id not in self.user_rooms:
-            return
-        
-        draft_id = self.user_rooms[user_id]
+        if previous is not None:
+            previous.outbox.close()
+            try:
+                await previous.websocket.close(code=4002, reason="Replaced by a new connection")
+            except Exception:
+                pass  # Already gone
+        self._ensure_heartbeat()
+        await self._publish_presence(room)
+        return session
+
+    async def _open_room(self, draft_id: int, user_id: int = None) -> Optional[Room]:
+        """
+        Get the room, joining the cluster room on first join: check the draft
+        exists, subscribe to its channel and take ownership if nobody holds
+        it (concurrent joiners wait). Callers are counted in room.joining and
+        must decrement it once they joined or gave up
+        """
         room = self.rooms.get(draft_id)
-        
-        if room and user_id in room.users:
-            username = room.users[user_id].username
+        if room is None:
+            room = Room(draft_id=draft_id, joining=1)
+            self.rooms[draft_id] = room
+            try:
+                content = await self.store.load(draft_id, user_id)
+                if content is not None:
+                    room.handler = lambda message, room=room: self._on_message(room, message)
+                    await self.cluster.subscribe(_room_key(draft_id), room.handler)
+                    if await self.cluster.acquire_lease(_room_key(draft_id), self.node_id, COLLAB_LEASE_SECONDS):
+                        self._become_owner(room, content)
+            except Exception as e:
+                logger.error(f"Failed to open collaboration room for draft {draft_id}: {e}")
+                content = None
+            if content is None:
+                room.load_failed = True
+                if room.handler is not None:
+                    await self.cluster.unsubscribe(_room_key(draft_id), room.handler)
+                if self.rooms.get(draft_id) is room:
+                    del self.rooms[draft_id]
+            room.ready.set()
+        else:
+            room.joining += 1
+            await room.ready.wait()
+
+        return None if room.load_failed else room
+
+    def _become_owner(self, room: Room, content: str):
+        room.document = OTDocument(content, max_length=COLLAB_MAX_CONTENT_CHARS)
+        room.owned = True
+        room.saved_revision = 0
+        room.last_flushed = time.monotonic()
+
+    def _drop_ownership(self, room: Room):
+        room.owned = False
+        room.document = None
+
+    async def _take_ownership(self, room: Room):
+        """Claim a room nobody owns: reload the draft and resync every user in the cluster room"""
+        if room.owned or room.claiming or not room.users:
+            return
+        room.claiming = True
+        try:
+            if not await self.cluster.acquire_lease(_room_key(room.draft_id), self.node_id, COLLAB_LEASE_SECONDS):
+                return
+            try:
+                content = await self.store.load(room.draft_id)
+            except Exception as e:
+                logger.error(f"Failed to reload draft {room.draft_id} for takeover: {e}")
+                content = None
+            if content is None:
+                await self.cluster.release_lease(_room_key(room.draft_id), self.node_id)
+                return
+            self._become_owner(room, content)
+            self.cluster_stats["takeovers"] += 1
+            logger.info(f"Node {self.node_id} took over collaboration room for draft {room.draft_id}")
+
+            snapshot = room.document.snapshot()
+            await self._publish(room.draft_id, {
+                "kind": "frame",
+                "message": {"type": "resync", "reason": "room owner changed", **snapshot},
+                "snapshot": snapshot
+            })
+        finally:
+            room.claiming = False
+
+    def _ensure_heartbeat(self):
+        if self.heartbeat_task is None:
+            self.heartbeat_task = asyncio.create_task(self._heartbeat())
+
+    async def _heartbeat(self):
+        """
+        Keep presence and leases alive, claim rooms whose owner disappeared,
+        ping connections and reap dead/idle ones and empty rooms
+        """
+        while True:
+            await asyncio.sleep(COLLAB_HEARTBEAT_SECONDS)
+            for room in list(self.rooms.values()):
+                if not room.ready.is_set():
+                    continue
+                try:
+                    await self._reap(room)
+                    if not room.users:
+                        if not room.joining and self.rooms.get(room.draft_id) is room:
+                            self.reaper_stats["rooms_reaped"] += 1
+                            await self._close_room(room)
+                        continue
+                    await self._publish_presence(room)
+                    if room.owned:
+                        if not await self.cluster.acquire_lease(_room_key(room.draft_id), self.node_id, COLLAB_LEASE_SECONDS):
+                            # Someone else took over (and resynced our users); our unsaved edits are lost
+                            self.cluster_stats["lost_leases"] += 1
+                            logger.warning(f"Lost ownership of collaboration room for draft {room.draft_id}")
+                            self._drop_ownership(room)
+                    elif await self.cluster.lease_holder(_room_key(room.draft_id)) is None:
+                        await self._take_ownership(room)
+                except Exception as e:
+                    logger.error(f"Collaboration heartbeat failed for draft {room.draft_id}: {e}")
+
+    async def _reap(self, room: Room):
+        """Evict connections that stopped answering pings or went idle; ping the rest"""
+        now = time.monotonic()
+        pings = {}  # codec name -> encoded ping
+        for session in list(room.users.values()):
+            if (session.answers_pings
+                    and now - session.last_seen > COLLAB_HEARTBEAT_SECONDS * COLLAB_MAX_MISSED_HEARTBEATS):
+                self.reaper_stats["dead"] += 1
+                await self._evict(session, "missed heartbeats", 4000, "Heartbeat timeout")
+            elif now - session.last_active > COLLAB_IDLE_TIMEOUT_SECONDS:
+                self.reaper_stats["idle"] += 1
+                await self._evict(session, "idle", 4008, "Idle timeout")
+            else:
+                ping = pings.get(session.codec.name)
+                if ping is None:
+                    ping = pings[session.codec.name] = session.codec.encode({"type": "ping"})
+                self.reaper_stats["pings"] += 1
+                session.outbox.send(ping)
+
+    def seen(self, session: UserSession, active: bool = False, pong: bool = False):
+        """
+        Record a message from the client (`active`: an edit or cursor move, not
+        just keep-alive; `pong`: an answer to our ping)
+        """
+        session.last_seen = time.monotonic()
+        if pong:
+            session.answers_pings = True
+        if active:
+            session.last_active = session.last_seen
+
+    def _schedule_flush(self, room: Room):
+        """Debounced write-behind: one pending flush per room, coalescing every edit until it runs"""
+        if room.flush_task is None:
+            room.flush_task = asyncio.create_task(self._flush_later(room))
+
+    async def _flush_later(self, room: Room):
+        try:
+            while room.owned and room.document.revision > room.saved_revision:
+                delay = room.last_flushed + self.flush_interval - time.monotonic()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                await self.flush_room(room)
+                if self.rooms.get(room.draft_id) is not room:
+                    break  # Room closed (its final flush already ran)
+        finally:
+            room.flush_task = None
+
+    async def flush_room(self, room: Room):
+        """Write the room's content to its draft if it changed since the last write (owner only)"""
+        async with room.flush_lock:
+            if not room.owned:
+                return
+            revision = room.document.revision
+            if revision <= room.saved_revision:
+                return
+            try:
+                await self.store.save(room.draft_id, room.content)
+                room.saved_revision = revision
+                self.flush_stats["writes"] += 1
+            except Exception as e:
+                self.flush_stats["failures"] += 1
+                logger.error(f"Failed to persist draft {room.draft_id}: {e}")
+            finally:
+                room.last_flushed = time.monotonic()
+
+    async def flush_all(self):
+        """Flush every room this node owns"""
+        for room in list(self.rooms.values()):
+            await self.flush_room(room)
+
+    async def shutdown(self):
+        """Flush owned rooms, hand them over to other nodes and leave the cluster"""
+        if self.heartbeat_task is not None:
+            self.heartbeat_task.cancel()
+        await self.flush_all()
+        for room in list(self.rooms.values()):
+            try:
+                await self.cluster.set_presence(room.draft_id, self.node_id, [], COLLAB_LEASE_SECONDS)
+                if room.owned:
+                    self._drop_ownership(room)
+                    await self.cluster.release_lease(_room_key(room.draft_id), self.node_id)
+                    await self._publish(room.draft_id, {"kind": "released"})
+            except Exception as e:
+                logger.error(f"Failed to release collaboration room for draft {room.draft_id}: {e}")
+        await self.cluster.close()
+
+    async def disconnect(self, session: UserSession):
+        """Remove a connection from its room (a no-op once it left or was replaced by a newer one)"""
+        session.outbox.close()
+        room = self._session_room(session)
+        if room is not None:
+            user_id = session.user_id
+            draft_id = room.draft_id
+            username = session.username
             del room.users[user_id]
-            del self.user_rooms[user_id]
-            
+            room.cursors.forget(user_id)
+            await self._publish_presence(room)
+
             # Notify others
             await self.broadcast_to_room(draft_id, {
                 "type": "user_left",
                 "user_id": user_id,
                 "username": username,
-                "users": self._get_room_users(draft_id)
+                "users": await self.room_users(draft_id)
             })
-            
-            # Clean up empty rooms
+
             if not room.users:
-                del self.rooms[draft_id]
-    
+                await self._close_room(room)
+
+    async def _close_room(self, room: Room):
+        """Persist and leave a room with no users left on this node (someone may rejoin during the flush)"""
+        await self.flush_room(room)
+        if room.users or room.joining or self.rooms.get(room.draft_id) is not room:
+            return
+        del self.rooms[room.draft_id]
+        await self.cluster.unsubscribe(_room_key(room.draft_id), room.handler)
+        if room.owned:
+            # Hand the room to a node that still has users in it
+            self._drop_ownership(room)
+            await self.cluster.release_lease(_room_key(room.draft_id), self.node_id)
+            await self._publish(room.draft_id, {"kind": "released"})
+
+    async def _publish(self, draft_id: int, message: dict):
+        await self.cluster.publish(_room_key(draft_id), message)
+
     async def broadcast_to_room(self, draft_id: int, message: dict, exclude_user: int = None):
-        """Broadcast message to all users in a room"""
-        room = self.rooms.get(draft_id)
-        if not room:
+        """Broadcast message to all users in a room, on every node (serialized once)"""
+        if draft_id not in self.rooms:
             return
-        
-        for user_id, session in room.users.items():
-            if user_id != exclude_user:
+
+        self.send_stats["broadcasts"] += 1
+        await self._publish(draft_id, {"kind": "frame", "message": message, "exclude_user": exclude_user})
+
+    async def _on_message(self, room: Room, message: dict):
+        """
+        Room channel handler. A message that fails part-way may have reached
+        only some sessions, so the whole room is resynced rather than left
+        silently diverged
+        """
+        try:
+            await self._handle_message(room, message)
+        except Exception as e:
+            logger.error(f"Collaboration message {message.get('kind')} failed in draft {room.draft_id}: {e}")
+            await self._resync_room(room, "server error")
+
+    async def _handle_message(self, room: Room, message: dict):
+        """Deliver frames locally; the owner also serves ops and snapshots"""
+        kind = message.get("kind")
+        if kind == "frame":
+            await self._on_frame(room, message)
+        elif kind == "direct":
+            session = room.users.get(message["user_id"])
+            if session is not None and session.awaiting_snapshot is None:
+                self._send(room, session, message["message"])
+        elif kind == "snapshot":
+            session = room.users.get(message["user_id"])
+            if session is not None and session.awaiting_snapshot is not None:
+                await self._send_snapshot(room, session, message["snapshot"])
+        elif kind == "released":
+            await self._take_ownership(room)
+        elif not room.owned:
+            return
+        elif kind == "op":
+            await self._apply_operation(room, message["user_id"], message["username"], message["version"],
+                                        message["op"], message.get("cursor_position"))
+        elif kind == "content":
+            await self._apply_content(room, message["user_id"], message["username"], message["content"],
+                                      message.get("cursor_position"))
+        elif kind == "snapshot_request":
+            await self._publish(room.draft_id, {
+                "kind": "snapshot",
+                "user_id": message["user_id"],
+                "snapshot": room.document.snapshot()
+            })
+
+    async def _on_frame(self, room: Room, message: dict):
+        frame = message["message"]
+        if frame["type"] == "operation":
+            # Keep everyone else's cursor on the same text
+            op = frame["op"]
+            for session in room.users.values():
+                if session.user_id == frame["user_id"]:
+                    if frame["cursor_position"] is not None:
+                        session.cursor_position = frame["cursor_position"]
+                    continue
                 try:
-                    await session.websocket.send_json(message)
-                except Exception:
-                    pass  # Connection might be closed
-    
-    async def update_cursor(self, user_id: int, position: int, selection_start: int = None, selection_end: int = None):
-        """Update a user's cursor position"""
-        if user_id not in self.user_rooms:
+                    if session.cursor_position is not None:
+                        session.cursor_position = transform_index(op, session.cursor_position)
+                    if session.selection_start is not None:
+                        session.selection_start = transform_index(op, session.selection_start)
+                    if session.selection_end is not None:
+                        session.selection_end = transform_index(op, session.selection_end)
+                except Exception as e:
+                    # One bad cursor must not keep the op from the rest of the room
+                    logger.error(f"Dropping cursor of user {session.user_id} in draft {room.draft_id}: {e}")
+                    session.cursor_position = session.selection_start = session.selection_end = None
+
+        encoded = {}  # codec name -> payload
+        exclude_user = message.get("exclude_user")
+        for user_id, session in list(room.users.items()):
+            if user_id == exclude_user:
+                continue
+            if session.awaiting_snapshot is None:
+                payload = encoded.get(session.codec.name)
+                if payload is None:
+                    payload = encoded[session.codec.name] = session.codec.encode(frame)
+                self._deliver(room, session, payload)
+            elif "snapshot" in message:
+                await self._send_snapshot(room, session, message["snapshot"])
+
+    async def _request_snapshot(self, room: Room, session: UserSession):
+        """Ask the owner for the current document; the session skips room frames until it arrives"""
+        await self._publish(room.draft_id, {"kind": "snapshot_request", "user_id": session.user_id})
+
+    async def _send_snapshot(self, room: Room, session: UserSession, snapshot: dict):
+        reason = session.awaiting_snapshot
+        session.awaiting_snapshot = None
+        if reason == "join":
+            frame = {
+                "type": "room_state",
+                "draft_id": room.draft_id,
+                "content": snapshot["content"],
+                "version": snapshot["version"],
+                "users": await self.room_users(room.draft_id),
+                "your_color": session.color
+            }
+        else:
+            frame = {"type": "resync", "reason": reason, **snapshot}
+        self._send(room, session, frame)
+
+    def _send(self, room: Room, session: UserSession, message: dict):
+        self._deliver(room, session, session.codec.encode(message))
+
+    def _deliver(self, room: Room, session: UserSession, payload):
+        """Enqueue an encoded frame for one peer; a full queue means it fell behind and must resync"""
+        if session.outbox.send(payload):
             return
-        
-        draft_id = self.user_rooms[user_id]
-        room = self.rooms.get(draft_id)
-        
-        if room and user_id in room.users:
-            session = room.users[user_id]
-            session.cursor_position = position
-            session.selection_start = selection_start
-            session.selection_end = selection_end
-            
-            # Broadcast to others
-            await self.broadcast_to_room(draft_id, {
-                "type": "cursor_update",
+        if session.outbox.closed:
+            return
+
+        session.resyncs += 1
+        if session.resyncs > COLLAB_MAX_RESYNCS:
+            asyncio.create_task(self._evict(session, "too slow"))
+            return
+
+        self._resync(room, session, "slow consumer")
+
+    def _resync(self, room: Room, session: UserSession, reason: str):
+        """Replace everything queued for a session with a snapshot of the current document"""
+        self.send_stats["resyncs"] += 1
+        if room.owned:
+            session.outbox.reset(session.codec.encode({"type": "resync", "reason": reason, **room.document.snapshot()}))
+        else:
+            session.outbox.reset()
+            session.awaiting_snapshot = reason
+            asyncio.create_task(self._request_snapshot(room, session))
+
+    async def _resync_room(self, room: Room, reason: str):
+        """Resync every session of a room; close them (they rejoin) if even that fails"""
+        for session in list(room.users.values()):
+            if session.awaiting_snapshot is not None:
+                continue  # The snapshot it waits for is current anyway
+            try:
+                self._resync(room, session, reason)
+            except Exception as e:
+                logger.error(f"Failed to resync user {session.user_id} in draft {room.draft_id}: {e}")
+                await self._evict(session, reason, code=1011, close_reason="Please reconnect")
+
+    async def _evict(self, session: UserSession, reason: str, code: int = 1013,
+                     close_reason: str = "Connection too slow"):
+        """Drop a dead, idle or hopelessly slow connection"""
+        self.send_stats["evictions"] += 1
+        logger.warning(f"Evicting collaboration session of user {session.user_id}: {reason}")
+        session.outbox.close()
+        try:
+            await session.websocket.close(code=code, reason=close_reason)
+        except Exception:
+            pass  # Already gone
+        await self.disconnect(session)
+
+    def _session_room(self, session: UserSession) -> Optional[Room]:
+        """The room of a connection still joined to it (None once it left or was replaced)"""
+        room = self.rooms.get(session.draft_id)
+        if room is None or room.users.get(session.user_id) is not session:
+            return None
+        return room
+
+    @staticmethod
+    def _position_limit(room: Room) -> int:
+        """Largest valid text index (the document length where this node holds it)"""
+        return len(room.content) if room.owned else COLLAB_MAX_CONTENT_CHARS
+
+    async def update_cursor(self, session: UserSession, position: int, selection_start: int = None,
+                            selection_end: int = None):
+        """
+        Update a connection's cursor position (broadcast with the room's next
+        cursors_update frame). Raises InvalidFrame for malformed positions
+        """
+        room = self._session_room(session)
+        if room is None:
+            return
+        user_id = session.user_id
+        limit = self._position_limit(room)
+        position = _position(position, "position", limit)
+        selection_start = _position(selection_start, "selection_start", limit)
+        selection_end = _position(selection_end, "selection_end", limit)
+
+        session.cursor_position = position
+        session.selection_start = selection_start
+        session.selection_end = selection_end
+
+        self.send_stats["cursor_updates"] += 1
+        room.cursors.update(user_id, {
+            "user_id": user_id,
+            "username": session.username,
+            "color": session.color,
+            "position": position,
+            "selection_start": selection_start,
+            "selection_end": selection_end
+        })
+        if room.cursor_task is None:
+            room.cursor_task = asyncio.create_task(self._send_cursors_later(room))
+
+    async def _send_cursors_later(self, room: Room):
+        """One cursors_update per tick: a lone move goes out at once, a burst waits for the next frame"""
+        try:
+            delay = room.cursors_sent_at + self.cursor_interval - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+        finally:
+            room.cursor_task = None  # Moves arriving while we broadcast schedule the next frame
+
+        room.cursors_sent_at = time.monotonic()
+        cursors = room.cursors.drain()
+        if cursors and self.rooms.get(room.draft_id) is room:
+            self.send_stats["cursor_frames"] += 1
+            await self.broadcast_to_room(room.draft_id, {"type": "cursors_update", "cursors": cursors})
+
+    async def apply_operation(self, session: UserSession, version: int, op: list, cursor_position: int = None):
+        """
+        Merge a client's text operation based on `version` into the room document.
+        The author gets an ack with the new version, peers get the transformed op;
+        a client whose op can't be merged is sent a fresh snapshot to resync from.
+        Ops of users connected to another node than the owner are forwarded to it.
+        Raises InvalidFrame for a malformed version or cursor position.
+        """
+        room = self._session_room(session)
+        if room is None:
+            return
+        user_id = session.user_id
+        if not isinstance(version, int) or isinstance(version, bool) or version < 0:
+            raise InvalidFrame("version must be a non-negative integer")
+        if not isinstance(op, list):
+            raise InvalidFrame("op must be a list")
+        cursor_position = _position(cursor_position, "cursor_position", COLLAB_MAX_CONTENT_CHARS)
+
+        if room.owned:
+            await self._apply_operation(room, user_id, session.username, version, op, cursor_position)
+        else:
+            self.cluster_stats["forwarded"] += 1
+            await self._publish(room.draft_id, {
+                "kind": "op", "user_id": user_id, "username": session.username,
+                "version": version, "op": op, "cursor_position": cursor_position
+            })
+
+    async def update_content(self, session: UserSession, content: str, cursor_position: int = None):
+        """
+        Whole-content update (clients without op support); merged as a diff at
+        the current version. Raises InvalidFrame for malformed fields
+        """
+        room = self._session_room(session)
+        if room is None:
+            return
+        user_id = session.user_id
+        if not isinstance(content, str):
+            raise InvalidFrame("content must be a string")
+        cursor_position = _position(cursor_position, "cursor_position", len(content))
+
+        if room.owned:
+            await self._apply_content(room, user_id, session.username, content, cursor_position)
+        else:
+            self.cluster_stats["forwarded"] += 1
+            await self._publish(room.draft_id, {
+                "kind": "content", "user_id": user_id, "username": session.username,
+                "content": content, "cursor_position": cursor_position
+            })
+
+    async def _apply_operation(self, room: Room, user_id: int, username: str, version: int, op: list,
+                               cursor_position: int = None):
+        try:
+            applied = room.document.receive(version, op)
+        except OperationError as e:
+            await self._publish(room.draft_id, {
+                "kind": "direct",
                 "user_id": user_id,
-                "username": session.username,
-                "color": session.color,
-                "position": position,
-                "selection_start": selection_start,
-                "selection_end": selection_end
-            }, exclude_user=user_id)
-    
-    async def update_content(self, user_id: int, content: str, cursor_position: int = None):
-        """Update document content (last-write-wins)"""
-        if user_id not in self.user_rooms:
+                "message": {"type": "resync", "reason": str(e), **room.document.snapshot()}
+            })
             return
-        
-        draft_id = self.user_rooms[user_id]
-        room = self.rooms.get(draft_id)
-        
-        if room:
-            room.content = content
-            room.last_updated = datetime.utcnow()
-            
-            if user_id in room.users:
-                session = room.users[user_id]
-                
-                # Broadcast to others
-                await self.broadcast_to_room(draft_id, {
-                    "type": "content_update",
-                    "user_id": user_id,
-                    "username": session.username,
-                    "content": content,
-                    "cursor_position": cursor_position
-                }, exclude_user=user_id)
-    
-    def _get_room_users(self, draft_id: int) -> list:
-        """Get list of users in a room"""
-        room = self.rooms.get(draft_id)
-        if not room:
-            return []
-        
-        return [
+
+        await self._publish_operation(room, user_id, username, applied, cursor_position)
+
+    async def _apply_content(self, room: Room, user_id: int, username: str, content: str, cursor_position: int = None):
+        applied = room.document.replace(content)
+        if applied is not None:
+            await self._publish_operation(room, user_id, username, applied, cursor_position)
+
+    async def _publish_operation(self, room: Room, user_id: int, username: str, op: list, cursor_position: int = None):
+        room.last_updated = datetime.utcnow()
+        self._schedule_flush(room)
+        version = room.document.revision
+
+        self.send_stats["broadcasts"] += 1
+        await self._publish(room.draft_id, {
+            "kind": "frame",
+            "message": {
+                "type": "operation",
+                "version": version,
+                "op": op,
+                "user_id": user_id,
+                "username": username,
+                "cursor_position": cursor_position
+            },
+            "exclude_user": user_id
+        })
+        await self._publish(room.draft_id, {
+            "kind": "direct",
+            "user_id": user_id,
+            "message": {"type": "ack", "version": version}
+        })
+
+    async def _publish_presence(self, room: Room):
+        """Publish this node's users in the room (an empty list withdraws them)"""
+        await self.cluster.set_presence(room.draft_id, self.node_id, [
             {
                 "user_id": session.user_id,
                 "username": session.username,
@@ -204,13 +845,44 @@ class ConnectionManager:
                 "selection_end": session.selection_end
             }
             for session in room.users.values()
-        ]
-    
+        ], COLLAB_LEASE_SECONDS)
+
+    async def room_users(self, draft_id: int) -> list:
+        """Users in a room across every node"""
+        return await self.cluster.get_presence(draft_id)
+
     def get_room_count(self, draft_id: int) -> int:
-        """Get number of users in a room"""
+        """Get number of users in a room on this node"""
         room = self.rooms.get(draft_id)
         return len(room.users) if room else 0
 
+    def get_stats(self) -> dict:
+        """Room/connection counts and memory held by this node's rooms"""
+        rooms = list(self.rooms.values())
+        documents = [room.document for room in rooms if room.document is not None]
+        sessions = [session for room in rooms for session in room.users.values()]
+        return {
+            "node_id": self.node_id,
+            "rooms": len(rooms),
+            "owned_rooms": len(documents),
+            "connections": len(sessions),
+            "memory": {
+                "content_chars": sum(len(document.content) for document in documents),
+                "largest_content_chars": max((len(document.content) for document in documents), default=0),
+                "history_ops": sum(len(document.history) for document in documents),
+                "queued_frames": sum(session.outbox.pending() for session in sessions),
+                "rss_bytes": _rss_bytes()
+            },
+            "limits": {
+                "max_room_users": COLLAB_MAX_ROOM_USERS,
+                "max_content_chars": COLLAB_MAX_CONTENT_CHARS,
+                "idle_timeout_seconds": COLLAB_IDLE_TIMEOUT_SECONDS
+            },
+            "reaper": dict(self.reaper_stats),
+            "send": dict(self.send_stats),
+            "flush": dict(self.flush_stats),
+            "cluster": dict(self.cluster_stats)
+        }
 
 # Global connection manager instance
 manager = ConnectionManager()
@@ -0,0 +1,77 @@
+"""
+WebSocket Outbox
+
+Per-connection outbound queue drained by its own writer task, so a
+broadcast never waits on any single client:
+- send() only enqueues (pre-serialized text, or bytes for binary frames);
+  it never blocks
+- the queue is bounded; send() returns False when a slow consumer's queue is
+  full and the caller decides what to do (e.g. reset() it with a resync)
+- a send that fails or takes longer than the timeout closes the outbox and
+  calls on_close so the connection can be evicted
+"""
+import asyncio
+import os
+from typing import Awaitable, Callable, Optional, Union
+
+COLLAB_SEND_QUEUE_SIZE = int(os.getenv("COLLAB_SEND_QUEUE_SIZE", "256"))
+COLLAB_SEND_TIMEOUT_SECONDS = float(os.getenv("COLLAB_SEND_TIMEOUT_SECONDS", "5"))
+
+class Outbox:
+    def __init__(self, websocket, max_size: int = COLLAB_SEND_QUEUE_SIZE,
+                 send_timeout: float = COLLAB_SEND_TIMEOUT_SECONDS,
+                 on_close: Optional[Callable[[Exception], Awaitable[None]]] = None):
+        self.websocket = websocket
+        self.queue: asyncio.Queue = asyncio.Queue(max_size)
+        self.send_timeout = send_timeout
+        self.on_close = on_close
+        self.closed = False
+        self.task: Optional[asyncio.Task] = None
+        self.stats = {"sent": 0, "dropped": 0, "overflows": 0}
+
+    def start(self):
+        self.task = asyncio.create_task(self._run())
+
+    def send(self, payload: Union[str, bytes]) -> bool:
+        """Enqueue a frame; False if the outbox is closed or full"""
+        if self.closed:
+            return False
+        try:
+            self.queue.put_nowait(payload)
+            return True
+        except asyncio.QueueFull:
+            self.stats["overflows"] += 1
+            return False
+
+    def reset(self, payload: Union[str, bytes, None] = None):
+        """Drop everything still queued and enqueue `payload` instead (e.g. a resync snapshot)"""
+        while not self.queue.empty():
+            self.queue.get_nowait()
+            self.stats["dropped"] += 1
+        if payload is not None and not self.closed:
+            self.queue.put_nowait(payload)
+
+    def pending(self) -> int:
+        return self.queue.qsize()
+
+    async def _run(self):
+        try:
+            while True:
+                payload = await self.queue.get()
+                if isinstance(payload, bytes):
+                    await asyncio.wait_for(self.websocket.send_bytes(payload), self.send_timeout)
+                else:
+                    await asyncio.wait_for(self.websocket.send_text(payload), self.send_timeout)
+                self.stats["sent"] += 1
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self.closed = True
+            if self.on_close:
+                await self.on_close(e)
+
+    def close(self):
+        """Stop the writer (safe to call from the writer's own on_close)"""
+        self.closed = True
+        if self.task is not None and self.task is not asyncio.current_task():
+            self.task.cancel()
@@ -1,6 +1,6 @@
 from typing import Optional, List
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, relationship
-from sqlalchemy import ForeignKey, String, DateTime, Text, UniqueConstraint
+from sqlalchemy import ForeignKey, String, DateTime, Text, UniqueConstraint, LargeBinary
 from datetime import datetime
 
 class Base(DeclarativeBase):
@@ -67,5 +67,21 @@ class Draft(Base):
     title: Mapped[str] = mapped_column(String(255), nullable=False)
     content: Mapped[str] = mapped_column(Text, nullable=True)  # Can be empty initially
     status: Mapped[str] = mapped_column(String(50), default="draft")  # 'draft', 'published', 'archived'
+    revision: Mapped[int] = mapped_column(default=0, server_default="0")  # Bumped on every content change
+    created_at: Mapped[Optional[datetime]] = mapped_column(DateTime, default=datetime.utcnow)
+    updated_at: Mapped[Optional[datetime]] = mapped_column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class DraftRevision(Base):
+    __tablename__ = "draft_revisions"
+    __table_args__ = (
+        UniqueConstraint('draft_id', 'revision', name='uq_draft_revision'),
+    )
+
+    id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
+    draft_id: Mapped[int] = mapped_column(ForeignKey("drafts.id", ondelete="CASCADE"), nullable=False)
+    revision: Mapped[int] = mapped_column(nullable=False)
+    kind: Mapped[str] = mapped_column(String(10), nullable=False)  # 'snapshot' (full content) or 'delta' (op from the previous revision)
+    data: Mapped[bytes] = mapped_column(LargeBinary, nullable=False)  # zlib-compressed
+    content_length: Mapped[int] = mapped_column(nullable=False)
+    user_id: Mapped[Optional[int]] = mapped_column(ForeignKey("users.id"), nullable=True)  # None for collaborative saves
     created_at: Mapped[Optional[datetime]] = mapped_column(DateTime, default=datetime.utcnow)
-    updated_at: Mapped[Optional[datetime]] = mapped_column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
\ No newline at end of file
@@ -1,11 +1,28 @@
-from neo4j import GraphDatabase
+from neo4j import GraphDatabase, AsyncGraphDatabase
 import os
 
 URI = os.getenv("NEO4J_URI")
 USER = os.getenv("NEO4J_USER")
 PASSWORD = os.getenv("NEO4J_PASSWORD")
 
-driver = GraphDatabase.driver(URI, auth=(USER, PASSWORD))
+# Connection pool settings (shared by the sync and async drivers)
+DRIVER_SETTINGS = {
+    "max_connection_pool_size": int(os.getenv("NEO4J_MAX_POOL_SIZE", "100")),
+    "connection_acquisition_timeout": float(os.getenv("NEO4J_ACQUISITION_TIMEOUT", "30")),
+    "max_connection_lifetime": float(os.getenv("NEO4J_MAX_CONNECTION_LIFETIME", "3600")),
+    "connection_timeout": float(os.getenv("NEO4J_CONNECTION_TIMEOUT", "15")),
+    "keep_alive": True,
+}
+
+driver = GraphDatabase.driver(URI, auth=(USER, PASSWORD), **DRIVER_SETTINGS)
+async_driver = AsyncGraphDatabase.driver(URI, auth=(USER, PASSWORD), **DRIVER_SETTINGS)
 
 def get_neo4j_session():
-    return driver.session()
\ No newline at end of file
+    return driver.session()
+
+def get_async_neo4j_session():
+    return async_driver.session()
+
+async def close_neo4j_drivers():
+    driver.close()
+    await async_driver.close()
@@ -0,0 +1,35 @@
+"""
+Neo4j Schema Bootstrap
+
+Creates the uniqueness constraints and indexes the persona graph relies on. Each
+constraint is backed by an index, so lookups such as
+MATCH (p:Persona {id: $id}) and MERGE (u:User {id: $id}) become index seeks
+instead of label scans. Statements are idempotent and run at startup (in a
+thread, so the event loop isn't held). Index population isn't waited for:
+Neo4j builds new indexes in the background.
+"""
+from app.db.neo4j_connection import driver
+from app.core.logger import logger
+
+SCHEMA_STATEMENTS = [
+    "CREATE CONSTRAINT persona_id_unique IF NOT EXISTS FOR (p:Persona) REQUIRE p.id IS UNIQUE",
+    "CREATE CONSTRAINT user_id_unique IF NOT EXISTS FOR (u:User) REQUIRE u.id IS UNIQUE",
+    "CREATE CONSTRAINT topic_name_unique IF NOT EXISTS FOR (t:Topic) REQUIRE t.name IS UNIQUE",
+    # Shared vocabulary nodes (deduplicate first: migrations/dedupe_persona_vocabulary.cypher)
+    "CREATE CONSTRAINT audience_type_unique IF NOT EXISTS FOR (a:Audience) REQUIRE a.type IS UNIQUE",
+    "CREATE CONSTRAINT purpose_type_unique IF NOT EXISTS FOR (p:Purpose) REQUIRE p.type IS UNIQUE",
+    "CREATE CONSTRAINT banned_word_text_unique IF NOT EXISTS FOR (bw:BannedWord) REQUIRE bw.text IS UNIQUE",
+    # Fuzzy / normalized topic matching for persona recommendations
+    "CREATE FULLTEXT INDEX topic_name_fulltext IF NOT EXISTS FOR (t:Topic) ON EACH [t.name]",
+]
+
+def ensure_neo4j_schema():
+    """Create constraints and indexes if they don't exist"""
+    with driver.session() as session:
+        for statement in SCHEMA_STATEMENTS:
+            try:
+                session.run(statement).consume()
+            except Exception as e:
+                # Usually duplicate nodes left over from before the constraint existed
+                logger.error(f"Neo4j schema statement failed ({e}): {statement}")
+    logger.info(f"Neo4j schema ensured ({len(SCHEMA_STATEMENTS)} statements)")
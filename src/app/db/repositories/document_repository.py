@@ -26,6 +26,13 @@ class DocumentRepository:
     def get_document_by_id(self, id: int):
         return self.db.query(Documents).filter(Documents.id == id).first()
 
+    def list_processing_document_ids(self, user_id: int):
+        rows = self.db.query(Documents.id).filter(
+            Documents.user_id == user_id,
+            Documents.status == "processing"
+        ).all()
+        return [row.id for row in rows]
+
     def list_user_documents(self, user_id: int, limit: int = 20, offset: int = 0):
         query = self.db.query(Documents).filter(Documents.user_id == user_id)
         documents = query.order_by(Documents.created_at.desc()).offset(offset).limit(limit).all()
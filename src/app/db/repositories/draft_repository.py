@@ -1,57 +1,301 @@
-from app.db.models import Draft
+from app.db.models import Draft, DraftRevision
+from sqlalchemy import func
+from sqlalchemy.orm import defer
+from app.core.text_ot import apply, from_diff, validate
 from datetime import datetime
+import json
+import os
+import zlib
+
+# Every Nth revision is stored as a full snapshot, so rebuilding any
+# revision applies at most N-1 deltas
+DRAFT_SNAPSHOT_INTERVAL = int(os.getenv("DRAFT_SNAPSHOT_INTERVAL", "20"))
+DRAFT_EXCERPT_CHARS = int(os.getenv("DRAFT_EXCERPT_CHARS", "200"))
+
+class RevisionConflict(Exception):
+    """The draft changed since the revision an update was based on"""
+    def __init__(self, current_revision: int):
+        super().__init__(f"Draft is at revision {current_revision}")
+        self.current_revision = current_revision
+
+def make_excerpt(head: str, content_length: int, max_chars: int = DRAFT_EXCERPT_CHARS) -> str:
+    """Whitespace-collapsed start of a draft, cut on a word boundary with an ellipsis if truncated"""
+    text = " ".join(head.split())
+    if len(text) <= max_chars and content_length <= len(head):
+        return text
+    cut = text[:max_chars]
+    if " " in cut[max_chars // 2:]:
+        cut = cut[:cut.rindex(" ")]
+    return cut.rstrip() + "…"
+
+def _pack_snapshot(content: str) -> bytes:
+    return zlib.compress(content.encode("utf-8"))
+
+def _unpack_snapshot(data: bytes) -> str:
+    return zlib.decompress(data).decode("utf-8")
+
+def _pack_delta(op: list) -> bytes:
+    return zlib.compress(json.dumps(op, separators=(",", ":")).encode("utf-8"))
+
+def _unpack_delta(data: bytes) -> list:
+    return json.loads(zlib.decompress(data))
 
 class DraftRepository:
     def __init__(self, db_session):
         self.db = db_session
 
     def create_draft(self, user_id: int, title: str, content: str = "") -> Draft:
-        """Create a new draft"""
+        """Create a new draft (its content is stored as the revision 0 snapshot)"""
         draft = Draft(
             user_id=user_id,
             title=title,
             content=content,
-            status="draft"
+            status="draft",
+            revision=0
         )
         self.db.add(draft)
+        self.db.flush()
+        self.db.add(self._snapshot_row(draft.id, 0, content or "", user_id))
         self.db.commit()
         self.db.refresh(draft)
         return draft
     
-    def get_draft_by_id(self, draft_id: int) -> Draft | None:
-        """Get a draft by ID"""
-        return self.db.query(Draft).filter(Draft.id == draft_id).first()
+    def get_draft_by_id(self, draft_id: int, defer_content: bool = False) -> Draft | None:
+        """Get a draft by ID (with defer_content, content loads only when accessed)"""
+        query = self.db.query(Draft)
+        if defer_content:
+            query = query.options(defer(Draft.content))
+        return query.filter(Draft.id == draft_id).first()
     
     def list_user_drafts(self, user_id: int, limit: int = 20, offset: int = 0) -> dict:
-        """List all drafts for a user with pagination"""
-        query = self.db.query(Draft).filter(Draft.user_id == user_id)
-        total = query.count()
-        drafts = query.order_by(Draft.updated_at.desc()).offset(offset).limit(limit).all()
+        """
+        List a user's drafts with pagination: metadata, content length and an
+        excerpt. `content` stays deferred; the database returns only its
+        length and first characters.
+        """
+        total = self.db.query(func.count(Draft.id)).filter(Draft.user_id == user_id).scalar()
+        rows = (
+            self.db.query(
+                Draft,
+                func.coalesce(func.length(Draft.content), 0).label("content_length"),
+                # A little extra so the excerpt can end on a word boundary
+                func.substr(Draft.content, 1, DRAFT_EXCERPT_CHARS + 40).label("head")
+            )
+            .options(defer(Draft.content))
+            .filter(Draft.user_id == user_id)
+            .order_by(Draft.updated_at.desc())
+            .offset(offset)
+            .limit(limit)
+            .all()
+        )
         return {
-            "drafts": drafts,
+            "drafts": [
+                {
+                    "id": draft.id,
+                    "title": draft.title,
+                    "status": draft.status,
+                    "revision": draft.revision,
+                    "excerpt": make_excerpt(head or "", content_length),
+                    "content_length": content_length,
+                    "created_at": draft.created_at,
+                    "updated_at": draft.updated_at
+                }
+                for draft, content_length, head in rows
+            ],
             "total": total
         }
     
-    def update_draft(self, draft_id: int, title: str = None, content: str = None, status: str = None) -> Draft | None:
-        """Update a draft"""
+    def get_user_draft_contents(self, user_id: int, limit: int = 50) -> list[str]:
+        """Get the content of a user's most recent drafts (no ORM objects)"""
+        rows = (
+            self.db.query(Draft.content)
+            .filter(Draft.user_id == user_id, Draft.content.isnot(None))
+            .order_by(Draft.updated_at.desc())
+            .limit(limit)
+            .all()
+        )
+        return [row.content for row in rows]
+    
+    def get_draft_content(self, draft_id: int, user_id: int = None) -> str | None:
+        """Get only a draft's content (None if the draft doesn't exist or, given user_id, isn't theirs)"""
+        query = self.db.query(Draft.content).filter(Draft.id == draft_id)
+        if user_id is not None:
+            query = query.filter(Draft.user_id == user_id)
+        row = query.first()
+        if row is None:
+            return None
+        return row.content or ""
+    
+    def save_draft_content(self, draft_id: int, content: str) -> bool:
+        """Write a draft's content as a new revision (collaborative saves; last write wins)"""
+        for _ in range(3):
+            row = self.db.query(Draft.content, Draft.revision).filter(Draft.id == draft_id).first()
+            if row is None:
+                return False
+            if (row.content or "") == content:
+                return True
+            try:
+                self._write_content(draft_id, row.revision, row.content or "", content)
+                return True
+            except RevisionConflict:
+                continue  # Raced with another writer; rebase on its revision
+        return False
+    
+    def update_draft(self, draft_id: int, title: str = None, content: str = None, status: str = None,
+                     base_revision: int = None, user_id: int = None) -> Draft | None:
+        """
+        Update a draft. A content change becomes a new revision; with
+        base_revision it's rejected (RevisionConflict) if the draft moved on.
+        """
         draft = self.get_draft_by_id(draft_id)
         if not draft:
             return None
         
         if title is not None:
             draft.title = title
-        if content is not None:
-            draft.content = content
         if status is not None:
             draft.status = status
         
         # Explicitly update the timestamp
         draft.updated_at = datetime.utcnow()
         
-        self.db.commit()
+        old_content = draft.content or ""
+        if content is not None and content != old_content:
+            self._write_content(draft_id, draft.revision if base_revision is None else base_revision,
+                                old_content, content, user_id=user_id)
+        elif base_revision is not None and base_revision != draft.revision:
+            raise RevisionConflict(draft.revision)
+        else:
+            self.db.commit()
         self.db.refresh(draft)
         return draft
     
+    def apply_delta(self, draft_id: int, base_revision: int, op: list, user_id: int = None) -> Draft | None:
+        """
+        Apply a text_ot operation based on base_revision as the next revision.
+        Raises RevisionConflict if the draft is no longer at base_revision and
+        OperationError if the op doesn't fit it.
+        """
+        draft = self.get_draft_by_id(draft_id)
+        if not draft:
+            return None
+        if draft.revision != base_revision:
+            raise RevisionConflict(draft.revision)
+        
+        op = validate(op)
+        content = apply(draft.content or "", op)
+        self._write_content(draft_id, base_revision, draft.content or "", content, op, user_id)
+        self.db.refresh(draft)
+        return draft
+    
+    def _write_content(self, draft_id: int, base_revision: int, old_content: str, content: str,
+                       op: list = None, user_id: int = None) -> int:
+        """
+        Move the draft from base_revision to the next revision (guarded UPDATE,
+        so concurrent writers can't both succeed) and record it; commits.
+        Returns the new revision.
+        """
+        revision = base_revision + 1
+        updated = (
+            self.db.query(Draft)
+            .filter(Draft.id == draft_id, Draft.revision == base_revision)
+            .update({Draft.content: content, Draft.revision: revision, Draft.updated_at: datetime.utcnow()},
+                    synchronize_session=False)
+        )
+        if not updated:
+            self.db.rollback()
+            current = self.db.query(Draft.revision).filter(Draft.id == draft_id).scalar()
+            raise RevisionConflict(current if current is not None else base_revision)
+        
+        # Drafts that predate revision history get their base snapshot now
+        if base_revision == 0 and not self._has_revision(draft_id, 0):
+            self.db.add(self._snapshot_row(draft_id, 0, old_content, user_id))
+        
+        if op is None:
+            op = from_diff(old_content, content)
+        delta = _pack_delta(op)
+        if revision % DRAFT_SNAPSHOT_INTERVAL == 0 or len(delta) >= len(content):
+            self.db.add(self._snapshot_row(draft_id, revision, content, user_id))
+        else:
+            self.db.add(DraftRevision(
+                draft_id=draft_id,
+                revision=revision,
+                kind="delta",
+                data=delta,
+                content_length=len(content),
+                user_id=user_id
+            ))
+        self.db.commit()
+        return revision
+    
+    def _snapshot_row(self, draft_id: int, revision: int, content: str, user_id: int = None) -> DraftRevision:
+        return DraftRevision(
+            draft_id=draft_id,
+            revision=revision,
+            kind="snapshot",
+            data=_pack_snapshot(content),
+            content_length=len(content),
+            user_id=user_id
+        )
+    
+    def _has_revision(self, draft_id: int, revision: int) -> bool:
+        return self.db.query(DraftRevision.id).filter(
+            DraftRevision.draft_id == draft_id, DraftRevision.revision == revision
+        ).first() is not None
+    
+    def list_revisions(self, draft_id: int, limit: int = 50, offset: int = 0) -> dict:
+        """Revision metadata, newest first (no content)"""
+        query = self.db.query(
+            DraftRevision.revision, DraftRevision.kind, DraftRevision.content_length,
+            DraftRevision.user_id, DraftRevision.created_at
+        ).filter(DraftRevision.draft_id == draft_id)
+        total = query.count()
+        rows = query.order_by(DraftRevision.revision.desc()).offset(offset).limit(limit).all()
+        return {
+            "revisions": [row._asdict() for row in rows],
+            "total": total
+        }
+    
+    def get_revision_content(self, draft_id: int, revision: int) -> str | None:
+        """
+        Rebuild a revision's content: the nearest snapshot at or before it plus
+        the deltas after that (None if the draft or revision doesn't exist)
+        """
+        head = self.db.query(Draft.content, Draft.revision).filter(Draft.id == draft_id).first()
+        if head is None or revision < 0 or revision > head.revision:
+            return None
+        if revision == head.revision:
+            return head.content or ""
+        
+        snapshot = (
+            self.db.query(DraftRevision.revision, DraftRevision.data)
+            .filter(
+                DraftRevision.draft_id == draft_id,
+                DraftRevision.kind == "snapshot",
+                DraftRevision.revision <= revision
+            )
+            .order_by(DraftRevision.revision.desc())
+            .first()
+        )
+        if snapshot is None:
+            return None  # Older than the draft's recorded history
+        
+        content = _unpack_snapshot(snapshot.data)
+        deltas = (
+            self.db.query(DraftRevision.data)
+            .filter(
+                DraftRevision.draft_id == draft_id,
+                DraftRevision.kind == "delta",
+                DraftRevision.revision > snapshot.revision,
+                DraftRevision.revision <= revision
+            )
+            .order_by(DraftRevision.revision)
+            .all()
+        )
+        for row in deltas:
+            content = apply(content, _unpack_delta(row.data))
+        return content
+    
     def delete_draft(self, draft_id: int) -> bool:
         """Delete a draft"""
         draft = self.get_draft_by_id(draft_id)
@@ -1,4 +1,275 @@
-from datetime import datetime 
+from datetime import datetime
+import os
+import re
+from app.core.cache import create_cache, LOCAL_CACHE_TTL_SECONDS
+
+# Relationships are gathered with pattern comprehensions, so each persona is
+# one row (no cartesian product of topics x banned words)
+PERSONA_PROJECTION = """
+p,
+[(p)-[:targets_topic]->(t:Topic) | t.name] as topics,
+[(p)-[:bans_word]->(bw:BannedWord) | bw.text] as banned_words,
+head([(p)-[:targets_audience]->(a:Audience) | a.type]) as audience,
+head([(p)-[:for_purpose]->(pur:Purpose) | pur.type]) as purpose
+"""
+
+CREATE_PERSONA_QUERY = """
+MERGE (u:User {id: $user_id})
+CREATE (p:Persona {
+    id: randomUuid(),
+    name: $name,
+    description: $description,
+    samples: $samples,
+    formality_level: $formality_level,
+    creativity_level: $creativity_level,
+    sentence_length: $sentence_length,
+    use_metaphors: $use_metaphors,
+    jargon_level: $jargon_level,
+    version: 1,
+    created_at: datetime(),
+    updated_at: datetime()
+})
+CREATE (u)-[:owns_persona]->(p)
+WITH p
+MERGE (a:Audience {type: $audience})
+CREATE (p)-[:targets_audience]->(a)
+WITH p
+MERGE (pur:Purpose {type: $purpose})
+CREATE (p)-[:for_purpose]->(pur)
+WITH p, $topics as topics, $banned_words as banned_words
+FOREACH (topic IN topics |
+    MERGE (t:Topic {name: topic})
+    MERGE (p)-[:targets_topic]->(t)
+)
+WITH p, banned_words
+FOREACH (word IN banned_words |
+    MERGE (bw:BannedWord {text: word})
+    MERGE (p)-[:bans_word]->(bw)
+)
+WITH p
+RETURN """ + PERSONA_PROJECTION
+
+# Relationship updates for update_persona. Each one only touches the
+# relationships that changed: stale ones are deleted, missing ones merged.
+UPDATE_RELATIONSHIP_CLAUSES = {
+    "topics": """
+WITH p
+CALL {
+    WITH p
+    MATCH (p)-[r:targets_topic]->(t:Topic)
+    WHERE NOT t.name IN $topics
+    DELETE r
+}
+FOREACH (topic IN $topics |
+    MERGE (t:Topic {name: topic})
+    MERGE (p)-[:targets_topic]->(t)
+)
+""",
+    "banned_words": """
+WITH p
+CALL {
+    WITH p
+    MATCH (p)-[r:bans_word]->(bw:BannedWord)
+    WHERE NOT bw.text IN $banned_words
+    DELETE r
+}
+FOREACH (word IN $banned_words |
+    MERGE (bw:BannedWord {text: word})
+    MERGE (p)-[:bans_word]->(bw)
+)
+""",
+    "audience": """
+WITH p
+CALL {
+    WITH p
+    MATCH (p)-[r:targets_audience]->(a:Audience)
+    WHERE a.type <> $audience
+    DELETE r
+}
+MERGE (a:Audience {type: $audience})
+MERGE (p)-[:targets_audience]->(a)
+""",
+    "purpose": """
+WITH p
+CALL {
+    WITH p
+    MATCH (p)-[r:for_purpose]->(pur:Purpose)
+    WHERE pur.type <> $purpose
+    DELETE r
+}
+MERGE (pur:Purpose {type: $purpose})
+MERGE (p)-[:for_purpose]->(pur)
+""",
+}
+
+GET_PERSONA_QUERY = """
+MATCH (p:Persona {id: $persona_id})
+RETURN """ + PERSONA_PROJECTION
+
+GET_USER_PERSONAS_QUERY = """
+MATCH (u:User {id: $user_id})-[:owns_persona]->(p:Persona)
+RETURN """ + PERSONA_PROJECTION
+
+GET_PERSONAS_BY_TOPIC_QUERY = """
+MATCH (p:Persona)-[:targets_topic]->(:Topic {name: $topic})
+WITH p LIMIT $limit
+RETURN """ + PERSONA_PROJECTION
+
+# Every requested topic is matched through the full-text index (fuzzy), and
+# personas are ranked by how many requested topics they cover, then by score
+RECOMMEND_PERSONAS_QUERY = """
+UNWIND $terms AS term
+CALL db.index.fulltext.queryNodes('topic_name_fulltext', term.query, {limit: $topic_candidates})
+YIELD node AS t, score
+MATCH (p:Persona)-[:targets_topic]->(t)
+WITH p, term.topic AS requested, max(score) AS topic_score
+WITH p, count(requested) AS matched_topics, sum(topic_score) AS score
+ORDER BY matched_topics DESC, score DESC
+LIMIT $limit
+RETURN """ + PERSONA_PROJECTION + """, matched_topics, score
+"""
+
+# Bulk import: one statement per chunk of rows, all in a single transaction
+IMPORT_PERSONAS_QUERY = """
+MERGE (u:User {id: $user_id})
+WITH u
+UNWIND $rows AS row
+CREATE (p:Persona {
+    id: randomUuid(),
+    name: row.name,
+    description: row.description,
+    samples: row.samples,
+    formality_level: row.formality_level,
+    creativity_level: row.creativity_level,
+    sentence_length: row.sentence_length,
+    use_metaphors: row.use_metaphors,
+    jargon_level: row.jargon_level,
+    version: 1,
+    created_at: datetime(),
+    updated_at: datetime()
+})
+CREATE (u)-[:owns_persona]->(p)
+MERGE (a:Audience {type: row.audience})
+CREATE (p)-[:targets_audience]->(a)
+MERGE (pur:Purpose {type: row.purpose})
+CREATE (p)-[:for_purpose]->(pur)
+FOREACH (topic IN row.topics |
+    MERGE (t:Topic {name: topic})
+    MERGE (p)-[:targets_topic]->(t)
+)
+FOREACH (word IN row.banned_words |
+    MERGE (bw:BannedWord {text: word})
+    MERGE (p)-[:bans_word]->(bw)
+)
+RETURN row.line AS line, p.id AS id
+"""
+
+GET_PERSONA_VERSION_QUERY = """
+MATCH (p:Persona {id: $persona_id})
+RETURN coalesce(p.version, 0) AS version
+"""
+
+DELETE_PERSONA_QUERY = """
+MATCH (p:Persona {id: $persona_id})
+DETACH DELETE p
+"""
+
+# Personas change rarely and are read on nearly every chat/autocomplete request
+persona_cache = create_cache(
+    "persona",
+    ttl_seconds=int(os.getenv("PERSONA_CACHE_TTL_SECONDS", "300")),
+    local_ttl_seconds=LOCAL_CACHE_TTL_SECONDS
+)
+
+class VersionConflict(Exception):
+    """The persona changed since the version an update was based on"""
+    def __init__(self, current_version: int):
+        super().__init__(f"Persona is at version {current_version}")
+        self.current_version = current_version
+
+def normalize_topic(topic: str) -> str:
+    """Lowercase and collapse whitespace so 'Web  Dev' and 'web dev' are the same topic"""
+    return " ".join(topic.lower().split())
+
+def topic_search_query(topic: str) -> str:
+    """Lucene query matching all words of a topic, allowing small typos"""
+    words = re.findall(r"\w+", topic.lower())
+    return " AND ".join(f"{word}~{1 if len(word) <= 5 else 2}" for word in words)
+
+def _create_params(user_id: int, persona_data: dict) -> dict:
+    return {
+        "user_id": user_id,
+        "name": persona_data.get("name"),
+        "description": persona_data.get("description"),
+        "samples": persona_data.get("samples", []),
+        "formality_level": persona_data.get("formality_level"),
+        "creativity_level": persona_data.get("creativity_level"),
+        "sentence_length": persona_data.get("sentence_length"),
+        "use_metaphors": persona_data.get("use_metaphors"),
+        "jargon_level": persona_data.get("jargon_level"),
+        "audience": persona_data.get("audience"),
+        "purpose": persona_data.get("purpose"),
+        "topics": persona_data.get("topics", []),
+        "banned_words": persona_data.get("banned_words", [])
+    }
+
+def _update_query(persona_id: int, persona_data: dict, expected_version: int = None) -> tuple[str, dict]:
+    set_clauses = []
+    relationship_clauses = []
+    params = {"persona_id": persona_id, "expected_version": expected_version}
+
+    for key, value in persona_data.items():
+        if key in UPDATE_RELATIONSHIP_CLAUSES:
+            relationship_clauses.append(UPDATE_RELATIONSHIP_CLAUSES[key])
+        else:
+            set_clauses.append(f"p.{key} = ${key}")
+        params[key] = value
+
+    set_clauses.append("p.updated_at = datetime()")
+    set_clauses.append("p.version = coalesce(p.version, 0) + 1")
+    set_clauses_str = ", ".join(set_clauses)
+
+    query = f"""
+    MATCH (p:Persona {{id: $persona_id}})
+    WHERE $expected_version IS NULL OR coalesce(p.version, 0) = $expected_version
+    SET {set_clauses_str}
+    """ + "".join(relationship_clauses) + """
+    WITH p
+    RETURN p
+    """
+    return query, params
+
+def _recommend_terms(topics: list[str]) -> list[dict]:
+    terms = [
+        {"topic": normalize_topic(topic), "query": topic_search_query(topic)}
+        for topic in topics
+    ]
+    return [term for term in terms if term["query"]]
+
+def _record_to_persona(record) -> dict:
+    """Build a persona dict from a row returned with PERSONA_PROJECTION"""
+    persona = _persona_to_dict(record["p"])
+    persona["topics"] = record["topics"] or []
+    persona["banned_words"] = record["banned_words"] or []
+    persona["audience"] = record["audience"] or ""
+    persona["purpose"] = record["purpose"] or ""
+    return persona
+
+def _persona_to_dict(node) -> dict:
+    """Convert Neo4j node to dictionary with proper formatting"""
+    data = dict(node)
+    # Convert Neo4j DateTime objects to ISO format strings
+    if "created_at" in data and data["created_at"] is not None:
+        data["created_at"] = str(data["created_at"])
+    if "updated_at" in data and data["updated_at"] is not None:
+        data["updated_at"] = str(data["updated_at"])
+    # Convert UUID id to string if it's not already
+    if "id" in data and data["id"] is not None:
+        data["id"] = str(data["id"])
+    return data
+
+def _is_newer(cached: dict, persona: dict) -> bool:
+    return cached is not None and cached.get("version", 0) > persona.get("version", 0)
 
 class PersonaRepository:
     def __init__(self, neo4j_session):
@@ -6,198 +277,210 @@ class PersonaRepository:
 
     def create_persona(self, user_id: int, persona_data: dict) -> dict:
         """Create a new persona for a user with all relationships"""
+        result = self.session.run(CREATE_PERSONA_QUERY, _create_params(user_id, persona_data))
 
-        query = """
-        MERGE (u:User {id: $user_id})
-        CREATE (p:Persona {
-            id: randomUuid(),
-            name: $name,
-            description: $description,
-            samples: $samples,
-            formality_level: $formality_level,
-            creativity_level: $creativity_level,
-            sentence_length: $sentence_length,
-            use_metaphors: $use_metaphors,
-            jargon_level: $jargon_level,
-            created_at: datetime(),
-            updated_at: datetime()
-        })
-        CREATE (u)-[:owns_persona]->(p)
-        WITH p
-        CREATE (a:Audience {type: $audience})
-        CREATE (p)-[:targets_audience]->(a)
-        WITH p
-        CREATE (pur:Purpose {type: $purpose})
-        CREATE (p)-[:for_purpose]->(pur)
-        WITH p, $topics as topics, $banned_words as banned_words
-        FOREACH (topic IN topics |
-            MERGE (t:Topic {name: topic})
-            CREATE (p)-[:targets_topic]->(t)
-        )
-        WITH p, banned_words
-        FOREACH (word IN banned_words |
-            CREATE (bw:BannedWord {text: word})
-            CREATE (p)-[:bans_word]->(bw)
-        )
-        WITH p
-        OPTIONAL MATCH (p)-[:targets_topic]->(t:Topic)
-        OPTIONAL MATCH (p)-[:bans_word]->(bw:BannedWord)
-        OPTIONAL MATCH (p)-[:targets_audience]->(a:Audience)
-        OPTIONAL MATCH (p)-[:for_purpose]->(pur:Purpose)
-        RETURN p, collect(DISTINCT t.name) as topics, collect(DISTINCT bw.text) as banned_words,
-               a.type as audience, pur.type as purpose
-        """
-
-        result = self.session.run(query, {
-            "user_id": user_id,
-            "name": persona_data.get("name"),
-            "description": persona_data.get("description"),
-            "samples": persona_data.get("samples", []),
-            "formality_level": persona_data.get("formality_level"),
-            "creativity_level": persona_data.get("creativity_level"),
-            "sentence_length": persona_data.get("sentence_length"),
-            "use_metaphors": persona_data.get("use_metaphors"),
-            "jargon_level": persona_data.get("jargon_level"),
-            "audience": persona_data.get("audience"),
-            "purpose": persona_data.get("purpose"),
-            "topics": persona_data.get("topics", []),
-            "banned_words": persona_data.get("banned_words", [])
-        })
-        
         record = result.single()
         if record:
-            persona = self._persona_to_dict(record["p"])
-            persona["topics"] = record["topics"] or []
-            persona["banned_words"] = record["banned_words"] or []
-            persona["audience"] = record["audience"] or ""
-            persona["purpose"] = record["purpose"] or ""
+            persona = _record_to_persona(record)
+            self._cache_persona(persona)
             return persona
         return None
 
     def get_persona(self, persona_id: int) -> dict:
-        """Fetch one persona by ID with all relationships"""
-        query = """
-        MATCH (p:Persona {id: $persona_id})
-        OPTIONAL MATCH (p)-[:targets_topic]->(t:Topic)
-        OPTIONAL MATCH (p)-[:bans_word]->(bw:BannedWord)
-        OPTIONAL MATCH (p)-[:targets_audience]->(a:Audience)
-        OPTIONAL MATCH (p)-[:for_purpose]->(pur:Purpose)
-        RETURN p, collect(t.name) as topics, collect(bw.text) as banned_words,
-               a.type as audience, pur.type as purpose
-        """
+        """Fetch one persona by ID with all relationships (read-through cached)"""
+        cached = persona_cache.get(str(persona_id))
+        if cached is not None:
+            return dict(cached)
 
-        result = self.session.run(query,{
+        result = self.session.run(GET_PERSONA_QUERY,{
             "persona_id": persona_id
         })
         record = result.single()
 
         if record:
-            persona = self._persona_to_dict(record["p"])
-            persona["topics"] = record["topics"]
-            persona["banned_words"] = record["banned_words"]
-            persona["audience"] = record["audience"]
-            persona["purpose"] = record["purpose"]
+            persona = _record_to_persona(record)
+            self._cache_persona(persona)
             return persona
         return None
 
     def get_user_personas(self, user_id: int) -> dict:
-        """Fetch all personas for a user"""
-        query = """
-        MATCH (u:User {id: $user_id})-[:owns_persona]->(p:Persona)
-        OPTIONAL MATCH (p)-[:targets_topic]->(t:Topic)
-        OPTIONAL MATCH (p)-[:bans_word]->(bw:BannedWord)
-        OPTIONAL MATCH (p)-[:targets_audience]->(a:Audience)
-        OPTIONAL MATCH (p)-[:for_purpose]->(pur:Purpose)
-        RETURN p, collect(DISTINCT t.name) as topics,
-               collect(DISTINCT bw.text) as banned_words,
-               a.type as audience, pur.type as purpose
+        """Fetch all personas for a user (not written through: a cache round trip per persona costs more than it saves)"""
+        result = self.session.run(GET_USER_PERSONAS_QUERY, {"user_id": user_id})
+        return [_record_to_persona(record) for record in result]
+
+    def update_persona(self, persona_id: int, persona_data: dict, expected_version: int = None) -> dict:
         """
+        Update persona properties and relationships (topics, banned words, audience, purpose).
+        With expected_version it's rejected (VersionConflict) if the persona moved on.
+        """
+        query, params = _update_query(persona_id, persona_data, expected_version)
 
-        result = self.session.run(query, {"user_id": user_id})
-        personas = []
+        result = self.session.run(query, params)
+        record = result.single()
+        persona_cache.delete(str(persona_id))
+
+        if record:
+            return self.get_persona(persona_id)
+        if expected_version is not None:
+            current = self.session.run(GET_PERSONA_VERSION_QUERY, {"persona_id": persona_id}).single()
+            if current:
+                raise VersionConflict(current["version"])
+        return None
+
+    def delete_persona(self, persona_id: int) -> bool:
+        """Delete persona and all relationships"""
+        self.session.run(DELETE_PERSONA_QUERY, {"persona_id": persona_id})
+        persona_cache.delete(str(persona_id))
+        return True
+
+    def _cache_persona(self, persona: dict):
+        """Cache a persona unless a newer version is already cached"""
+        key = str(persona["id"])
+        if not _is_newer(persona_cache.get(key), persona):
+            persona_cache.set(key, persona)
+
+    def get_personas_by_topic(self,topic: str, limit: int = 5):
+        """Get personas by topic"""
+        result = self.session.run(GET_PERSONAS_BY_TOPIC_QUERY, {"topic": topic, "limit": limit})
+        return [_record_to_persona(record) for record in result]
 
+    def recommend_personas_by_topics(self, topics: list[str], limit: int = 5, topic_candidates: int = 10) -> list:
+        """
+        Rank personas by overlap with several topics in a single query.
+
+        Each returned persona has 'matched_topics' (how many requested topics
+        it covers) and 'score' (summed full-text relevance).
+        """
+        terms = _recommend_terms(topics)
+        if not terms:
+            return []
+
+        result = self.session.run(RECOMMEND_PERSONAS_QUERY, {
+            "terms": terms,
+            "limit": limit,
+            "topic_candidates": topic_candidates
+        })
+
+        personas = []
         for record in result:
-            persona = self._persona_to_dict(record["p"])
-            persona["topics"] = record["topics"] or []
-            persona["banned_words"] = record["banned_words"] or []
-            persona["audience"] = record["audience"] or ""
-            persona["purpose"] = record["purpose"] or ""
+            persona = _record_to_persona(record)
+            persona["matched_topics"] = record["matched_topics"]
+            persona["score"] = record["score"]
             personas.append(persona)
-
         return personas
 
-    def update_persona(self, persona_id: int, persona_data: dict) -> dict:
-        """Update persona properties"""
-        set_clauses = []
-        params = {"persona_id": persona_id}
 
-        for key, value in persona_data.items():
-            if key not in ["topics", "banned_words", "audience", "purpose", "samples"]:
-                set_clauses.append(f"p.{key} = ${key}")
-                params[key] = value
+class AsyncPersonaRepository:
+    """Same queries as PersonaRepository, on an AsyncSession for async endpoints (cache access doesn't block)"""
+
+    def __init__(self, neo4j_session):
+        self.session = neo4j_session
+
+    async def create_persona(self, user_id: int, persona_data: dict) -> dict:
+        """Create a new persona for a user with all relationships"""
+        result = await self.session.run(CREATE_PERSONA_QUERY, _create_params(user_id, persona_data))
+
+        record = await result.single()
+        if record:
+            persona = _record_to_persona(record)
+            await self._cache_persona(persona)
+            return persona
+        return None
+
+    async def get_persona(self, persona_id: int) -> dict:
+        """Fetch one persona by ID with all relationships (read-through cached)"""
+        cached = await persona_cache.get_async(str(persona_id))
+        if cached is not None:
+            return dict(cached)
+
+        result = await self.session.run(GET_PERSONA_QUERY, {"persona_id": persona_id})
+        record = await result.single()
+
+        if record:
+            persona = _record_to_persona(record)
+            await self._cache_persona(persona)
+            return persona
+        return None
 
-        set_clauses.append("p.updated_at = datetime()")
-        set_clauses_str = ", ".join(set_clauses)
+    async def get_user_personas(self, user_id: int) -> list:
+        """Fetch all personas for a user (not written through: a cache round trip per persona costs more than it saves)"""
+        result = await self.session.run(GET_USER_PERSONAS_QUERY, {"user_id": user_id})
+        return [_record_to_persona(record) async for record in result]
 
-        query = f"""
-        MATCH (p:Persona {{id: $persona_id}})
-        SET {set_clauses_str}
-        RETURN p
+    async def update_persona(self, persona_id: int, persona_data: dict, expected_version: int = None) -> dict:
         """
+        Update persona properties and relationships (topics, banned words, audience, purpose).
+        With expected_version it's rejected (VersionConflict) if the persona moved on.
+        """
+        query, params = _update_query(persona_id, persona_data, expected_version)
 
-        result = self.session.run(query, params)
-        record = result.single()
+        result = await self.session.run(query, params)
+        record = await result.single()
+        await persona_cache.delete_async(str(persona_id))
 
         if record:
-            return self.get_persona(persona_id)
+            return await self.get_persona(persona_id)
+        if expected_version is not None:
+            result = await self.session.run(GET_PERSONA_VERSION_QUERY, {"persona_id": persona_id})
+            current = await result.single()
+            if current:
+                raise VersionConflict(current["version"])
         return None
 
-    def delete_persona(self, persona_id: int) -> bool:
+    async def delete_persona(self, persona_id: int) -> bool:
         """Delete persona and all relationships"""
-        query = """
-        MATCH (p:Persona {id: $persona_id})
-        DETACH DELETE p
+        result = await self.session.run(DELETE_PERSONA_QUERY, {"persona_id": persona_id})
+        await result.consume()
+        await persona_cache.delete_async(str(persona_id))
+        return True
+
+    async def _cache_persona(self, persona: dict):
+        """Cache a persona unless a newer version is already cached"""
+        key = str(persona["id"])
+        if not _is_newer(await persona_cache.get_async(key), persona):
+            await persona_cache.set_async(key, persona)
+
+    async def import_personas(self, user_id: int, rows: list[dict]) -> list[dict]:
         """
+        Create a chunk of personas in one transaction.
 
-        self.session.run(query, {"persona_id": persona_id})
-        return True
+        Each row must carry a 'line' number; returns [{"line": ..., "id": ...}].
+        """
+        params = [{**_create_params(user_id, row), "line": row["line"]} for row in rows]
 
-    def _persona_to_dict(self, node) -> dict:
-        """Convert Neo4j node to dictionary with proper formatting"""
-        data = dict(node)
-        # Convert Neo4j DateTime objects to ISO format strings
-        if "created_at" in data and data["created_at"] is not None:
-            data["created_at"] = str(data["created_at"])
-        if "updated_at" in data and data["updated_at"] is not None:
-            data["updated_at"] = str(data["updated_at"])
-        # Convert UUID id to string if it's not already
-        if "id" in data and data["id"] is not None:
-            data["id"] = str(data["id"])
-        return data
-    
-    def get_personas_by_topic(self,topic: str, limit: int = 5):
+        async def work(tx):
+            result = await tx.run(IMPORT_PERSONAS_QUERY, {"user_id": user_id, "rows": params})
+            return [{"line": record["line"], "id": record["id"]} async for record in result]
+
+        return await self.session.execute_write(work)
+
+    async def export_personas(self, user_id: int):
+        """Stream all of a user's personas with their relationships"""
+        result = await self.session.run(GET_USER_PERSONAS_QUERY, {"user_id": user_id})
+        async for record in result:
+            yield _record_to_persona(record)
+
+    async def get_personas_by_topic(self, topic: str, limit: int = 5):
         """Get personas by topic"""
-        query = """
-        MATCH (p:Persona)-[:targets_topic]->(t:Topic {name: $topic})
-        OPTIONAL MATCH (p)-[:targets_topic]->(t2:Topic)
-        OPTIONAL MATCH (p)-[:bans_word]->(bw:BannedWord)
-        OPTIONAL MATCH (p)-[:targets_audience]->(a:Audience)
-        OPTIONAL MATCH (p)-[:for_purpose]->(pur:Purpose)
-        RETURN p, collect(DISTINCT t2.name) as topics,
-               collect(DISTINCT bw.text) as banned_words,
-               a.type as audience, pur.type as purpose
-        LIMIT $limit
-        """
+        result = await self.session.run(GET_PERSONAS_BY_TOPIC_QUERY, {"topic": topic, "limit": limit})
+        return [_record_to_persona(record) async for record in result]
 
-        result = self.session.run(query, {"topic": topic, "limit": limit})
-        personas = []
+    async def recommend_personas_by_topics(self, topics: list[str], limit: int = 5, topic_candidates: int = 10) -> list:
+        """Rank personas by overlap with several topics (see PersonaRepository)"""
+        terms = _recommend_terms(topics)
+        if not terms:
+            return []
 
-        for record in result:
-            persona = self._persona_to_dict(record["p"])
-            persona["topics"] = record["topics"] or []
-            persona["banned_words"] = record["banned_words"] or []
-            persona["audience"] = record["audience"] or ""
-            persona["purpose"] = record["purpose"] or ""
-            personas.append(persona)
+        result = await self.session.run(RECOMMEND_PERSONAS_QUERY, {
+            "terms": terms,
+            "limit": limit,
+            "topic_candidates": topic_candidates
+        })
 
-        return personas
\ No newline at end of file
+        personas = []
+        async for record in result:
+            persona = _record_to_persona(record)
+            persona["matched_topics"] = record["matched_topics"]
+            persona["score"] = record["score"]
+            personas.append(persona)
+        return personas
@@ -1,7 +1,16 @@
+import os
 from typing import Optional
+from app.core.cache import create_cache, LOCAL_CACHE_TTL_SECONDS
 from app.db.models import User
 from app.services.auth_service import AuthService
 
+# Active persona per user, read on every chat request; written through on change
+active_persona_cache = create_cache(
+    "active_persona",
+    ttl_seconds=int(os.getenv("ACTIVE_PERSONA_CACHE_TTL_SECONDS", "600")),
+    local_ttl_seconds=LOCAL_CACHE_TTL_SECONDS
+)
+
 class UserRepository:
     def __init__(self, db_session, neo4j_session=None):
         self.db = db_session
@@ -16,15 +25,19 @@ class UserRepository:
     def get_user_by_username(self, username: str) -> Optional[User]:
         return self.db.query(User).filter(User.username == username).first()
     
-    def create_user(self, username: str, email: str, password: str) -> User:
-        hash_password = AuthService.hash_password(password)
-        new_user = User(username=username, email=email, password=hash_password)
+    def create_user(self, username: str, email: str, password: str = None, password_hash: str = None) -> User:
+        """Create a user from a plain password or an already computed hash"""
+        if password_hash is None:
+            password_hash = AuthService.hash_password(password)
+        new_user = User(username=username, email=email, password=password_hash)
         self.db.add(new_user)
         self.db.commit()
 
         if self.neo4j:
+            # MERGE: the node may already exist and User.id is unique
             create_user_query = """
-            CREATE (u:User {id: $user_id, username: $username, email: $email})
+            MERGE (u:User {id: $user_id})
+            SET u.username = $username, u.email = $email
             """
             self.neo4j.run(create_user_query, {
                 "user_id": new_user.id,
@@ -34,12 +47,18 @@ class UserRepository:
         
         return new_user
     
+    def update_password_hash(self, user: User, password_hash: str) -> None:
+        """Replace a user's stored hash (e.g. after a bcrypt cost change)"""
+        user.password = password_hash
+        self.db.commit()
+
     def set_active_persona(self, user_id: int, persona_id: str) -> None:
         """Set the active persona for a user"""
         user = self.get_user_by_id(user_id)
         if user:
             user.active_persona_id = persona_id
             self.db.commit()
+            active_persona_cache.set(str(user_id), {"persona_id": persona_id})
     
     def clear_active_persona(self, user_id: int) -> None:
         """Clear the active persona for a user"""
@@ -47,8 +66,20 @@ class UserRepository:
         if user:
             user.active_persona_id = None
             self.db.commit()
+            active_persona_cache.set(str(user_id), {"persona_id": None})
     
     def get_active_persona_id(self, user_id: int) -> Optional[str]:
-        """Get the active persona ID for a user"""
+        """Get the active persona ID for a user (read-through cached)"""
+        cached = active_persona_cache.get(str(user_id))
+        if cached is not None:
+            return cached["persona_id"]
+
         user = self.get_user_by_id(user_id)
-        return user.active_persona_id if user else None
\ No newline at end of file
+        persona_id = user.active_persona_id if user else None
+        if user:
+            active_persona_cache.set(str(user_id), {"persona_id": persona_id})
+        return persona_id
+
+    def cache_active_persona(self, user: User) -> None:
+        """Seed the active persona cache from an already loaded user (e.g. at login)"""
+        active_persona_cache.set(str(user.id), {"persona_id": user.active_persona_id})
\ No newline at end of file
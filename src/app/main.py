@@ -1,8 +1,8 @@
+import asyncio
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.exceptions import RequestValidationError
-from slowapi import _rate_limit_exceeded_handler
-from slowapi.errors import RateLimitExceeded
 from app.api import chat, auth, personas, documents, drafts, autocomplete, users
 from app.api.collaboration import collab_router
 from dotenv import load_dotenv
@@ -13,19 +13,45 @@ from app.core.error_handler import (
     generic_exception_handler
 )
 from app.core.exceptions import AppException
-from app.core.rate_limiter import limiter, rate_limit_exceeded_handler
+from app.core.providers import providers
+from app.core.websocket_manager import manager as collab_manager
+from app.core.status_events import status_bus, LocalStatusBus
+from app.core.celery_app import app as celery_app
+from app.services.password_hasher import password_hasher
+from app.core.logger import logger
+from app.db.neo4j_schema import ensure_neo4j_schema
+from app.db.neo4j_connection import close_neo4j_drivers
 
 load_dotenv()
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Shared external-service clients live for the whole process
+    providers.startup()
+    app.state.providers = providers
+    try:
+        await asyncio.to_thread(ensure_neo4j_schema)
+    except Exception as e:
+        logger.error(f"Neo4j schema bootstrap failed: {e}")
+    if isinstance(status_bus, LocalStatusBus) and not celery_app.conf.task_always_eager:
+        # Worker processes publish into their own memory; only "queued" would ever arrive
+        logger.error("REDIS_URL is not set: document status events from Celery workers "
+                     "will not reach /api/documents/status/stream or /status/ws")
+    yield
+    # Write back unsaved collaborative edits and hand rooms over to other nodes
+    await collab_manager.shutdown()
+    await status_bus.close()
+    providers.close()
+    password_hasher.shutdown()
+    await close_neo4j_drivers()
+
 app = FastAPI(
     title="AI Writing Assistant API",
     description="Backend API for AI-powered writing assistant with RAG capabilities",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
-# Add rate limiter state to app
-app.state.limiter = limiter
-
 # CORS middleware
 app.add_middleware(
     CORSMiddleware,
@@ -36,7 +62,6 @@ app.add_middleware(
 )
 
 # Exception handlers (order matters: specific first, generic last)
-app.add_exception_handler(RateLimitExceeded, rate_limit_exceeded_handler)
 app.add_exception_handler(AppException, app_exception_handler)
 app.add_exception_handler(RequestValidationError, validation_exception_handler)
 app.add_exception_handler(Exception, generic_exception_handler)
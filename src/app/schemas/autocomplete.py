@@ -10,4 +10,4 @@ class AutocompleteRequest(BaseModel):
 class AutocompleteResponse(BaseModel):
     """Response with autocomplete suggestion"""
     suggestion: str
-    status: str  # "success" or "error"
+    status: str  # "success", "cancelled" or "error"
@@ -12,6 +12,19 @@ class DraftUpdate(BaseModel):
     title: Optional[str] = None
     content: Optional[str] = None
     status: Optional[str] = None
+    base_revision: Optional[int] = None  # Reject the content change if the draft moved past it
+
+class DraftPatch(BaseModel):
+    """Delta update: an operation against base_revision (retain n / insert str / delete -n)"""
+    base_revision: int
+    op: list[int | str]
+
+class DraftPatchResponse(BaseModel):
+    """Result of a delta update (no content echoed back)"""
+    id: int
+    revision: int
+    content_length: int
+    updated_at: Optional[datetime]
 
 class DraftResponse(BaseModel):
     """Single draft response"""
@@ -19,13 +32,44 @@ class DraftResponse(BaseModel):
     title: str
     content: Optional[str]
     status: str
+    revision: int = 0
     created_at: Optional[datetime]
     updated_at: Optional[datetime]
     
     class Config:
         from_attributes = True
 
+class DraftSummary(BaseModel):
+    """Draft list entry: metadata and an excerpt (the body comes from GET /drafts/{id})"""
+    id: int
+    title: str
+    status: str
+    revision: int = 0
+    excerpt: str
+    content_length: int
+    created_at: Optional[datetime]
+    updated_at: Optional[datetime]
+
 class DraftListResponse(BaseModel):
     """List of drafts with pagination"""
-    drafts: list[DraftResponse]
+    drafts: list[DraftSummary]
     total: int
+
+class DraftRevisionInfo(BaseModel):
+    """Revision metadata"""
+    revision: int
+    kind: str
+    content_length: int
+    user_id: Optional[int]
+    created_at: Optional[datetime]
+
+class DraftRevisionListResponse(BaseModel):
+    """Revision history with pagination"""
+    revisions: list[DraftRevisionInfo]
+    total: int
+
+class DraftRevisionResponse(BaseModel):
+    """A draft's content as of one revision"""
+    draft_id: int
+    revision: int
+    content: str
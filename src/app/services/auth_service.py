@@ -2,6 +2,7 @@ import bcrypt
 import jwt
 import os
 from datetime import datetime, timedelta
+from app.services.password_hasher import BCRYPT_ROUNDS
 
 class AuthService:
     SECRET_KEY = os.getenv("JWT_SECRET_KEY")
@@ -10,7 +11,8 @@ class AuthService:
 
     @staticmethod
     def hash_password(password: str) -> str:
-        hash = bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt())
+        # Blocking; request handlers use password_hasher (process pool) instead
+        hash = bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt(BCRYPT_ROUNDS))
         return hash.decode('utf-8')
 
     @staticmethod
@@ -18,9 +20,11 @@ class AuthService:
         return bcrypt.checkpw(plain_password.encode('utf-8'), hashed_password.encode('utf-8'))
 
     @staticmethod
-    def create_access_token(user_id: int) -> str:
+    def create_access_token(user_id: int, username: str = None) -> str:
         expire = datetime.utcnow() + timedelta(minutes=AuthService.ACCESS_TOKEN_EXPIRE_MINUTES)
         to_encode = {"exp": expire, "sub": str(user_id)}
+        if username:
+            to_encode["username"] = username
         encoded_jwt = jwt.encode(to_encode, AuthService.SECRET_KEY, algorithm=AuthService.ALGORITHM)
         return encoded_jwt
 
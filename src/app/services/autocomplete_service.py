@@ -6,16 +6,18 @@ Supports persona-aware completions for consistent writing style.
 """
 import google.genai as genai
 from google.genai import types
-import os
 from typing import Optional
 from app.services.prompt_builder import PromptBuilder
+from app.core.providers import providers, GENAI_MODEL
+from app.core.token_quota import token_quota
 
 class AutocompleteService:
     """Service for generating autocomplete suggestions"""
 
-    def __init__(self):
-        api_key = os.getenv("GOOGLE_API_KEY")
-        self.client = genai.Client(api_key=api_key)
+    def __init__(self, client: genai.Client = None, user_id: int = None, model: str = None):
+        self.client = client or providers.genai
+        self.user_id = user_id
+        self.model = model or GENAI_MODEL
     
     def get_suggestion(self, context: str, persona: dict = None, max_tokens: int = 50) -> str:
         """Generate autocomplete suggestion for the given context"""
@@ -29,10 +31,11 @@ class AutocompleteService:
         )
         
         response = self.client.models.generate_content(
-            model="gemini-2.0-flash",
+            model=self.model,
             contents=prompt,
             config=config
         )
+        token_quota.record_usage(self.user_id, "autocomplete", self.model, response.usage_metadata, prompt, response.text or "")
         
         return response.text.strip() if response.text else ""
     
@@ -47,10 +50,70 @@ class AutocompleteService:
             temperature=0.7,
         )
         
-        for chunk in self.client.models.generate_content_stream(
-            model="gemini-2.0-flash",
+        text = ""
+        usage = None
+        try:
+            for chunk in self.client.models.generate_content_stream(
+                model=self.model,
+                contents=prompt,
+                config=config
+            ):
+                usage = chunk.usage_metadata or usage
+                if chunk.text:
+                    text += chunk.text
+                    yield chunk.text
+        finally:
+            token_quota.record_usage(self.user_id, "autocomplete", self.model, usage, prompt, text)
+
+    async def get_suggestion_async(self, context: str, persona: dict = None, max_tokens: int = 50) -> str:
+        """Generate autocomplete suggestion without blocking the event loop"""
+        
+        prompt = PromptBuilder.build_autocomplete_prompt(context, persona)
+        
+        config = types.GenerateContentConfig(
+            max_output_tokens=max_tokens,
+            temperature=0.7,
+        )
+        
+        response = await self.client.aio.models.generate_content(
+            model=self.model,
+            contents=prompt,
+            config=config
+        )
+        await token_quota.record_usage_async(self.user_id, "autocomplete", self.model, response.usage_metadata, prompt, response.text or "")
+        
+        return response.text.strip() if response.text else ""
+    
+    async def get_suggestion_stream_async(self, context: str, persona: dict = None, max_tokens: int = 50):
+        """
+        Stream autocomplete suggestion without blocking the event loop.
+        
+        Closing this generator closes the upstream HTTP stream, so cancelled
+        suggestions stop consuming tokens.
+        """
+        
+        prompt = PromptBuilder.build_autocomplete_prompt(context, persona)
+        
+        config = types.GenerateContentConfig(
+            max_output_tokens=max_tokens,
+            temperature=0.7,
+        )
+        
+        stream = await self.client.aio.models.generate_content_stream(
+            model=self.model,
             contents=prompt,
             config=config
-        ):
-            if chunk.text:
-                yield chunk.text
+        )
+        
+        text = ""
+        usage = None
+        try:
+            async for chunk in stream:
+                usage = chunk.usage_metadata or usage
+                if chunk.text:
+                    text += chunk.text
+                    yield chunk.text
+        finally:
+            await stream.aclose()
+            # Cut-off streams never deliver usage_metadata; the estimate is charged instead
+            await token_quota.record_usage_async(self.user_id, "autocomplete", self.model, usage, prompt, text)
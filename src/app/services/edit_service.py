@@ -5,18 +5,20 @@ Handles AI-powered document editing.
 Generates structured edits that frontend can apply with diff preview.
 """
 import google.genai as genai
-import os
 import json
 import re
 from typing import Optional
 from app.services.prompt_builder import PromptBuilder
+from app.core.providers import providers, GENAI_MODEL
+from app.core.token_quota import token_quota
 
 class EditService:
     """Service for generating document edits using AI"""
 
-    def __init__(self):
-        api_key = os.getenv("GOOGLE_API_KEY")
-        self.client = genai.Client(api_key=api_key)
+    def __init__(self, client: genai.Client = None, user_id: int = None, model: str = None):
+        self.client = client or providers.genai
+        self.user_id = user_id
+        self.model = model or GENAI_MODEL
     
     def generate_edits(
         self, 
@@ -73,10 +75,11 @@ class EditService:
         }
         
         response = self.client.models.generate_content(
-            model="gemini-2.0-flash",
+            model=self.model,
             contents=prompt,
             config=config
         )
+        token_quota.record_usage(self.user_id, "edit", self.model, response.usage_metadata, prompt, response.text or "")
         
         return self._parse_response(response.text, document_content)
     
@@ -1,12 +1,11 @@
 import google.genai as genai
-import os
+from app.core.providers import providers
 
 class EmbeddingService:
     """Service for generating text embeddings"""
 
-    def __init__(self):
-        api_key = os.getenv("GOOGLE_API_KEY")
-        self.client = genai.Client(api_key=api_key)
+    def __init__(self, client: genai.Client = None):
+        self.client = client or providers.genai
 
     def generate_embedding(self, text: str) -> list[float]:
         """Generate embedding vector for a single text"""
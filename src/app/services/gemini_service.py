@@ -1,13 +1,15 @@
 import google.genai as genai
 from google.genai import types
-import os
 from app.services.tools_service import ToolsService
+from app.core.providers import providers, GENAI_MODEL
+from app.core.token_quota import token_quota
 
 class GeminiService:
-    def __init__(self, tools_service = None):
-        api_key = os.getenv("GOOGLE_API_KEY")
-        self.client = genai.Client(api_key=api_key)
+    def __init__(self, tools_service = None, client: genai.Client = None, user_id: int = None, model: str = None):
+        self.client = client or providers.genai
         self.tools_service = tools_service
+        self.user_id = user_id
+        self.model = model or GENAI_MODEL
 
     def chat(self, message: str, system_prompt: str = None, tools: list = None, history: list = None) -> str:
         """Stream chat response with tool call support"""
@@ -29,25 +31,31 @@ class GeminiService:
             contents = message
             
         response = self.client.models.generate_content_stream(
-            model="gemini-2.0-flash",
+            model=self.model,
             contents=contents,
             config=config
         )
 
         collected_text = ""
         tool_calls_found = []
+        usage = None
 
-        for chunk in response:
-            if hasattr(chunk, 'candidates') and chunk.candidates:
-                for candidate in chunk.candidates:
-                    if hasattr(candidate.content, 'parts'):
-                        for part in candidate.content.parts:
-                            if hasattr(part, 'function_call') and part.function_call:
-                                tool_calls_found.append(part.function_call)
-            
-            if chunk.text:
-                collected_text += chunk.text
-                yield {"type": "content", "content": chunk.text}
+        try:
+            for chunk in response:
+                usage = chunk.usage_metadata or usage
+                if hasattr(chunk, 'candidates') and chunk.candidates:
+                    for candidate in chunk.candidates:
+                        if hasattr(candidate.content, 'parts'):
+                            for part in candidate.content.parts:
+                                if hasattr(part, 'function_call') and part.function_call:
+                                    tool_calls_found.append(part.function_call)
+
+                if chunk.text:
+                    collected_text += chunk.text
+                    yield {"type": "content", "content": chunk.text}
+        finally:
+            # Also charged when the client goes away or the stream fails mid-way
+            token_quota.record_usage(self.user_id, "chat", self.model, usage, str(contents) + (system_prompt or ""), collected_text)
 
         if tool_calls_found:
             tool_results = []
@@ -71,18 +79,26 @@ class GeminiService:
                 system_instruction=system_prompt
             )
 
+            second_contents = [
+                message,
+                {"tool_results": tool_results}
+            ]
             second_stream = self.client.models.generate_content_stream(
-                model="gemini-2.0-flash",
-                contents=[
-                    message,
-                    {"tool_results": tool_results}
-                ],
+                model=self.model,
+                contents=second_contents,
                 config=second_config
             )
-        
-            for chunk in second_stream:
-                if chunk.text:
-                    yield {"type": "content", "content": chunk.text}
+
+            second_text = ""
+            usage = None
+            try:
+                for chunk in second_stream:
+                    usage = chunk.usage_metadata or usage
+                    if chunk.text:
+                        second_text += chunk.text
+                        yield {"type": "content", "content": chunk.text}
+            finally:
+                token_quota.record_usage(self.user_id, "chat", self.model, usage, str(second_contents) + (system_prompt or ""), second_text)
     
     def _build_recommend_personas_tool(self):
         """Build the recommend_personas tool using proper SDK types"""
@@ -90,20 +106,21 @@ class GeminiService:
             function_declarations=[
                 types.FunctionDeclaration(
                     name="recommend_personas",
-                    description="Find personas matching a specific topic",
+                    description="Find personas matching one or more topics, ranked by how many topics they cover",
                     parameters=types.Schema(
                         type=types.Type.OBJECT,
                         properties={
-                            "topic": types.Schema(
-                                type=types.Type.STRING,
-                                description="Topic to search for (e.g., 'business', 'tech', 'creative')"
+                            "topics": types.Schema(
+                                type=types.Type.ARRAY,
+                                items=types.Schema(type=types.Type.STRING),
+                                description="Topics to search for (e.g., ['business', 'tech', 'creative'])"
                             ),
                             "limit": types.Schema(
                                 type=types.Type.INTEGER,
                                 description="Max personas to return"
                             )
                         },
-                        required=["topic"]
+                        required=["topics"]
                     )
                 )
             ]
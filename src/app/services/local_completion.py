@@ -0,0 +1,368 @@
+"""
+Local Completion Tier
+
+A fast, in-process completion tier that sits in front of Gemini for
+autocomplete. Each user gets a word n-gram model built from their own drafts
+and persona samples. When the model is confident about the continuation it
+answers in microseconds; otherwise it returns None and the caller falls
+through to Gemini.
+
+The n-grams are stored in an array-backed trie (flat int arrays, left-child /
+right-sibling layout) so a user's model costs a few bytes per node instead of
+a dict per node. All models of the process share one memory budget
+(LOCAL_COMPLETION_MAX_BYTES, trie plus vocabulary); the least recently used
+ones are dropped to stay under it and rebuilt on their next use.
+"""
+import asyncio
+import os
+import sys
+import threading
+from array import array
+from collections import OrderedDict
+from typing import Callable, Iterable, Optional, Sequence
+
+ORDER = int(os.getenv("LOCAL_COMPLETION_ORDER", "4"))  # n-gram order (context = ORDER - 1 words)
+MIN_SUPPORT = int(os.getenv("LOCAL_COMPLETION_MIN_SUPPORT", "2"))
+MIN_CONFIDENCE = float(os.getenv("LOCAL_COMPLETION_MIN_CONFIDENCE", "0.6"))
+MAX_SUGGESTION_WORDS = 8
+MAX_NODES_PER_USER = int(os.getenv("LOCAL_COMPLETION_MAX_NODES", "500000"))
+MAX_USERS = int(os.getenv("LOCAL_COMPLETION_MAX_USERS", "2000"))
+# Process-wide budget for all loaded models
+MAX_BYTES = int(os.getenv("LOCAL_COMPLETION_MAX_BYTES", str(256 * 1024 * 1024)))
+# Per vocabulary word on top of the string: dict entry and index slot, list slot, token int
+VOCAB_ENTRY_BYTES = 80
+ENABLED = os.getenv("LOCAL_COMPLETION_ENABLED", "true").lower() == "true"
+
+class ArrayTrie:
+    """Trie over integer token ids stored in parallel flat arrays"""
+
+    def __init__(self):
+        # Node 0 is the root
+        self.token = array("i", [-1])
+        self.count = array("i", [0])
+        self.first_child = array("i", [-1])
+        self.next_sibling = array("i", [-1])
+        self.best_child = array("i", [-1])
+        # Direct token -> node index for the root's children (root fan-out is the whole vocab)
+        self.root_index = array("i")
+
+    def __len__(self) -> int:
+        return len(self.token)
+
+    @property
+    def nbytes(self) -> int:
+        arrays = (self.token, self.count, self.first_child, self.next_sibling, self.best_child, self.root_index)
+        return sum(a.itemsize * len(a) for a in arrays)
+
+    def child(self, node: int, token: int) -> int:
+        """Index of the child of node with the given token, or -1"""
+        if node == 0:
+            return self.root_index[token] if token < len(self.root_index) else -1
+
+        child = self.first_child[node]
+        while child != -1:
+            if self.token[child] == token:
+                return child
+            child = self.next_sibling[child]
+        return -1
+
+    def children(self, node: int) -> Iterable[int]:
+        child = self.first_child[node]
+        while child != -1:
+            yield child
+            child = self.next_sibling[child]
+
+    def _add_child(self, node: int, token: int) -> int:
+        index = len(self.token)
+        self.token.append(token)
+        self.count.append(0)
+        self.first_child.append(-1)
+        self.next_sibling.append(self.first_child[node])
+        self.best_child.append(-1)
+        self.first_child[node] = index
+
+        if node == 0:
+            if token >= len(self.root_index):
+                self.root_index.extend([-1] * (token + 1 - len(self.root_index)))
+            self.root_index[token] = index
+        return index
+
+    def insert(self, tokens: Sequence[int]):
+        """Count one occurrence of the token sequence (and all its prefixes)"""
+        node = 0
+        self.count[0] += 1
+        for token in tokens:
+            child = self.child(node, token)
+            if child == -1:
+                child = self._add_child(node, token)
+            self.count[child] += 1
+
+            best = self.best_child[node]
+            if best == -1 or self.count[child] > self.count[best]:
+                self.best_child[node] = child
+            node = child
+
+    def find(self, tokens: Sequence[int]) -> int:
+        """Node reached by following tokens from the root, or -1"""
+        node = 0
+        for token in tokens:
+            node = self.child(node, token)
+            if node == -1:
+                return -1
+        return node
+
+class UserCompletionModel:
+    """Word n-gram model for a single user"""
+
+    def __init__(self):
+        self.vocab: dict[str, int] = {}
+        self.words: list[str] = []
+        self.trie = ArrayTrie()
+        self.ingested_personas: set[str] = set()
+        self.vocab_bytes = 0
+        # Bytes counted against the tier's budget
+        self.accounted = 0
+
+    @property
+    def nbytes(self) -> int:
+        return self.trie.nbytes + self.vocab_bytes
+
+    def _token_id(self, word: str) -> int:
+        token = self.vocab.get(word)
+        if token is None:
+            token = len(self.words)
+            self.vocab[word] = token
+            self.words.append(word)
+            self.vocab_bytes += sys.getsizeof(word) + VOCAB_ENTRY_BYTES
+        return token
+
+    def add_text(self, text: str):
+        """Add every n-gram window of the text to the model"""
+        if not text:
+            return
+        tokens = [self._token_id(word) for word in text.split()]
+        for i in range(len(tokens)):
+            if len(self.trie) >= MAX_NODES_PER_USER:
+                return
+            self.trie.insert(tokens[i:i + ORDER])
+
+    def suggest(self, context: str) -> Optional[str]:
+        """Greedy confident continuation of the context, or None"""
+        words = context.split()
+        if not words:
+            return None
+
+        partial = "" if context[-1].isspace() else words.pop()
+        history = [self.vocab.get(word, -1) for word in words[-(ORDER - 1):]]
+
+        pieces = []
+        while len(pieces) < MAX_SUGGESTION_WORDS:
+            token = self._predict(history, partial)
+            if token is None:
+                break
+
+            word = self.words[token]
+            if partial:
+                pieces.append(word[len(partial):])
+                partial = ""
+            else:
+                pieces.append(word if not pieces else " " + word)
+            history = (history + [token])[-(ORDER - 1):]
+
+        if not pieces:
+            return None
+        suggestion = "".join(pieces)
+        return suggestion if suggestion.strip() else None
+
+    def _predict(self, history: list[int], partial: str) -> Optional[int]:
+        """Next token at the longest context with enough support, if confident"""
+        trie = self.trie
+        for k in range(len(history), 0, -1):
+            context = history[-k:]
+            if -1 in context:
+                continue
+            node = trie.find(context)
+            if node == -1 or trie.count[node] < MIN_SUPPORT:
+                continue
+
+            if partial:
+                candidates = [
+                    c for c in trie.children(node)
+                    if self.words[trie.token[c]].startswith(partial)
+                    and len(self.words[trie.token[c]]) > len(partial)
+                ]
+                if not candidates:
+                    continue
+                best = max(candidates, key=lambda c: trie.count[c])
+                total = sum(trie.count[c] for c in candidates)
+            else:
+                best = trie.best_child[node]
+                if best == -1:
+                    continue
+                total = trie.count[node]
+
+            if trie.count[best] >= MIN_SUPPORT and trie.count[best] / total >= MIN_CONFIDENCE:
+                return trie.token[best]
+            return None
+        return None
+
+class LocalCompletionTier:
+    """Interface for completion tiers consulted before the model (no-op by default)"""
+
+    def suggest(self, user_id: int, context: str, loader: Callable[[], list[str]] = None) -> Optional[str]:
+        return None
+
+    async def suggest_async(self, user_id: int, context: str, loader: Callable[[], list[str]] = None) -> Optional[str]:
+        return None
+
+    def observe_text(self, user_id: int, text: str):
+        pass
+
+    def observe_edit(self, user_id: int, old_text: str, new_text: str):
+        pass
+
+    def observe_persona(self, user_id: int, persona: dict):
+        pass
+
+    def get_stats(self) -> dict:
+        return {}
+
+class NGramCompletionTier(LocalCompletionTier):
+    """Per-user n-gram models, built lazily and updated as drafts are saved"""
+
+    def __init__(self, max_users: int = MAX_USERS, max_bytes: int = MAX_BYTES):
+        self.max_users = max_users
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._models: "OrderedDict[int, UserCompletionModel]" = OrderedDict()
+        self._bytes = 0
+        self.stats = {"hits": 0, "misses": 0, "builds": 0, "evictions": 0}
+
+    def _get_model(self, user_id: int, loader: Callable[[], list[str]] = None) -> Optional[UserCompletionModel]:
+        with self._lock:
+            model = self._models.get(user_id)
+            if model is not None:
+                self._models.move_to_end(user_id)
+                return model
+
+        if loader is None:
+            return None
+
+        model = UserCompletionModel()
+        for text in loader():
+            model.add_text(text)
+
+        with self._lock:
+            previous = self._models.pop(user_id, None)
+            if previous is not None:
+                self._bytes -= previous.accounted
+            self._models[user_id] = model
+            model.accounted = model.nbytes
+            self._bytes += model.accounted
+            self.stats["builds"] += 1
+            self._evict()
+        return model
+
+    def _grow(self, user_id: int, model: UserCompletionModel, add: Callable[[], None]):
+        """Run an update of a loaded model and charge its growth to the budget"""
+        add()
+        with self._lock:
+            # An evicted model no longer counts
+            if self._models.get(user_id) is model:
+                size = model.nbytes
+                self._bytes += size - model.accounted
+                model.accounted = size
+                self._evict()
+
+    def _evict(self):
+        """Drop least recently used models while over a limit (caller holds the lock)"""
+        while len(self._models) > 1 and (len(self._models) > self.max_users or self._bytes > self.max_bytes):
+            _, model = self._models.popitem(last=False)
+            self._bytes -= model.accounted
+            self.stats["evictions"] += 1
+
+    def suggest(self, user_id: int, context: str, loader: Callable[[], list[str]] = None) -> Optional[str]:
+        model = self._get_model(user_id, loader)
+        suggestion = model.suggest(context) if model else None
+        self.stats["hits" if suggestion else "misses"] += 1
+        return suggestion
+
+    async def suggest_async(self, user_id: int, context: str, loader: Callable[[], list[str]] = None) -> Optional[str]:
+        """suggest() for the event loop: a model that isn't loaded is built (loader and trie) in a thread"""
+        model = self._get_model(user_id)
+        if model is None and loader is not None:
+            model = await asyncio.to_thread(self._get_model, user_id, loader)
+        suggestion = model.suggest(context) if model else None
+        self.stats["hits" if suggestion else "misses"] += 1
+        return suggestion
+
+    def observe_text(self, user_id: int, text: str):
+        """Add newly written text (only if the user's model is already loaded)"""
+        model = self._get_model(user_id)
+        if model:
+            self._grow(user_id, model, lambda: model.add_text(text))
+
+    def observe_edit(self, user_id: int, old_text: str, new_text: str):
+        """
+        Add only the changed region of an edited draft, with enough leading
+        words to form full n-grams. Removed text is not un-counted.
+        """
+        model = self._get_model(user_id)
+        if not model or not new_text:
+            return
+
+        old_text = old_text or ""
+        prefix = 0
+        limit = min(len(old_text), len(new_text))
+        while prefix < limit and old_text[prefix] == new_text[prefix]:
+            prefix += 1
+
+        suffix = 0
+        while (suffix < limit - prefix
+               and old_text[len(old_text) - 1 - suffix] == new_text[len(new_text) - 1 - suffix]):
+            suffix += 1
+
+        start = prefix
+        end = len(new_text) - suffix
+        if end <= start:
+            return
+
+        # Widen to whole words, then back up ORDER - 1 words of context
+        while start > 0 and not new_text[start - 1].isspace():
+            start -= 1
+        while end < len(new_text) and not new_text[end].isspace():
+            end += 1
+
+        leading = new_text[:start].split()[-(ORDER - 1):]
+        self._grow(user_id, model, lambda: model.add_text(" ".join(leading + [new_text[start:end]])))
+
+    def observe_persona(self, user_id: int, persona: dict):
+        """Add persona samples once per persona"""
+        model = self._get_model(user_id)
+        if not model or not persona or persona.get("id") in model.ingested_personas:
+            return
+        model.ingested_personas.add(persona.get("id"))
+
+        def add():
+            for sample in persona.get("samples") or []:
+                model.add_text(sample)
+
+        self._grow(user_id, model, add)
+
+    def invalidate(self, user_id: int):
+        with self._lock:
+            model = self._models.pop(user_id, None)
+            if model is not None:
+                self._bytes -= model.accounted
+
+    def memory_bytes(self) -> int:
+        """Trie and vocabulary bytes of the loaded models"""
+        return self._bytes
+
+    def get_stats(self) -> dict:
+        return {**self.stats, "users": len(self._models), "memory_bytes": self.memory_bytes(),
+                "max_bytes": self.max_bytes}
+
+
+# Global local completion tier instance
+local_completion: LocalCompletionTier = NGramCompletionTier() if ENABLED else LocalCompletionTier()
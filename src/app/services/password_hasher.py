@@ -0,0 +1,110 @@
+"""
+Password Hashing Pool
+
+bcrypt is deliberately slow (~250 ms at cost 12). Running it on the request
+threadpool lets a burst of logins occupy every worker thread, stalling all
+other sync routes. Hashing and verification run here instead, in a small
+dedicated process pool:
+- at most BCRYPT_MAX_CONCURRENCY operations in flight
+- at most BCRYPT_MAX_QUEUE callers waiting; beyond that callers are rejected
+  with a 503 instead of piling up
+- BCRYPT_ROUNDS sets the cost for new hashes; needs_rehash() reports hashes
+  made with a different cost so login can upgrade them transparently
+"""
+import asyncio
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional
+import bcrypt
+from app.core.exceptions import AppException
+
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+BCRYPT_MAX_CONCURRENCY = int(os.getenv("BCRYPT_MAX_CONCURRENCY", str(max(1, (os.cpu_count() or 2) // 2))))
+BCRYPT_MAX_QUEUE = int(os.getenv("BCRYPT_MAX_QUEUE", "256"))
+
+# Module-level so they can be pickled into the worker processes
+def _hash(password: str, rounds: int) -> str:
+    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt(rounds)).decode('utf-8')
+
+def _verify(password: str, hashed: str) -> bool:
+    return bcrypt.checkpw(password.encode('utf-8'), hashed.encode('utf-8'))
+
+def hash_rounds(hashed: str) -> Optional[int]:
+    """Cost factor of a bcrypt hash ("$2b$12$..." -> 12)"""
+    parts = hashed.split("$")
+    if len(parts) < 4 or not parts[2].isdigit():
+        return None
+    return int(parts[2])
+
+class PasswordHasher:
+    def __init__(self, rounds: int = BCRYPT_ROUNDS, max_concurrency: int = BCRYPT_MAX_CONCURRENCY,
+                 max_queue: int = BCRYPT_MAX_QUEUE):
+        self.rounds = rounds
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self.waiting = 0
+        self.in_flight = 0
+        self.stats = {"completed": 0, "rejected": 0, "rehashed": 0, "wait_seconds": 0.0, "run_seconds": 0.0}
+
+    def _pool(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.max_concurrency)
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._executor
+
+    async def _submit(self, fn, *args):
+        executor = self._pool()
+        if self.waiting >= self.max_queue:
+            self.stats["rejected"] += 1
+            raise AppException("Authentication is busy, please retry shortly", "AUTH_BUSY", status_code=503)
+
+        queued_at = time.perf_counter()
+        self.waiting += 1
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self.waiting -= 1
+
+        started_at = time.perf_counter()
+        self.in_flight += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(executor, fn, *args)
+        finally:
+            self.in_flight -= 1
+            self._semaphore.release()
+            self.stats["completed"] += 1
+            self.stats["wait_seconds"] += started_at - queued_at
+            self.stats["run_seconds"] += time.perf_counter() - started_at
+
+    async def hash(self, password: str) -> str:
+        return await self._submit(_hash, password, self.rounds)
+
+    async def verify(self, password: str, hashed: str) -> bool:
+        return await self._submit(_verify, password, hashed)
+
+    def needs_rehash(self, hashed: str) -> bool:
+        return hash_rounds(hashed) != self.rounds
+
+    def get_stats(self) -> dict:
+        completed = self.stats["completed"]
+        return {
+            "rounds": self.rounds,
+            "max_concurrency": self.max_concurrency,
+            "waiting": self.waiting,
+            "in_flight": self.in_flight,
+            **self.stats,
+            "avg_wait_ms": self.stats["wait_seconds"] / completed * 1000 if completed else 0.0,
+            "avg_run_ms": self.stats["run_seconds"] / completed * 1000 if completed else 0.0
+        }
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+            self._semaphore = None
+
+# Global password hasher instance
+password_hasher = PasswordHasher()
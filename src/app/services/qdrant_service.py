@@ -1,6 +1,6 @@
 from qdrant_client import QdrantClient
 from  qdrant_client.models import Distance, VectorParams, PointStruct
-import os
+from app.core.providers import providers
 
 class QdrantService:
     """Service for storing and searching document embeddings"""
@@ -8,9 +8,14 @@ class QdrantService:
     COLLECTION_NAME = "document_chunks"
     VECTOR_SIZE = 768 # Gemini text-embedding-004 dimension
 
-    def __init__(self):
-        self.client = QdrantClient(host="localhost", port=6333)
-        self._ensure_collection_exists()
+    # Collection existence is checked once per process, not per request
+    _collection_ready = False
+
+    def __init__(self, client: QdrantClient = None):
+        self.client = client or providers.qdrant
+        if not QdrantService._collection_ready:
+            self._ensure_collection_exists()
+            QdrantService._collection_ready = True
 
     def _ensure_collection_exists(self):
         """Create collection if it doesn't exist"""
@@ -1,12 +1,14 @@
+import google.genai as genai
+from qdrant_client import QdrantClient
 from app.services.embedding_service import EmbeddingService
 from app.services.qdrant_service import QdrantService
 
 class RAGService:
     """Service for Retrieval-Augmented Generation"""
 
-    def __init__(self):
-        self.embedding_service = EmbeddingService()
-        self.qdrant_service = QdrantService()
+    def __init__(self, genai_client: genai.Client = None, qdrant_client: QdrantClient = None):
+        self.embedding_service = EmbeddingService(client=genai_client)
+        self.qdrant_service = QdrantService(client=qdrant_client)
 
     def get_relevant_context(self, query: str, document_ids: list[int], limit: int = 5) -> str:
         """Get relevant document chunks for a query, with citation metadata"""
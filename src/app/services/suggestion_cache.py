@@ -0,0 +1,130 @@
+"""
+Suggestion Cache
+
+Remembers the last few autocomplete suggestions per user so that when the
+user types the characters of a suggestion they were just shown, the rest of
+it can be served instantly without another model call.
+
+Entries are keyed by a suffix (tail) of the context the suggestion was
+generated for, plus the persona. Matching on the tail instead of the full
+context keeps hits working when the editor slides its context window.
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Optional
+
+CONTEXT_TAIL_CHARS = 200
+MAX_ENTRIES_PER_USER = int(os.getenv("SUGGESTION_CACHE_ENTRIES_PER_USER", "4"))
+MAX_USERS = int(os.getenv("SUGGESTION_CACHE_MAX_USERS", "10000"))
+TTL_SECONDS = int(os.getenv("SUGGESTION_CACHE_TTL_SECONDS", "300"))
+
+@dataclass
+class CachedSuggestion:
+    """A suggestion and the context tail it was generated for"""
+    context_tail: str
+    persona_id: Optional[str]
+    suggestion: str
+    created_at: float
+
+class SuggestionCache:
+    """Per-user LRU of recent suggestions with prefix-aware lookup"""
+
+    def __init__(self, max_entries_per_user: int = MAX_ENTRIES_PER_USER,
+                 max_users: int = MAX_USERS, ttl_seconds: float = TTL_SECONDS):
+        self.max_entries_per_user = max_entries_per_user
+        self.max_users = max_users
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        # user_id -> newest-last list of entries (users kept in LRU order)
+        self._entries: "OrderedDict[int, list[CachedSuggestion]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def lookup(self, user_id: int, context: str, persona_id: Optional[str] = None) -> Optional[str]:
+        """
+        Return the unseen remainder of a cached suggestion if the context
+        extends a cached context with a prefix of its suggestion.
+        """
+        now = time.monotonic()
+        with self._lock:
+            entries = self._entries.get(user_id)
+            if entries:
+                self._entries.move_to_end(user_id)
+                entries[:] = [e for e in entries if now - e.created_at < self.ttl_seconds]
+
+                for entry in reversed(entries):
+                    if entry.persona_id != persona_id:
+                        continue
+                    remainder = self._remainder(entry, context)
+                    if remainder:
+                        self.hits += 1
+                        return remainder
+
+            self.misses += 1
+            return None
+
+    def store(self, user_id: int, context: str, suggestion: str, persona_id: Optional[str] = None):
+        """Remember a suggestion generated for the given context"""
+        if not suggestion or not suggestion.strip():
+            return
+
+        entry = CachedSuggestion(
+            context_tail=context[-CONTEXT_TAIL_CHARS:],
+            persona_id=persona_id,
+            suggestion=suggestion,
+            created_at=time.monotonic()
+        )
+
+        with self._lock:
+            entries = self._entries.setdefault(user_id, [])
+            self._entries.move_to_end(user_id)
+            entries.append(entry)
+            if len(entries) > self.max_entries_per_user:
+                del entries[0]
+
+            while len(self._entries) > self.max_users:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, user_id: int):
+        """Drop all cached suggestions for a user"""
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def stats(self) -> dict:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hit_rate(),
+            "users": len(self._entries)
+        }
+
+    @staticmethod
+    def _remainder(entry: CachedSuggestion, context: str) -> Optional[str]:
+        """What is left of the suggestion after the characters typed since"""
+        idx = context.rfind(entry.context_tail)
+        if idx == -1:
+            return None
+
+        typed = context[idx + len(entry.context_tail):]
+        suggestion = entry.suggestion
+
+        # Models often omit the separating space that the editor inserts
+        if typed[:1].isspace() and not suggestion[:1].isspace():
+            suggestion = " " + suggestion
+
+        if not suggestion.startswith(typed):
+            return None
+
+        remainder = suggestion[len(typed):]
+        return remainder if remainder.strip() else None
+
+
+# Global suggestion cache instance
+suggestion_cache = SuggestionCache()
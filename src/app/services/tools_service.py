@@ -1,9 +1,34 @@
-from app.db.repositories.persona_repository import PersonaRepository
+import os
+from app.core.cache import create_cache
+from app.db.repositories.persona_repository import PersonaRepository, normalize_topic
+
+# Popular topic lookups are served from cache (short TTL, personas change rarely)
+recommendation_cache = create_cache(
+    "persona_recommendations",
+    ttl_seconds=int(os.getenv("RECOMMENDATION_CACHE_TTL_SECONDS", "120")),
+    max_size=1000
+)
 
 class ToolsService:
     def __init__(self, neo4j_session):
         self.persona_repo = PersonaRepository(neo4j_session)
 
-    def recommend_personas(self, topic: str, limit: int = 5):
-        results = self.persona_repo.get_personas_by_topic(topic, limit)
-        return results
\ No newline at end of file
+    def recommend_personas(self, topics: list[str] = None, topic: str = None, limit: int = 5):
+        """Recommend personas covering one or more topics, best overlap first"""
+        requested = list(topics or [])
+        if topic:
+            requested.append(topic)
+
+        normalized = sorted({normalize_topic(t) for t in requested if t and t.strip()})
+        if not normalized:
+            return []
+
+        limit = int(limit)
+        key = f"{limit}:{'|'.join(normalized)}"
+        cached = recommendation_cache.get(key)
+        if cached is not None:
+            return cached
+
+        results = self.persona_repo.recommend_personas_by_topics(normalized, limit)
+        recommendation_cache.set(key, results)
+        return results
@@ -6,15 +6,21 @@ from pathlib import Path
 from app.db.models import DocumentChunks
 from app.services.embedding_service import EmbeddingService
 from app.services.qdrant_service import QdrantService
+from app.core.status_events import status_bus, status_event
+import os
+import time
 
 UPLOAD_DIR = Path("uploads")
+# Minimum seconds between embedding progress events
+STATUS_PROGRESS_INTERVAL = float(os.getenv("STATUS_PROGRESS_INTERVAL", "0.5"))
 
 @app.task
 def process_document(document_id: int):
-    """Background task to process uploaded document"""
+    """Background task to process uploaded document (publishes a status event per stage)"""
 
     # Create a new DB session (we're outside FastAPI request)
     db = SessionLocal()
+    user_id = None
 
     try:
         # 1. Get document from DB
@@ -25,12 +31,19 @@ def process_document(document_id: int):
             print(f"Document {document_id} not found")
             return
 
+        user_id = document.user_id
+
+        def report(stage: str, done: int = None, total: int = None, **fields):
+            status_bus.publish(user_id, status_event(document_id, stage, done, total, **fields))
+
         # 2. Extract text from file
+        report("extracting")
         processor = DocumentProcessor()
         file_path = UPLOAD_DIR / document.filename
         text = processor.extract_text(str(file_path), document.file_type)
 
         # 3. Chunk the text
+        report("chunking")
         chunks = processor.chunk_text(text)
 
         # 4. Save chunks to database
@@ -49,7 +62,10 @@ def process_document(document_id: int):
         embedding_service = EmbeddingService()
         qdrant_service = QdrantService()
 
-        for chunk_obj in document.chunks:
+        total = len(document.chunks)
+        report("embedding", 0, total)
+        reported_at = time.monotonic()
+        for done, chunk_obj in enumerate(document.chunks, 1):
             embedding = embedding_service.generate_embedding(chunk_obj.chunk_text)
             qdrant_service.store_embedding(
                 chunk_id=chunk_obj.id,
@@ -58,10 +74,14 @@ def process_document(document_id: int):
                 embedding=embedding,
                 chunk_text=chunk_obj.chunk_text
             )
+            if done < total and time.monotonic() - reported_at >= STATUS_PROGRESS_INTERVAL:
+                report("embedding", done, total)
+                reported_at = time.monotonic()
 
         # 6. Update status
         repo.update_document_status(document_id, "completed")
         db.commit()
+        report("done", total, total)
 
         print(f"Processed document {document_id}: {len(chunks)} chunks created")
 
@@ -69,6 +89,8 @@ def process_document(document_id: int):
         db.rollback()
         repo.update_document_status(document_id, "failed")
         db.commit()
+        if user_id is not None:
+            status_bus.publish(user_id, status_event(document_id, "failed", error=str(e)))
         print(f"Error processing document {document_id}: {e}")
         raise
 